@@ -0,0 +1,119 @@
+"""
+Content-addressed on-disk cache for derived training artifacts.
+
+Entries are pickles stored under the hash of everything they were derived from
+(see artifact_key), so a changed input simply misses and stale entries age out.
+The cache is bounded in size: when it grows past max_bytes the least recently
+used entries are deleted. Several processes may share one cache directory.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Dict
+
+DEFAULT_MAX_BYTES = 1024 * 2**20
+
+# Eviction trims the cache to this fraction of max_bytes, so it does not run on every put
+_EVICT_TO = 0.9
+
+
+def artifact_key(*parts) -> str:
+    """Stable hash of any repr-able inputs (ids, fingerprints, parameters, code versions)"""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def code_version(*paths: str) -> str:
+    """Hash of source files, so cached artifacts are invalidated when the code deriving them changes"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ArtifactCache:
+    """Size-bounded LRU cache of pickled values keyed by artifact_key hashes"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    def _scan(self):
+        """Sizes of every entry on disk, including those other processes put there"""
+        self._sizes: Dict[str, int] = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    try:
+                        self._sizes[name[:-4]] = os.path.getsize(os.path.join(root, name))
+                    except FileNotFoundError:
+                        pass
+        self._total = sum(self._sizes.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        # The modification time doubles as the LRU clock
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename, so readers in other processes never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        self._total += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache is back under budget, counting
+        the entries of every process sharing the directory
+        """
+        self._scan()
+        if self._total <= self.max_bytes:
+            return 0
+        entries = []
+        for key in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._path(key)), key))
+            except FileNotFoundError:
+                entries.append((0, key))
+        entries.sort()
+
+        removed = 0
+        target = self.max_bytes * _EVICT_TO
+        for _, key in entries:
+            if self._total <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._total -= self._sizes.pop(key)
+            removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._sizes)
@@ -0,0 +1,265 @@
+"""
+Throughput benchmarks for the data generator and the nightly training job.
+
+Stages:
+  generate    generate_parking_arrays over load_test_zone_ids(zones)
+  occupancy   calculate_occupancy_for_zones over synthetic reports
+  predict     predict_zones_batch over every zone, plus the stored prediction documents
+  end_to_end  train_and_update_predictions against a local mongod (--mongo-uri), or
+              in-process on the file source (a columnar dataset, predictions to NDJSON)
+
+Every (zones, reports) case is reported as one JSON line with wall time, records/s and
+peak traced memory. Compare against a saved baseline to catch regressions:
+
+  python scripts/benchmark.py --save-baseline bench_baseline.json
+  python scripts/benchmark.py --baseline bench_baseline.json        # exits 1 on regression
+
+With --mongo-uri, end_to_end uses (and drops) the ParkWiseBench database there:
+
+  python scripts/benchmark.py --stages end_to_end --mongo-uri mongodb://localhost:27017
+
+Full scale (slow, needs several GB of RAM):
+  python scripts/benchmark.py --zones 100,1000,10000 --reports 10000,1000000,10000000
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, UTC
+
+import numpy as np
+import pandas as pd
+
+import generate_parking_data
+import train_model
+from report_columns import REPORT_TYPES, write_columns
+
+BENCH_DATABASE = "ParkWiseBench"
+
+# Reports the generator yields per zone and day, to size its date range
+GENERATED_PER_ZONE_DAY = 80
+
+
+def synthetic_reports(num_zones: int, num_reports: int, rng: np.random.Generator, days: int = 60):
+    """Random reports spread over `days` days for num_zones zones named after real Pune zones"""
+    base_ids = generate_parking_data.load_zone_ids()
+    zone_ids = np.array([f"{base_ids[i % len(base_ids)]}_b{i}" for i in range(num_zones)])
+    end = np.datetime64(datetime.now(UTC).replace(tzinfo=None), 's')
+    offsets = rng.integers(0, days * 86400, num_reports).astype('timedelta64[s]')
+    reports = pd.DataFrame({
+        "zoneId": zone_ids[rng.integers(0, num_zones, num_reports)],
+        "reportType": np.array(REPORT_TYPES[:3])[rng.choice(3, num_reports, p=[0.45, 0.2, 0.35])],
+        "timestamp": pd.to_datetime(end - offsets, utc=True)
+    })
+    return zone_ids, reports
+
+
+def measure(fn, track_memory: bool = True, repeat: int = 1) -> dict:
+    """Best wall time over `repeat` runs, then one extra traced run for peak memory"""
+    quiet = io.StringIO()
+    seconds = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(quiet):
+            started = time.perf_counter()
+            fn()
+            seconds = min(seconds, time.perf_counter() - started)
+        quiet.seek(0)
+        quiet.truncate()
+
+    peak_mb = None
+    if track_memory:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(quiet):
+            fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak_mb}
+
+
+def bench_generate(num_zones: int, num_reports: int, rng: np.random.Generator, **opts) -> dict:
+    zone_ids = generate_parking_data.load_test_zone_ids(num_zones)
+    num_days = max(1, int(np.ceil(num_reports / (GENERATED_PER_ZONE_DAY * num_zones))))
+    result = measure(lambda: generate_parking_data.generate_parking_arrays(num_reports, rng, num_days=num_days,
+                                                                           zone_ids=zone_ids), **opts)
+    return {"records": num_reports, **result}
+
+
+def bench_occupancy(zone_ids, reports: pd.DataFrame, **opts) -> dict:
+    categories = {z: train_model.categorize_zone(z) for z in zone_ids}
+    result = measure(lambda: train_model.calculate_occupancy_for_zones(reports, categories), **opts)
+    return {"records": len(reports), **result}
+
+
+def bench_predict(zone_ids, reports: pd.DataFrame, **opts) -> dict:
+    categories = {z: train_model.categorize_zone(z) for z in zone_ids}
+    occupancy = train_model.calculate_occupancy_for_zones(reports, categories)
+    hour_means = train_model.hour_of_day_means(occupancy).reindex(zone_ids).to_numpy(dtype=float)
+    now = datetime.now(UTC)
+
+    def run():
+        horizon, scores = train_model.predict_zones_batch([categories[z] for z in zone_ids], now, 24, hour_means)
+        timestamps = [t.isoformat() for t in horizon]
+        for row in scores:
+            train_model.prediction_documents(timestamps, row)
+
+    result = measure(run, **opts)
+    return {"records": len(zone_ids) * 24, **result}
+
+
+def open_stand_in(mongo_uri: str):
+    """
+    A fresh benchmark database on a local mongod. In-process stand-ins such as mongomock
+    are not an option: they lag pymongo 4's bulk_write API, so every write batch would fail.
+    """
+    import pymongo
+    client = pymongo.MongoClient(mongo_uri)
+    client.drop_database(BENCH_DATABASE)
+    return client, client[BENCH_DATABASE]
+
+
+def bench_end_to_end_file(zone_ids, reports: pd.DataFrame, **opts) -> dict:
+    """
+    train_and_update_predictions on the file source: the reports as a columnar dataset,
+    predictions to a local NDJSON file. Fails if any zone failed, like bench_end_to_end.
+    """
+    dataset_zones, zone_codes = np.unique(reports["zoneId"].to_numpy(), return_inverse=True)
+    type_codes = pd.Categorical(reports["reportType"], categories=REPORT_TYPES).codes
+    timestamps = reports["timestamp"].dt.tz_convert(None).to_numpy().astype('datetime64[ms]').astype(np.int64)
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        dataset = f"{directory}/reports"
+        write_columns(dataset, dataset_zones.tolist(), zone_codes, type_codes, timestamps)
+
+        def run():
+            failures[:] = train_model.train_and_update_predictions(
+                source="file", fetch_mode="columnar", reports_path=dataset,
+                predictions_path=f"{directory}/predictions.ndjson", summary_path=f"{directory}/summary.csv",
+                quiet=True)
+
+        result = measure(run, **opts)
+    if failures:
+        raise RuntimeError(f"end_to_end: {len(failures)} of {len(zone_ids)} zones failed")
+    return {"records": len(reports), **result}
+
+
+def bench_end_to_end(zone_ids, reports: pd.DataFrame, mongo_uri: str, **opts) -> dict:
+    """
+    train_and_update_predictions over the reports; fails if any zone went unwritten,
+    so timings are never reported for a run whose write batches failed
+    """
+    client, db = open_stand_in(mongo_uri)
+    db.parkingzones.insert_many([{"zoneId": z, "zoneName": z, "capacity": 40} for z in zone_ids])
+    documents = reports.assign(timestamp=reports["timestamp"].dt.tz_convert(None)).to_dict("records")
+    for i in range(0, len(documents), 50000):
+        db.userreports.insert_many(documents[i:i + 50000], ordered=False)
+    db.userreports.create_index([("zoneId", 1), ("timestamp", -1)])
+
+    run_starts = []
+
+    def run():
+        run_starts.append(datetime.now(UTC))
+        train_model.train_and_update_predictions(db=db)
+
+    result = measure(run, **opts)
+    # Every run rewrites every zone, so a zone the last run did not update was in a failed write batch
+    unwritten = db.parkingzones.count_documents({"$or": [{"lastUpdated": {"$exists": False}},
+                                                         {"lastUpdated": {"$lt": run_starts[-1]}}]})
+    client.drop_database(BENCH_DATABASE)
+    client.close()
+    if unwritten:
+        raise RuntimeError(f"end_to_end: {unwritten} of {len(zone_ids)} zones were not written; "
+                           "failed write batches would make the timings meaningless")
+    return {"records": len(reports), **result}
+
+
+def compare_to_baseline(results: list, baseline: list, tolerance: float) -> list:
+    """Cases whose wall time grew by more than tolerance (fractional) over the baseline"""
+    key = lambda r: (r["stage"], r["zones"], r["reports"])
+    previous = {key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before and result["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append({**result, "baseline_seconds": before["seconds"],
+                                "slowdown": result["seconds"] / before["seconds"]})
+    return regressions
+
+
+def parse_int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ParkWise generation and training")
+    parser.add_argument("--stages", default="generate,occupancy,predict,end_to_end",
+                        help="comma-separated subset of generate,occupancy,predict,end_to_end")
+    parser.add_argument("--zones", type=parse_int_list, default=[100, 1000])
+    parser.add_argument("--reports", type=parse_int_list, default=[10000, 100000])
+    parser.add_argument("--e2e-max-reports", type=int, default=20000,
+                        help="skip end_to_end cases above this many reports")
+    parser.add_argument("--mongo-uri",
+                        help="local mongod for end_to_end (default: in-process on the file source)")
+    parser.add_argument("--repeat", type=int, default=1, help="report the best of this many runs")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write all results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results file to compare against")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed fractional slowdown before a case counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = args.stages.split(",")
+    opts = {"track_memory": not args.no_memory, "repeat": args.repeat}
+    rng = np.random.default_rng(args.seed)
+    results = []
+
+    def emit(stage, zones, reports, result):
+        record = {"stage": stage, "zones": zones, "reports": reports, **result}
+        record["records_per_s"] = record.pop("records") / record["seconds"] if record["seconds"] else None
+        results.append(record)
+        print(json.dumps(record), flush=True)
+
+    for num_zones in args.zones:
+        for num_reports in args.reports:
+            if "generate" in stages:
+                emit("generate", num_zones, num_reports, bench_generate(num_zones, num_reports, rng, **opts))
+            zone_ids, reports = synthetic_reports(num_zones, num_reports, rng)
+            if "occupancy" in stages:
+                emit("occupancy", num_zones, num_reports, bench_occupancy(zone_ids, reports, **opts))
+            if "predict" in stages:
+                emit("predict", num_zones, num_reports, bench_predict(zone_ids, reports, **opts))
+            if "end_to_end" in stages and num_reports <= args.e2e_max_reports:
+                if args.mongo_uri:
+                    result = bench_end_to_end(zone_ids, reports, args.mongo_uri, **opts)
+                else:
+                    result = bench_end_to_end_file(zone_ids, reports, **opts)
+                emit("end_to_end", num_zones, num_reports, result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['stage']} zones={regression['zones']} reports={regression['reports']}: "
+                  f"{regression['seconds']:.3f}s vs {regression['baseline_seconds']:.3f}s "
+                  f"({regression['slowdown']:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
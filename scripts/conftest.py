@@ -0,0 +1,22 @@
+"""Shared fixtures: a small generated report dataset the trainer can read offline"""
+from datetime import datetime
+
+import pytest
+
+from generate_parking_data import iter_sharded_chunks, load_test_zone_ids, write_columnar
+
+TEST_START = datetime(2025, 1, 6)
+
+
+@pytest.fixture(scope="session")
+def zone_ids():
+    return load_test_zone_ids(12)
+
+
+@pytest.fixture(scope="session")
+def report_dataset(tmp_path_factory, zone_ids):
+    """Columnar dataset of three weeks of reports for a dozen zones"""
+    directory = str(tmp_path_factory.mktemp("reports") / "reports")
+    write_columnar(iter_sharded_chunks(6000, seed=7, start_date=TEST_START, num_days=21, zone_ids=zone_ids),
+                   directory)
+    return directory
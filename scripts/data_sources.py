@@ -0,0 +1,261 @@
+"""
+Where the trainer reads zones and reports from, and where predictions go.
+
+  mongo  parkingzones and userreports in MongoDB; predictions are written back to parkingzones
+  file   a report file written by generate_parking_data.py (JSON, NDJSON, gzip'd NDJSON or
+         a columnar dataset); zones are the ones it reports on, predictions go to a local
+         NDJSON file
+
+The file source lets the whole training path run offline, e.g. for profiling and
+load tests on a single machine.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pymongo
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from report_columns import REPORT_TYPES, is_columnar_dataset, load_columns
+
+SOURCES = ["mongo", "file"]
+
+# Records parsed per batch when converting JSON reports to columns
+_PARSE_BATCH = 100000
+
+
+def connect_to_database(mongo_uri: str = None):
+    """Open a MongoClient on MONGO_URI (or the given URI) and return (client, db)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    client = pymongo.MongoClient(mongo_uri or os.getenv("MONGO_URI"))
+    return client, client.ParkWiseDB
+
+
+def _timestamp_text(value) -> str:
+    """ISO text (without the Z suffix) of a plain, datetime or extended-JSON ({"$date": ...}) timestamp"""
+    if isinstance(value, dict):
+        value = value["$date"]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, (int, float)):
+        return str(np.datetime64(int(value), 'ms'))
+    return value.rstrip("Z").replace("+00:00", "")
+
+
+class _ColumnBuilder:
+    """Converts batches of parsed report records into report_columns arrays with shared zone codes"""
+
+    def __init__(self):
+        self.zone_codes: Dict[str, int] = {}
+        self.type_codes = {report_type: code for code, report_type in enumerate(REPORT_TYPES)}
+
+    def chunk(self, records: List[dict]) -> Dict[str, np.ndarray]:
+        zone_codes = self.zone_codes
+        zones = [zone_codes.setdefault(r["zoneId"], len(zone_codes)) for r in records]
+        timestamps = np.array([_timestamp_text(r["timestamp"]) for r in records], dtype='datetime64[ms]')
+        return {
+            "zone": np.array(zones, dtype=np.int32),
+            "reportType": np.array([self.type_codes[r["reportType"]] for r in records], dtype=np.uint8),
+            "timestamp": timestamps.astype(np.int64),
+            "zone_ids": np.array(list(zone_codes), dtype=object)
+        }
+
+
+def columns_from_records(records: List[dict]) -> Dict[str, np.ndarray]:
+    """In-memory report dicts (plain or extended-JSON timestamps) as report_columns arrays"""
+    return _ColumnBuilder().chunk(records)
+
+
+def _record_batches(path: str, batch_size: int):
+    if path.endswith(".json"):
+        with open(path) as f:
+            records = json.load(f)
+        for i in range(0, len(records), batch_size):
+            yield records[i:i + batch_size]
+        return
+
+    # NDJSON, optionally gzip-compressed, streamed
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def iter_report_chunks(path: str, chunk_size: int = _PARSE_BATCH):
+    """
+    Reports of any generator output format as a stream of report_columns chunks (zone,
+    reportType, timestamp in epoch ms, zone_ids). Zone codes are shared by all chunks of a
+    file, and each chunk's zone_ids covers every code seen so far.
+    Columnar datasets are memory-mapped and sliced, so memory stays bounded by chunk_size.
+    """
+    if is_columnar_dataset(path):
+        columns = load_columns(path)
+        for i in range(0, len(columns["zone"]), chunk_size):
+            yield {
+                name: values if name == "zone_ids" else values[i:i + chunk_size]
+                for name, values in columns.items()
+            }
+        return
+
+    builder = _ColumnBuilder()
+    for records in _record_batches(path, chunk_size):
+        yield builder.chunk(records)
+
+
+def read_report_columns(path: str) -> Dict[str, np.ndarray]:
+    """
+    Reports of any generator output format as report_columns arrays
+    (zone, reportType, timestamp in epoch ms, zone_ids). Columnar datasets are memory-mapped.
+    """
+    if is_columnar_dataset(path):
+        return load_columns(path)
+
+    chunks = list(iter_report_chunks(path))
+    dtypes = {"zone": np.int32, "reportType": np.uint8, "timestamp": np.int64}
+    columns = {
+        name: np.concatenate([c[name] for c in chunks]) if chunks else np.empty(0, dtype=dtype)
+        for name, dtype in dtypes.items()
+    }
+    columns["zone_ids"] = chunks[-1]["zone_ids"] if chunks else np.empty(0, dtype=object)
+    return columns
+
+
+@lru_cache(maxsize=4)
+def _cached_report_columns(path: str, modified: float) -> Dict[str, np.ndarray]:
+    return read_report_columns(path)
+
+
+def load_report_columns(path: str) -> Dict[str, np.ndarray]:
+    """read_report_columns, parsed once per process for as long as the file is unchanged"""
+    return _cached_report_columns(os.path.abspath(path), os.path.getmtime(path))
+
+
+@lru_cache(maxsize=4)
+def _cached_zone_row_index(path: str, modified: float) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    return zone_row_index(_cached_report_columns(path, modified))
+
+
+def zone_row_index(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """
+    Rows of report_columns grouped by zone with one stable argsort: (order, offsets, code of
+    each zone id), zone code c's rows being order[offsets[c]:offsets[c + 1]]
+    """
+    zone_codes = np.asarray(columns["zone"])
+    num_zones = len(columns["zone_ids"])
+    order = np.argsort(zone_codes, kind="stable")
+    offsets = np.zeros(num_zones + 1, dtype=np.int64)
+    np.cumsum(np.bincount(zone_codes, minlength=num_zones), out=offsets[1:])
+    return order, offsets, {zone_id: code for code, zone_id in enumerate(columns["zone_ids"].tolist())}
+
+
+def load_zone_report_columns(path: str, zone_ids: List[str]) -> Dict[str, np.ndarray]:
+    """
+    load_report_columns restricted to the reports of some zones. The file's zone index is
+    built once per process, so each call only touches the requested zones' rows.
+    """
+    path = os.path.abspath(path)
+    modified = os.path.getmtime(path)
+    columns = _cached_report_columns(path, modified)
+    order, offsets, code_of = _cached_zone_row_index(path, modified)
+    codes = [code_of[zone_id] for zone_id in zone_ids if zone_id in code_of]
+    rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in codes]) if codes else np.empty(0, np.int64)
+    selected = {name: np.asarray(values)[rows] for name, values in columns.items() if name != "zone_ids"}
+    selected["zone_ids"] = columns["zone_ids"]
+    return selected
+
+
+def file_zone_documents(path: str) -> List[dict]:
+    """Zone documents for every zone the report file mentions"""
+    return [{"zoneId": zone_id, "zoneName": ""} for zone_id in load_report_columns(path)["zone_ids"].tolist()]
+
+
+# ---------------- PREDICTION SINKS ----------------
+class MongoPredictionSink:
+    """Sets prediction updates on parkingzones with unordered bulk_write, removing unset_fields"""
+
+    def __init__(self, collection, unset_fields=()):
+        self.collection = collection
+        self._unset = {field: "" for field in unset_fields}
+
+    def _operations(self, updates: list) -> list:
+        operations = []
+        for zone_id, update_data in updates:
+            update = {"$set": update_data}
+            if self._unset:
+                update["$unset"] = self._unset
+            operations.append(UpdateOne({"zoneId": zone_id}, update))
+        return operations
+
+    @staticmethod
+    def _failure(error: PyMongoError, updates: list) -> tuple:
+        if isinstance(error, BulkWriteError):
+            # Unordered: the rest of the batch is still applied
+            errors = [(updates[err["index"]][0], err.get("errmsg", ""))
+                      for err in error.details.get("writeErrors", [])]
+            return error.details.get("nMatched", 0), errors
+        return 0, [(zone_id, str(error)) for zone_id, _ in updates]
+
+    def write(self, updates: list) -> tuple:
+        """Apply (zone_id, update_data) pairs; returns (matched count, (zone_id, error message) pairs)"""
+        operations = self._operations(updates)
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.matched_count, []
+        except PyMongoError as e:
+            return self._failure(e, updates)
+
+    def close(self):
+        pass
+
+
+class AsyncMongoPredictionSink(MongoPredictionSink):
+    """MongoPredictionSink on an AsyncMongoClient collection; write is a coroutine"""
+
+    async def write(self, updates: list) -> tuple:
+        operations = self._operations(updates)
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            return result.matched_count, []
+        except PyMongoError as e:
+            return self._failure(e, updates)
+
+
+class LocalPredictionSink:
+    """Writes every zone's update as one extended-JSON line of a local NDJSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, updates: list) -> tuple:
+        self._file.write("".join(
+            json_util.dumps({"zoneId": zone_id, **update_data}) + "\n" for zone_id, update_data in updates
+        ))
+        return len(updates), []
+
+    def close(self):
+        self._file.close()
+
+
+def read_local_predictions(path: str) -> Dict[str, dict]:
+    """zoneId -> update document from a LocalPredictionSink file"""
+    with open(path, encoding="utf-8") as f:
+        documents = (json_util.loads(line) for line in f if line.strip())
+        return {doc["zoneId"]: doc for doc in documents}
@@ -0,0 +1,299 @@
+"""
+Real-time availability nowcaster.
+
+A long-running companion to the nightly train_model.py job. It follows new
+userreports as they arrive, keeps each zone's current-hour report counts, and
+turns them into a current availability and a short-horizon forecast with the
+same rules the trainer applies to historical hours (adjust_availability over the
+category baselines). Updated zones are written to parkingzones.nowcast in
+coalesced batches every few seconds:
+
+  nowcast: {
+    hour:               start of the current hour
+    reportCounts:       {parked, left, full, empty} so far this hour
+    availabilityScore:  current-hour availability
+    predictions:        [{timestamp, availabilityScore, confidence}] for the next hours
+    updatedAt
+  }
+
+Sources:
+  change-stream  tail userreports inserts (needs a replica set, e.g. Atlas)
+  replay         replay a report file (any generator output) in timestamp order,
+                 as fast as possible or at --speed times real time
+
+Every report is O(1): it bumps one counter and marks its zone dirty. The forecast
+is computed, vectorized, only for the dirty zones of each flush.
+"""
+import argparse
+import time
+from datetime import datetime, UTC
+
+import numpy as np
+
+from data_sources import LocalPredictionSink, MongoPredictionSink, connect_to_database, load_report_columns
+from quantile_sketch import DEFAULT_CONFIDENCE
+from report_columns import REPORT_TYPES
+from train_model import BASELINE_TABLES, adjust_availability, categorize_zone, categorize_zone_batch, category_codes
+
+MS_PER_HOUR = 3600 * 1000
+HOURS_PER_DAY = 24
+# 1970-01-01, hour 0 of the epoch, was a Thursday
+EPOCH_WEEKDAY = 3
+
+TYPE_CODES = {report_type: code for code, report_type in enumerate(REPORT_TYPES)}
+
+
+def _epoch_ms(timestamp) -> int:
+    """Epoch milliseconds of a datetime (naive means UTC, as pymongo returns them) or of epoch ms"""
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=UTC)
+        return int(timestamp.timestamp() * 1000)
+    return int(timestamp)
+
+
+class Nowcaster:
+    """
+    Per-zone current-hour report counts and the nowcasts derived from them.
+    The deviation of the current hour from its category baseline is carried into the
+    next horizon_hours hours, shrinking by decay per hour.
+    """
+
+    def __init__(self, zone_categories: dict = None, horizon_hours: int = 6, decay: float = 0.7):
+        self.horizon_hours = horizon_hours
+        self.decay = decay
+        self._categories = dict(zone_categories or {})
+        # zoneId -> [epoch hour, parked, left, full, empty]
+        self._zones = {}
+        # zoneId -> monotonic time it became dirty, in first-dirtied order
+        self._dirty = {}
+        self.reports = 0
+        self.late_reports = 0
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def observe(self, zone_id: str, report_type: str, timestamp) -> bool:
+        """
+        Count one report. Reports for an hour before the zone's current one are too late to
+        change the nowcast and are only counted as late. Returns whether the zone changed.
+        """
+        code = TYPE_CODES.get(report_type)
+        if code is None:
+            return False
+        self.reports += 1
+        hour = _epoch_ms(timestamp) // MS_PER_HOUR
+        state = self._zones.get(zone_id)
+        if state is None or hour > state[0]:
+            state = self._zones[zone_id] = [hour, 0, 0, 0, 0]
+        elif hour < state[0]:
+            self.late_reports += 1
+            return False
+        state[1 + code] += 1
+        if zone_id not in self._dirty:
+            self._dirty[zone_id] = time.monotonic()
+        return True
+
+    def _category(self, zone_id: str) -> str:
+        category = self._categories.get(zone_id)
+        if category is None:
+            category = self._categories[zone_id] = categorize_zone(zone_id)
+        return category
+
+    def nowcasts(self, zone_ids: list) -> list:
+        """(zone_id, parkingzones $set document) of each zone's nowcast, computed in one pass"""
+        if not zone_ids:
+            return []
+        states = np.array([self._zones[z] for z in zone_ids], dtype=np.int64)
+        codes = category_codes([self._category(z) for z in zone_ids])
+        steps = np.arange(self.horizon_hours + 1)
+
+        # Baseline of the current hour (step 0) and every horizon hour
+        epoch_hours = states[:, :1] + steps[None, :]
+        weekdays = (epoch_hours // HOURS_PER_DAY + EPOCH_WEEKDAY) % 7
+        baseline = BASELINE_TABLES[codes[:, None], weekdays, epoch_hours % HOURS_PER_DAY]
+
+        parked, left, full, empty = states[:, 1], states[:, 2], states[:, 3], states[:, 4]
+        current = adjust_availability(baseline[:, 0], parked, left, full, empty)
+        carry = self.decay ** steps
+        scores = np.clip(baseline + (current - baseline[:, 0])[:, None] * carry[None, :], 0.05, 0.95)
+
+        # More reports this hour, more confidence, fading back to the default
+        reported = states[:, 1:].sum(axis=1)
+        current_confidence = np.minimum(0.95, DEFAULT_CONFIDENCE + 0.1 * reported)
+        confidence = DEFAULT_CONFIDENCE + (current_confidence[:, None] - DEFAULT_CONFIDENCE) * carry[None, :]
+
+        updated_at = datetime.now(UTC)
+        updates = []
+        for row, zone_id in enumerate(zone_ids):
+            hour_ms = int(states[row, 0]) * MS_PER_HOUR
+            timestamps = [
+                datetime.fromtimestamp((hour_ms + int(step) * MS_PER_HOUR) / 1000, UTC) for step in steps
+            ]
+            updates.append((zone_id, {"nowcast": {
+                "hour": timestamps[0],
+                "reportCounts": dict(zip(REPORT_TYPES, states[row, 1:].tolist())),
+                "availabilityScore": float(scores[row, 0]),
+                "predictions": [
+                    {"timestamp": t.isoformat(), "availabilityScore": s, "confidence": c}
+                    for t, s, c in zip(timestamps[1:], scores[row, 1:].tolist(), confidence[row, 1:].tolist())
+                ],
+                "updatedAt": updated_at
+            }}))
+        return updates
+
+    def drain(self) -> tuple:
+        """Nowcasts of every dirty zone, and how long the oldest of them waited; clears the dirty set"""
+        if not self._dirty:
+            return [], 0.0
+        oldest = time.monotonic() - next(iter(self._dirty.values()))
+        zone_ids = list(self._dirty)
+        self._dirty.clear()
+        return self.nowcasts(zone_ids), oldest
+
+
+# ---------------- REPORT SOURCES ----------------
+# Sources yield (zoneId, reportType, timestamp) tuples, and None when idle so the
+# service can still flush on time
+
+def change_stream_reports(collection, max_await_ms: int = 500):
+    """New userreports inserts from a change stream"""
+    pipeline = [{"$match": {"operationType": "insert"}}]
+    with collection.watch(pipeline, max_await_time_ms=max_await_ms) as stream:
+        while stream.alive:
+            change = stream.try_next()
+            if change is None:
+                yield None
+                continue
+            report = change["fullDocument"]
+            yield report["zoneId"], report["reportType"], report["timestamp"]
+
+
+def replay_reports(path: str, speed: float = 0.0):
+    """
+    Reports of a report file in timestamp order. speed 0 replays as fast as possible,
+    otherwise speed times faster than the reports' own timeline.
+    """
+    columns = load_report_columns(path)
+    order = np.argsort(columns["timestamp"], kind="stable")
+    zone_ids = columns["zone_ids"][np.asarray(columns["zone"])[order]].tolist()
+    report_types = np.array(REPORT_TYPES)[np.asarray(columns["reportType"])[order]].tolist()
+    timestamps = np.asarray(columns["timestamp"])[order].tolist()
+    yield from replay_records(zip(zone_ids, report_types, timestamps), speed)
+
+
+def replay_records(reports, speed: float = 0.0):
+    """In-memory (zoneId, reportType, timestamp) reports, paced like replay_reports"""
+    started, first = time.monotonic(), None
+    for zone_id, report_type, timestamp in reports:
+        if speed > 0:
+            timestamp_ms = _epoch_ms(timestamp)
+            first = timestamp_ms if first is None else first
+            delay = (timestamp_ms - first) / 1000 / speed - (time.monotonic() - started)
+            while delay > 0:
+                # Idle ticks while waiting, so due flushes are not held back
+                time.sleep(min(delay, 0.5))
+                yield None
+                delay = (timestamp_ms - first) / 1000 / speed - (time.monotonic() - started)
+        yield zone_id, report_type, timestamp
+
+
+# ---------------- SERVICE LOOP ----------------
+def run_nowcaster(reports, nowcaster: Nowcaster, sink, flush_seconds: float = 2.0,
+                  batch_size: int = 500) -> dict:
+    """
+    Feed reports through the nowcaster and write dirty zones to the sink whenever
+    flush_seconds have passed or batch_size zones are waiting, coalescing all reports a zone
+    got in between into one update. Runs until the source ends; returns run statistics.
+    """
+    stats = {"reports": 0, "flushes": 0, "writes": 0, "failed": 0, "maxStaleness": 0.0}
+
+    def flush():
+        updates, oldest = nowcaster.drain()
+        if not updates:
+            return
+        started = time.perf_counter()
+        _, errors = sink.write(updates)
+        stats["flushes"] += 1
+        stats["writes"] += len(updates)
+        stats["failed"] += len(errors)
+        stats["maxStaleness"] = max(stats["maxStaleness"], oldest)
+        print(f"   💾 Flush {stats['flushes']}: {len(updates)} zones in {(time.perf_counter() - started) * 1000:.0f} ms "
+              f"(oldest change waited {oldest:.2f}s, {len(errors)} failed)")
+
+    last_flush = time.monotonic()
+    try:
+        for report in reports:
+            if report is not None:
+                nowcaster.observe(*report)
+            if nowcaster.dirty_count >= batch_size or time.monotonic() - last_flush >= flush_seconds:
+                flush()
+                last_flush = time.monotonic()
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopping")
+    finally:
+        flush()
+        sink.close()
+    stats["reports"] = nowcaster.reports
+    stats["lateReports"] = nowcaster.late_reports
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Real-time ParkWise availability nowcaster")
+    parser.add_argument("--source", choices=["change-stream", "replay"], default="change-stream",
+                        help="change-stream: follow userreports inserts; replay: replay --replay-from")
+    parser.add_argument("--replay-from", metavar="PATH",
+                        help="report file to replay: .json, .ndjson(.gz) or a columnar dataset directory")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="with --source replay, times faster than real time (0: as fast as possible)")
+    parser.add_argument("--predictions-to", metavar="PATH",
+                        help="write nowcasts to this local NDJSON file instead of parkingzones")
+    parser.add_argument("--mongo-uri", help="database to use (default: MONGO_URI)")
+    parser.add_argument("--horizon-hours", type=int, default=6, help="hours of nowcast predictions per zone")
+    parser.add_argument("--decay", type=float, default=0.7,
+                        help="share of the current hour's deviation from baseline carried into each next hour")
+    parser.add_argument("--flush-seconds", type=float, default=2.0, help="longest a zone's change waits for a write")
+    parser.add_argument("--batch-size", type=int, default=500, help="flush early once this many zones changed")
+    args = parser.parse_args(argv)
+    if args.source == "replay" and not args.replay_from:
+        parser.error("--source replay needs --replay-from")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    offline = args.source == "replay" and args.predictions_to
+    client, db = (None, None) if offline else connect_to_database(args.mongo_uri)
+
+    zone_categories = {}
+    if db is not None:
+        zone_categories = categorize_zone_batch(list(db.parkingzones.find({}, {
+            "zoneId": 1, "zoneName": 1, "category": 1
+        })))
+    nowcaster = Nowcaster(zone_categories, args.horizon_hours, args.decay)
+    if args.predictions_to:
+        sink = LocalPredictionSink(args.predictions_to)
+    else:
+        sink = MongoPredictionSink(db.parkingzones)
+
+    if args.source == "change-stream":
+        print("📡 Following userreports inserts (Ctrl-C to stop)...")
+        reports = change_stream_reports(db.userreports)
+    else:
+        print(f"⏪ Replaying {args.replay_from}" + (f" at {args.speed:g}x" if args.speed else ""))
+        reports = replay_reports(args.replay_from, args.speed)
+
+    started = time.perf_counter()
+    stats = run_nowcaster(reports, nowcaster, sink, args.flush_seconds, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"\n✓ {stats['reports']:,} reports ({stats['lateReports']:,} late) in {elapsed:.1f}s, "
+          f"{stats['reports'] / elapsed if elapsed else 0:,.0f}/s; {stats['writes']:,} zone writes in "
+          f"{stats['flushes']} flushes, oldest change waited {stats['maxStaleness']:.2f}s")
+    if client is not None:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
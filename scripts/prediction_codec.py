@@ -0,0 +1,121 @@
+"""
+Packed encoding of zone predictions.
+
+The list format stores one {timestamp, availabilityScore, confidence} dict per
+hour. The packed format stores the horizon once:
+
+  {
+    "version": 1,
+    "start": <datetime of the first prediction>,
+    "stepMinutes": 60,
+    "scores": <Binary, one uint8 percent per step>,
+    "confidence": <Binary uint8 percents, or one number when constant>,
+    "p10", "p50", "p90": <Binary uint8 percents, 255 where unknown; only with bounds>
+  }
+
+which is ~100 bytes for a day instead of ~2.5 KB, so week-long horizons stay cheap.
+"""
+from datetime import datetime, timedelta, UTC
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from bson import Binary
+
+from quantile_sketch import DEFAULT_CONFIDENCE, QUANTILE_FIELDS
+
+PACKED_VERSION = 1
+# Packed bound of an hour without enough history for one
+_UNKNOWN_BOUND = 255
+
+
+def _quantize(values) -> bytes:
+    return np.rint(np.clip(np.asarray(values, dtype=float), 0, 1) * 100).astype(np.uint8).tobytes()
+
+
+def _dequantize(packed: bytes) -> np.ndarray:
+    return np.frombuffer(packed, dtype=np.uint8) / 100.0
+
+
+def encode_predictions(start: datetime, scores: Sequence[float], step: timedelta = timedelta(hours=1),
+                       confidence: Union[float, Sequence[float]] = DEFAULT_CONFIDENCE,
+                       bounds: np.ndarray = None) -> dict:
+    """
+    Packed document for scores at start, start + step, ...
+    bounds is an optional (steps, 3) array of p10/p50/p90 (NaN where unknown).
+    """
+    if np.ndim(confidence) == 0:
+        packed_confidence = float(confidence)
+    else:
+        packed_confidence = Binary(_quantize(confidence))
+    packed = {
+        "version": PACKED_VERSION,
+        "start": start,
+        "stepMinutes": int(step.total_seconds() // 60),
+        "scores": Binary(_quantize(scores)),
+        "confidence": packed_confidence
+    }
+    if bounds is not None and not np.isnan(bounds).all():
+        for field, values in zip(QUANTILE_FIELDS, np.asarray(bounds, dtype=float).T):
+            quantized = np.frombuffer(_quantize(np.nan_to_num(values)), dtype=np.uint8)
+            packed[field] = Binary(np.where(np.isnan(values), _UNKNOWN_BOUND, quantized).astype(np.uint8).tobytes())
+    return packed
+
+
+def encode_prediction_list(predictions: List[dict]) -> dict:
+    """Packed document from the list format; entries must be evenly spaced"""
+    if not predictions:
+        return encode_predictions(None, [])
+    timestamps = [datetime.fromisoformat(p["timestamp"]) for p in predictions]
+    step = timestamps[1] - timestamps[0] if len(timestamps) > 1 else timedelta(hours=1)
+    confidence = [p.get("confidence", DEFAULT_CONFIDENCE) for p in predictions]
+    if len(set(confidence)) == 1:
+        confidence = confidence[0]
+    bounds = np.array([[p.get(field, np.nan) for field in QUANTILE_FIELDS] for p in predictions], dtype=float)
+    return encode_predictions(timestamps[0], [p["availabilityScore"] for p in predictions], step, confidence,
+                              bounds)
+
+
+def decode_arrays(packed: dict) -> Tuple[List[datetime], np.ndarray, np.ndarray]:
+    """Timestamps, scores and confidences of a packed document"""
+    scores = _dequantize(packed["scores"])
+    confidence = packed.get("confidence", DEFAULT_CONFIDENCE)
+    if isinstance(confidence, (bytes, Binary)):
+        confidence = _dequantize(confidence)
+    else:
+        confidence = np.full(len(scores), float(confidence))
+    step = timedelta(minutes=packed["stepMinutes"])
+    start = packed["start"]
+    if start is not None and start.tzinfo is None:
+        # pymongo hands dates back naive, in UTC
+        start = start.replace(tzinfo=UTC)
+    timestamps = [start + i * step for i in range(len(scores))]
+    return timestamps, scores, confidence
+
+
+def decode_bounds(packed: dict) -> Optional[np.ndarray]:
+    """(steps, 3) p10/p50/p90 of a packed document (NaN where unknown), None if it has none"""
+    if QUANTILE_FIELDS[0] not in packed:
+        return None
+    columns = [np.frombuffer(packed[field], dtype=np.uint8) for field in QUANTILE_FIELDS]
+    return np.stack([np.where(c == _UNKNOWN_BOUND, np.nan, c / 100.0) for c in columns], axis=1)
+
+
+def decode_predictions(packed: dict) -> List[dict]:
+    """The list format back from a packed document (scores and bounds at 1% resolution)"""
+    timestamps, scores, confidence = decode_arrays(packed)
+    predictions = [
+        {"timestamp": t.isoformat(), "availabilityScore": score, "confidence": c}
+        for t, score, c in zip(timestamps, scores.tolist(), confidence.tolist())
+    ]
+    bounds = decode_bounds(packed)
+    if bounds is not None:
+        for prediction, row in zip(predictions, bounds.tolist()):
+            prediction.update({field: value for field, value in zip(QUANTILE_FIELDS, row) if not np.isnan(value)})
+    return predictions
+
+
+def zone_predictions(zone: dict) -> List[dict]:
+    """Predictions of a parkingzones document in the list format, whichever way they are stored"""
+    if zone.get("packedPredictions"):
+        return decode_predictions(zone["packedPredictions"])
+    return zone.get("predictions", [])
@@ -0,0 +1,221 @@
+"""
+Festival and seasonal weather calendar for Pune, compiled once into per-date arrays.
+
+The data generator and the trainer both look dates up here (one at a time or as a
+whole datetime64 array) instead of re-parsing festival tables or re-deriving the
+season inside their hot loops.
+
+Lunar festival dates are listed for a few years below; more years come from a JSON
+table in the same shape ({"2028": {"2028-01-15": {"name": ..., "impact": ...,
+"duration": ...}}}) named by PARKWISE_FESTIVALS or passed to load_festival_table.
+Years with no lunar dates get a warning and only the fixed-date festivals, with the
+festival rush falling back to September 1-15.
+"""
+import json
+import os
+import warnings
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Festivals whose dates move every year (lunar calendar), with the same impact and
+# duration semantics as the generator: impact is the availability multiplier on the
+# day itself, fading out over `duration` days on either side.
+FESTIVALS = {
+    2024: {
+        "2024-01-15": {"name": "Makar Sankranti", "impact": 0.4, "duration": 2},
+        "2024-03-08": {"name": "Maha Shivratri", "impact": 0.3, "duration": 2},
+        "2024-03-25": {"name": "Holi", "impact": 0.2, "duration": 2},
+        "2024-04-09": {"name": "Gudi Padwa", "impact": 0.3, "duration": 1},
+        "2024-09-07": {"name": "Ganesh Chaturthi", "impact": 0.1, "duration": 11},
+        "2024-10-31": {"name": "Diwali", "impact": 0.2, "duration": 5},
+    },
+    2025: {
+        "2025-01-14": {"name": "Makar Sankranti", "impact": 0.4, "duration": 2},
+        "2025-02-26": {"name": "Maha Shivratri", "impact": 0.3, "duration": 2},
+        "2025-03-14": {"name": "Holi", "impact": 0.2, "duration": 2},
+        "2025-04-13": {"name": "Gudi Padwa", "impact": 0.3, "duration": 1},
+        "2025-08-16": {"name": "Ganesh Chaturthi", "impact": 0.1, "duration": 11},  # Major festival
+        "2025-10-20": {"name": "Diwali", "impact": 0.2, "duration": 5},
+        "2025-08-20": {"name": "Independence Day", "impact": 0.4, "duration": 1},
+        "2025-10-02": {"name": "Gandhi Jayanti", "impact": 0.5, "duration": 1},
+        "2025-12-25": {"name": "Christmas", "impact": 0.3, "duration": 2}
+    },
+    2026: {
+        "2026-01-14": {"name": "Makar Sankranti", "impact": 0.4, "duration": 2},
+        "2026-02-15": {"name": "Maha Shivratri", "impact": 0.3, "duration": 2},
+        "2026-03-04": {"name": "Holi", "impact": 0.2, "duration": 2},
+        "2026-03-19": {"name": "Gudi Padwa", "impact": 0.3, "duration": 1},
+        "2026-09-14": {"name": "Ganesh Chaturthi", "impact": 0.1, "duration": 11},
+        "2026-11-08": {"name": "Diwali", "impact": 0.2, "duration": 5},
+    },
+    2027: {
+        "2027-01-15": {"name": "Makar Sankranti", "impact": 0.4, "duration": 2},
+        "2027-03-06": {"name": "Maha Shivratri", "impact": 0.3, "duration": 2},
+        "2027-03-22": {"name": "Holi", "impact": 0.2, "duration": 2},
+        "2027-04-07": {"name": "Gudi Padwa", "impact": 0.3, "duration": 1},
+        "2027-09-04": {"name": "Ganesh Chaturthi", "impact": 0.1, "duration": 11},
+        "2027-10-29": {"name": "Diwali", "impact": 0.2, "duration": 5},
+    },
+}
+
+# Same date every year; added to any year that does not list them explicitly
+FIXED_FESTIVALS = {
+    "08-15": {"name": "Independence Day", "impact": 0.4, "duration": 1},
+    "10-02": {"name": "Gandhi Jayanti", "impact": 0.5, "duration": 1},
+    "12-25": {"name": "Christmas", "impact": 0.3, "duration": 2},
+}
+
+# Environment variable naming a JSON table of extra lunar festival years
+FESTIVALS_ENV = "PARKWISE_FESTIVALS"
+
+# Days the trainer treats as quieter public holidays (month, day)
+NATIONAL_HOLIDAYS = [(8, 15)]
+
+# The festival whose whole run makes markets and shopping streets busier, and its
+# (month, first day, last day) in years whose lunar dates are unknown
+RUSH_FESTIVAL = "Ganesh Chaturthi"
+FALLBACK_RUSH = (9, 1, 15)
+
+SEASONS = ["monsoon", "winter", "summer", "pleasant"]
+MONSOON, WINTER, SUMMER, PLEASANT = range(len(SEASONS))
+MONTH_SEASON = np.array([
+    PLEASANT,                                  # (unused month 0)
+    WINTER, WINTER, SUMMER, SUMMER, SUMMER,    # Jan - May
+    MONSOON, MONSOON, MONSOON, MONSOON,        # Jun - Sep
+    PLEASANT, WINTER, WINTER                   # Oct - Dec
+], dtype=np.uint8)
+
+# Range of the generator's random weather multiplier per season
+WEATHER_RANGES = np.array([
+    (1.1, 1.3),  # Monsoon: more availability due to less activity
+    (0.9, 1.0),  # Winter: slightly less availability
+    (1.0, 1.1),  # Summer: more availability in extreme heat
+    (0.8, 0.9),  # Pleasant weather: less availability, more activity
+])
+
+
+_warned_years = set()
+
+
+def load_festival_table(path: str) -> None:
+    """Add (or replace) the lunar festival years of a JSON table to FESTIVALS"""
+    with open(path) as f:
+        table = json.load(f)
+    FESTIVALS.update({int(year): festivals for year, festivals in table.items()})
+    get_calendar.cache_clear()
+
+
+def has_lunar_dates(year: int) -> bool:
+    return year in FESTIVALS
+
+
+def festivals_for_year(year: int) -> Dict[str, dict]:
+    """Festival table of one year: its lunar dates plus the fixed-date festivals"""
+    if not has_lunar_dates(year) and year not in _warned_years:
+        _warned_years.add(year)
+        warnings.warn(f"no lunar festival dates for {year} (set {FESTIVALS_ENV} to a festival table); "
+                      f"using the fixed-date festivals and a September 1-15 festival rush", stacklevel=2)
+    festivals = dict(FESTIVALS.get(year, {}))
+    listed = {info["name"] for info in festivals.values()}
+    for month_day, info in FIXED_FESTIVALS.items():
+        if info["name"] not in listed:
+            festivals[f"{year}-{month_day}"] = info
+    return festivals
+
+
+def _as_days(dates) -> np.ndarray:
+    """Any date-like scalar or array as datetime64[D]"""
+    values = np.asarray(dates)
+    if values.dtype == object:
+        values = np.array([d.date() if isinstance(d, datetime) else d for d in values.ravel()],
+                          dtype='datetime64[D]').reshape(values.shape)
+    return values.astype('datetime64[D]')
+
+
+class CalendarIndex:
+    """
+    Per-date factor arrays for every day of [first_year, last_year]:
+      festival_factor  generator festival multiplier (1.0 on ordinary days)
+      festival_rush    day falls in the RUSH_FESTIVAL run (FALLBACK_RUSH without lunar dates)
+      national_holiday day is one of NATIONAL_HOLIDAYS
+    Dates outside the compiled years look up as ordinary days.
+    """
+
+    def __init__(self, first_year: int, last_year: int):
+        self.first_year, self.last_year = first_year, last_year
+        self.origin = np.datetime64(f"{first_year}-01-01", 'D')
+        num_days = self._day_index(np.datetime64(f"{last_year + 1}-01-01", 'D'))
+
+        self.festival_factor = np.ones(num_days)
+        self.festival_rush = np.zeros(num_days, dtype=bool)
+        self.national_holiday = np.zeros(num_days, dtype=bool)
+
+        assigned = np.zeros(num_days, dtype=bool)
+        for year in range(first_year, last_year + 1):
+            for festival_date, info in festivals_for_year(year).items():
+                center = self._day_index(np.datetime64(festival_date, 'D'))
+                duration = info["duration"]
+                # The first festival listed wins where windows overlap
+                for offset in range(-duration, duration + 1):
+                    day = center + offset
+                    if 0 <= day < num_days and not assigned[day]:
+                        impact_factor = max(0.1, 1 - (abs(offset) / duration))
+                        self.festival_factor[day] = info["impact"] * impact_factor
+                        assigned[day] = True
+                if info["name"] == RUSH_FESTIVAL:
+                    self.festival_rush[max(0, center):max(0, center + duration + 1)] = True
+            if not has_lunar_dates(year):
+                month, first_day, last_day = FALLBACK_RUSH
+                first = self._day_index(np.datetime64(date(year, month, first_day), 'D'))
+                self.festival_rush[first:first + last_day - first_day + 1] = True
+            for month, day in NATIONAL_HOLIDAYS:
+                self.national_holiday[self._day_index(np.datetime64(date(year, month, day), 'D'))] = True
+
+    def _day_index(self, day: np.datetime64) -> int:
+        return int((day - self.origin).astype(np.int64))
+
+    def lookup(self, dates) -> Dict[str, np.ndarray]:
+        """Vectorized lookup of every factor for a date or an array of dates"""
+        days = _as_days(dates)
+        index = (days - self.origin).astype(np.int64)
+        inside = (index >= 0) & (index < len(self.festival_factor))
+        safe = np.where(inside, index, 0)
+        months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        return {
+            "festival_factor": np.where(inside, self.festival_factor[safe], 1.0),
+            "festival_rush": inside & self.festival_rush[safe],
+            "national_holiday": inside & self.national_holiday[safe],
+            "season": MONTH_SEASON[months],
+        }
+
+    def festival_factor_for(self, day) -> float:
+        return float(self.lookup(day)["festival_factor"])
+
+
+@lru_cache(maxsize=None)
+def get_calendar(first_year: int = None, last_year: int = None) -> CalendarIndex:
+    """Compiled calendar, cached per year range (defaults to every year in FESTIVALS)"""
+    return CalendarIndex(first_year or min(FESTIVALS), last_year or max(FESTIVALS))
+
+
+def calendar_for(*dates) -> CalendarIndex:
+    """Cached calendar covering the default years and the given dates"""
+    years = [d.year for d in dates]
+    return get_calendar(min(min(FESTIVALS), *years), max(max(FESTIVALS), *years))
+
+
+if os.environ.get(FESTIVALS_ENV):
+    load_festival_table(os.environ[FESTIVALS_ENV])
+
+
+def season_of(month: int) -> int:
+    return int(MONTH_SEASON[month])
+
+
+def weather_range(month: int) -> Tuple[float, float]:
+    """Range of the generator's weather multiplier for a month"""
+    low, high = WEATHER_RANGES[MONTH_SEASON[month]]
+    return float(low), float(high)
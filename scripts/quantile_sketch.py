@@ -0,0 +1,171 @@
+"""
+Mergeable availability sketches per zone and hour of week.
+
+A zone's sketch is a fixed-bin histogram of its hourly availability scores for each of
+the 168 hours of the week: SKETCH_BINS uint16 counters over [0, 1] per hour. Availability
+is bounded, so fixed bins give every quantile to within one bin width (2.5 points) in
+constant memory per zone (168 x 40 x 2 bytes, however long the history), and two sketches
+merge exactly by adding counts, which lets incremental training fold each run's new
+hours into the zone's stored sketch. Stored sketches are the zlib-compressed counts, a
+few hundred bytes for a zone with a few months of history, kept in their own collection
+rather than on the zone documents the API serves. Only incremental runs store them; the
+other fetch modes rebuild every sketch from the zones' full history on each run:
+
+  {"version": 1, "bins": 40, "counts": <Binary>}
+"""
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from bson import Binary
+
+SKETCH_VERSION = 1
+SKETCH_BINS = 40
+HOURS_OF_WEEK = 7 * 24
+_MAX_COUNT = np.iinfo(np.uint16).max
+
+# Quantiles reported with every prediction
+QUANTILES = (0.1, 0.5, 0.9)
+QUANTILE_FIELDS = ("p10", "p50", "p90")
+
+# Below this many samples in a zone's hour-of-week cell, the zone's hour of day is pooled over all weekdays
+MIN_CELL_SAMPLES = 3
+
+# Confidence of a prediction with no history behind it: zones without a sketch, stored
+# predictions without a confidence, and what nowcasts fade back to. PRIOR_SAMPLES is the
+# number of samples that weigh as much as it.
+DEFAULT_CONFIDENCE = 0.5
+PRIOR_SAMPLES = 4
+
+
+def hours_of_week(timestamps: pd.DatetimeIndex) -> np.ndarray:
+    """Hour of the week (Monday 00:00 is 0) of each timestamp"""
+    return np.asarray(timestamps.weekday, dtype=np.int64) * 24 + np.asarray(timestamps.hour, dtype=np.int64)
+
+
+def _add_saturating(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.minimum(a.astype(np.int64) + b, _MAX_COUNT).astype(np.uint16)
+
+
+def histogram_quantiles(counts: np.ndarray, quantiles: Sequence[float] = QUANTILES) -> np.ndarray:
+    """
+    Quantiles of fixed-bin histograms over [0, 1] (counts shape (..., bins)), interpolated
+    linearly inside the bin; shape (..., len(quantiles)), NaN for empty histograms
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    bins = counts.shape[-1]
+    cumulative = np.cumsum(counts, axis=-1)
+    total = cumulative[..., -1:]
+    values = []
+    for q in quantiles:
+        target = q * total
+        # First bin whose cumulative count reaches the target rank
+        index = np.minimum((cumulative < target).sum(axis=-1, keepdims=True), bins - 1)
+        before = np.take_along_axis(cumulative, index, axis=-1) - np.take_along_axis(counts, index, axis=-1)
+        in_bin = np.take_along_axis(counts, index, axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = np.clip(np.where(in_bin > 0, (target - before) / in_bin, 0.5), 0, 1)
+        values.append(np.where(total > 0, (index + fraction) / bins, np.nan)[..., 0])
+    return np.stack(values, axis=-1)
+
+
+class AvailabilitySketches:
+    """Hour-of-week availability histograms of a set of zones, counts shaped (zones, 168, SKETCH_BINS)"""
+
+    def __init__(self, zone_ids: Iterable[str] = (), counts: np.ndarray = None):
+        self.zone_ids: List[str] = list(zone_ids)
+        if counts is None:
+            counts = np.zeros((len(self.zone_ids), HOURS_OF_WEEK, SKETCH_BINS), dtype=np.uint16)
+        self.counts = counts
+        self._rows = {zone_id: row for row, zone_id in enumerate(self.zone_ids)}
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+    def __contains__(self, zone_id) -> bool:
+        return zone_id in self._rows
+
+    @classmethod
+    def from_scores(cls, zone_ids: np.ndarray, timestamps: pd.DatetimeIndex,
+                    scores: np.ndarray) -> "AvailabilitySketches":
+        """Sketches of aligned arrays of zone ids, hourly timestamps and availability scores"""
+        unique_zones, zone_rows = np.unique(np.asarray(zone_ids), return_inverse=True)
+        bins = np.clip((np.asarray(scores, dtype=float) * SKETCH_BINS).astype(np.int64), 0, SKETCH_BINS - 1)
+        cells = (zone_rows * HOURS_OF_WEEK + hours_of_week(timestamps)) * SKETCH_BINS + bins
+        counts = np.bincount(cells, minlength=len(unique_zones) * HOURS_OF_WEEK * SKETCH_BINS)
+        counts = np.minimum(counts, _MAX_COUNT).astype(np.uint16)
+        return cls(unique_zones.tolist(), counts.reshape(len(unique_zones), HOURS_OF_WEEK, SKETCH_BINS))
+
+    @classmethod
+    def from_occupancy(cls, occupancy: pd.DataFrame) -> "AvailabilitySketches":
+        """Sketches of the trainer's hourly occupancy frame, indexed by (zoneId, timestamp)"""
+        return cls.from_scores(occupancy.index.get_level_values('zoneId').to_numpy(),
+                               occupancy.index.get_level_values('timestamp'),
+                               occupancy['availabilityScore'].to_numpy())
+
+    def merge(self, other: "AvailabilitySketches") -> "AvailabilitySketches":
+        """Add the counts of other in place; zones only other knows are appended"""
+        shared = [zone_id for zone_id in other.zone_ids if zone_id in self._rows]
+        if shared:
+            rows = [self._rows[zone_id] for zone_id in shared]
+            self.counts[rows] = _add_saturating(self.counts[rows], other.counts[[other._rows[z] for z in shared]])
+        new = [zone_id for zone_id in other.zone_ids if zone_id not in self._rows]
+        if new:
+            self.counts = np.concatenate([self.counts, other.counts[[other._rows[z] for z in new]]])
+            for zone_id in new:
+                self._rows[zone_id] = len(self.zone_ids)
+                self.zone_ids.append(zone_id)
+        return self
+
+    # ---------------- PERSISTENCE ----------------
+    def document(self, zone_id: str) -> Optional[dict]:
+        """Compact stored form of one zone's sketch, None for an unknown zone"""
+        if zone_id not in self._rows:
+            return None
+        return {
+            "version": SKETCH_VERSION,
+            "bins": SKETCH_BINS,
+            "counts": Binary(zlib.compress(self.counts[self._rows[zone_id]].tobytes()))
+        }
+
+    @classmethod
+    def from_documents(cls, documents: Dict[str, dict]) -> "AvailabilitySketches":
+        """Sketches back from zoneId -> stored document (missing or empty documents are skipped)"""
+        documents = {zone_id: doc for zone_id, doc in documents.items() if doc}
+        for zone_id, doc in documents.items():
+            if doc.get("version") != SKETCH_VERSION or doc.get("bins") != SKETCH_BINS:
+                raise ValueError(f"unsupported sketch of zone {zone_id}: version {doc.get('version')}, "
+                                 f"{doc.get('bins')} bins")
+        counts = np.zeros((len(documents), HOURS_OF_WEEK, SKETCH_BINS), dtype=np.uint16)
+        for row, doc in enumerate(documents.values()):
+            counts[row] = np.frombuffer(zlib.decompress(doc["counts"]), dtype=np.uint16).reshape(
+                HOURS_OF_WEEK, SKETCH_BINS)
+        return cls(list(documents), counts)
+
+    # ---------------- BOUNDS ----------------
+    def bounds(self, zone_ids: List[str], horizon: List) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        p10/p50/p90 of historical availability, shape (zones, hours, 3), and a confidence,
+        shape (zones, hours), for every zone and horizon hour. Sparse hour-of-week cells
+        fall back to the zone's hour of day over all weekdays. Confidence is how narrow the
+        p10-p90 band is, shrunk towards DEFAULT_CONFIDENCE for zones with few samples.
+        """
+        timestamps = pd.DatetimeIndex(horizon)
+        week_hours = hours_of_week(timestamps)
+        quantiles = np.full((len(zone_ids), len(horizon), len(QUANTILES)), np.nan)
+        samples = np.zeros((len(zone_ids), len(horizon)))
+
+        known = [row for row, zone_id in enumerate(zone_ids) if zone_id in self._rows]
+        if known:
+            zone_counts = self.counts[[self._rows[zone_ids[row]] for row in known]].astype(np.int64)
+            cells = zone_counts[:, week_hours, :]
+            pooled = zone_counts.reshape(len(known), 7, 24, SKETCH_BINS).sum(axis=1)[:, timestamps.hour, :]
+            sparse = cells.sum(axis=-1) < MIN_CELL_SAMPLES
+            cells = np.where(sparse[..., None], pooled, cells)
+            quantiles[known] = histogram_quantiles(cells)
+            samples[known] = cells.sum(axis=-1)
+
+        spread = np.nan_to_num(quantiles[..., -1] - quantiles[..., 0], nan=1.0)
+        confidence = (samples * (1 - spread) + PRIOR_SAMPLES * DEFAULT_CONFIDENCE) / (samples + PRIOR_SAMPLES)
+        return quantiles, np.clip(confidence, 0.05, 0.95)
@@ -0,0 +1,97 @@
+"""
+Columnar on-disk format for user reports, shared by the generator and the trainer.
+
+A dataset is a directory of plain .npy files that np.load can memory-map:
+  timestamp.npy   int64  epoch milliseconds (UTC)
+  zone.npy        int32  index into zones.json
+  reportType.npy  uint8  index into REPORT_TYPES
+  zones.json      zone id of every zone code
+"""
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+REPORT_TYPES = ["parked", "left", "full", "empty"]
+
+COLUMN_DTYPES = {
+    "timestamp": np.dtype("<i8"),
+    "zone": np.dtype("<i4"),
+    "reportType": np.dtype("u1"),
+}
+
+# Fixed-size .npy v1.0 header so the row count can be patched in after streaming
+_HEADER_SIZE = 128
+
+
+def _npy_header(dtype: np.dtype, rows: int) -> bytes:
+    header = f"{{'descr': '{dtype.str}', 'fortran_order': False, 'shape': ({rows},), }}"
+    header = header.ljust(_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+class ColumnWriter:
+    """
+    Appends report chunks to a columnar dataset directory without holding the
+    dataset in memory. Rows are streamed straight to the .npy files and the
+    headers are completed on close().
+    """
+
+    def __init__(self, directory: str, zone_ids: List[str]):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = 0
+        with open(os.path.join(directory, "zones.json"), "w") as f:
+            json.dump(list(zone_ids), f)
+        self._files = {}
+        for name, dtype in COLUMN_DTYPES.items():
+            f = open(os.path.join(directory, f"{name}.npy"), "wb")
+            f.write(_npy_header(dtype, 0))
+            self._files[name] = f
+
+    def append(self, zone: np.ndarray, report_type: np.ndarray, timestamp_ms: np.ndarray):
+        columns = {"zone": zone, "reportType": report_type, "timestamp": timestamp_ms}
+        for name, values in columns.items():
+            self._files[name].write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[name]).tobytes())
+        self.rows += len(zone)
+
+    def close(self) -> int:
+        for name, f in self._files.items():
+            f.seek(0)
+            f.write(_npy_header(COLUMN_DTYPES[name], self.rows))
+            f.close()
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_columns(directory: str, zone_ids: List[str], zone: np.ndarray, report_type: np.ndarray,
+                  timestamp_ms: np.ndarray) -> int:
+    """Write a whole dataset in one call"""
+    with ColumnWriter(directory, zone_ids) as writer:
+        writer.append(zone, report_type, timestamp_ms)
+    return writer.rows
+
+
+def load_columns(directory: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Open a columnar dataset. With mmap the column arrays are memory-mapped, so
+    opening is zero-copy and pages are only read when touched.
+    """
+    mode = "r" if mmap else None
+    columns = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+        for name in COLUMN_DTYPES
+    }
+    with open(os.path.join(directory, "zones.json")) as f:
+        columns["zone_ids"] = np.array(json.load(f))
+    return columns
+
+
+def is_columnar_dataset(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "zones.json"))
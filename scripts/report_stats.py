@@ -0,0 +1,209 @@
+"""
+Single-pass statistics over user reports.
+
+ReportStats folds in report chunks in the report_columns layout (zone codes, report
+type codes, timestamps, zone_ids), so the same code serves in-memory record lists,
+chunks streamed out of the generator, and any report file the trainer can read.
+Every distribution is a bincount over the chunk's arrays; nothing loops per record.
+
+  python scripts/report_stats.py pune_parking_realistic_data_250k.ndjson.gz
+"""
+import argparse
+from typing import Dict, Iterable
+
+import numpy as np
+
+from report_columns import REPORT_TYPES
+
+MS_PER_HOUR = 3600 * 1000
+MS_PER_DAY = 24 * MS_PER_HOUR
+
+# Availability histogram bins over [0, 1]
+AVAILABILITY_BINS = 10
+
+
+class ReportStats:
+    """
+    Running report-type, zone, hour-of-day, day, category and availability distributions.
+    zone_categories maps zone ids to categories for the per-category breakdown; the
+    availability histogram is filled when chunks carry an availability column (the
+    generator's arrays do, report files do not).
+    """
+
+    def __init__(self, zone_categories: Dict[str, str] = None):
+        self.zone_categories = zone_categories or {}
+        self.total = 0
+        self.zone_types: Dict[str, np.ndarray] = {}
+        self.hours = np.zeros(24, dtype=np.int64)
+        self.days: Dict[int, int] = {}
+        self.availability = np.zeros(AVAILABILITY_BINS, dtype=np.int64)
+        self.availability_sum = 0.0
+
+    def update(self, chunk: Dict[str, np.ndarray]):
+        """Fold in one report_columns chunk (timestamps as epoch ms or datetime64)"""
+        zone = np.asarray(chunk["zone"], dtype=np.int64)
+        if len(zone) == 0:
+            return
+        n_types = len(REPORT_TYPES)
+        zone_ids = chunk["zone_ids"]
+        self.total += len(zone)
+
+        # Zone x report type counts in one bincount; zone totals and type totals derive from it
+        cells = np.bincount(zone * n_types + chunk["reportType"], minlength=len(zone_ids) * n_types)
+        for code in np.flatnonzero(cells.reshape(-1, n_types).sum(axis=1)):
+            zone_id = str(zone_ids[code])
+            counts = cells[code * n_types:(code + 1) * n_types]
+            if zone_id in self.zone_types:
+                self.zone_types[zone_id] += counts
+            else:
+                self.zone_types[zone_id] = counts.copy()
+
+        timestamps = np.asarray(chunk["timestamp"]).astype('datetime64[ms]').astype(np.int64)
+        self.hours += np.bincount(timestamps // MS_PER_HOUR % 24, minlength=24)
+        days, day_counts = np.unique(timestamps // MS_PER_DAY, return_counts=True)
+        for day, count in zip(days.tolist(), day_counts.tolist()):
+            self.days[day] = self.days.get(day, 0) + count
+
+        if "availability" in chunk:
+            availability = np.asarray(chunk["availability"], dtype=float)
+            bins = np.clip((availability * AVAILABILITY_BINS).astype(np.int64), 0, AVAILABILITY_BINS - 1)
+            self.availability += np.bincount(bins, minlength=AVAILABILITY_BINS)
+            self.availability_sum += float(availability.sum())
+
+    def update_records(self, records: list):
+        """Fold in report dicts as written by the generator or stored in userreports"""
+        from data_sources import columns_from_records
+
+        if records:
+            self.update(columns_from_records(records))
+
+    def merge(self, other: "ReportStats"):
+        """Fold in the counts of another ReportStats, e.g. one per generated shard"""
+        self.total += other.total
+        for zone_id, counts in other.zone_types.items():
+            if zone_id in self.zone_types:
+                self.zone_types[zone_id] += counts
+            else:
+                self.zone_types[zone_id] = counts.copy()
+        self.hours += other.hours
+        for day, count in other.days.items():
+            self.days[day] = self.days.get(day, 0) + count
+        self.availability += other.availability
+        self.availability_sum += other.availability_sum
+
+    def observe(self, chunks: Iterable[Dict[str, np.ndarray]]):
+        """Pass chunks through unchanged while folding them in, e.g. between the generator and a writer"""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    # ---------------- DERIVED STATS ----------------
+    def type_counts(self) -> Dict[str, int]:
+        totals = sum(self.zone_types.values(), np.zeros(len(REPORT_TYPES), dtype=np.int64))
+        return dict(zip(REPORT_TYPES, totals.tolist()))
+
+    def zone_counts(self) -> Dict[str, int]:
+        return {zone_id: int(counts.sum()) for zone_id, counts in self.zone_types.items()}
+
+    def category_type_counts(self) -> Dict[str, Dict[str, int]]:
+        """Report type counts per zone category (zones without one count as "unknown")"""
+        categories: Dict[str, np.ndarray] = {}
+        for zone_id, counts in self.zone_types.items():
+            category = self.zone_categories.get(zone_id, "unknown")
+            categories[category] = categories.get(category, 0) + counts
+        return {category: dict(zip(REPORT_TYPES, counts.tolist())) for category, counts in sorted(categories.items())}
+
+    def daily_counts(self) -> Dict[str, int]:
+        """Reports per calendar day of the (IST-labelled) timestamps"""
+        return {
+            str(np.datetime64(day, 'D')): count for day, count in sorted(self.days.items())
+        }
+
+    def summary(self) -> dict:
+        return {
+            "total": self.total,
+            "reportTypes": self.type_counts(),
+            "zones": self.zone_counts(),
+            "hours": self.hours.tolist(),
+            "days": self.daily_counts(),
+            "categories": self.category_type_counts(),
+            "availabilityHistogram": self.availability.tolist(),
+            "meanAvailability": self.availability_sum / self.availability.sum() if self.availability.sum() else None
+        }
+
+    def print_report(self):
+        """The generator's data quality report, plus the per-category, per-day and availability breakdowns"""
+        total = self.total
+        print("\n" + "="*50)
+        print("DATA ANALYSIS REPORT")
+        print("="*50)
+        print(f"Total records: {total:,}")
+        if total == 0:
+            print("="*50)
+            return
+
+        print(f"\nReport Type Distribution:")
+        for report_type, count in self.type_counts().items():
+            if count or report_type != "empty":
+                print(f"  {report_type}: {count:,} ({count / total * 100:.1f}%)")
+
+        zone_counts = self.zone_counts()
+        print(f"\nZone Coverage:")
+        print(f"  Total zones: {len(zone_counts)}")
+        print(f"  Avg reports per zone: {total / len(zone_counts):.0f}")
+        print(f"  Min/max reports per zone: {min(zone_counts.values()):,} / {max(zone_counts.values()):,}")
+
+        print(f"\nTop 5 Peak Hours:")
+        for hour in np.argsort(-self.hours, kind="stable")[:5]:
+            count = int(self.hours[hour])
+            print(f"  {hour:02d}:00: {count:,} reports ({count / total * 100:.1f}%)")
+
+        midnight_reports = int(self.hours[:3].sum())
+        print(f"\nMidnight Hours (00-02): {midnight_reports:,} reports ({midnight_reports / total * 100:.1f}%)")
+
+        if self.zone_categories:
+            print(f"\nPer-Category Report Mix:")
+            for category, counts in self.category_type_counts().items():
+                category_total = sum(counts.values())
+                mix = ", ".join(f"{t} {c / category_total:.0%}" for t, c in counts.items() if c)
+                print(f"  {category:<16} {category_total:>9,} reports  ({mix})")
+
+        daily = self.daily_counts()
+        per_day = np.array(list(daily.values()))
+        busiest = max(daily, key=daily.get)
+        print(f"\nDaily Volume: {len(daily)} days, {per_day.min():,} - {per_day.max():,} reports/day "
+              f"(mean {per_day.mean():,.0f}, busiest {busiest})")
+
+        if self.availability.sum():
+            print(f"\nAvailability Histogram (mean {self.summary()['meanAvailability']:.2f}):")
+            peak = self.availability.max()
+            for i, count in enumerate(self.availability.tolist()):
+                bar = "#" * round(count / peak * 30)
+                print(f"  {i / AVAILABILITY_BINS:.1f}-{(i + 1) / AVAILABILITY_BINS:.1f}: {count:>9,} {bar}")
+        print("="*50)
+
+
+def stats_for_path(path: str, zone_categories: Dict[str, str] = None) -> ReportStats:
+    """Stream any generator output format (JSON, NDJSON(.gz), columnar dataset) through ReportStats"""
+    from data_sources import iter_report_chunks
+
+    stats = ReportStats(zone_categories)
+    for chunk in iter_report_chunks(path):
+        stats.update(chunk)
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report statistics of a generated or exported report file")
+    parser.add_argument("path", help="a .json, .ndjson, .ndjson.gz file or a columnar dataset directory")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from zone_resolver import resolve_zone_categories
+
+    args = parse_args()
+    stats = stats_for_path(args.path)
+    zone_ids = list(stats.zone_types)
+    stats.zone_categories = dict(zip(zone_ids, resolve_zone_categories(zone_ids)))
+    stats.print_report()
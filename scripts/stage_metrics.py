@@ -0,0 +1,69 @@
+"""
+Per-stage timing for the training run.
+
+Stages are timed per zone where the work is per zone (predict, and everything in
+per-zone fetch mode) and per batch of zones where one call serves many zones
+(the aggregation, bucketing, global model fit and write stages). Records can be written as JSON
+lines and summarized per stage.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+STAGES = ["fetch", "frame", "bucket", "fit", "predict", "write"]
+
+
+class StageMetrics:
+    """Collects {stage, zoneId, zones, items, seconds} timing records"""
+
+    def __init__(self):
+        self.records: List[dict] = []
+
+    def record(self, stage: str, seconds: float, items: int = 0, zone_id: Optional[str] = None,
+               zones: int = 1):
+        self.records.append({
+            "stage": stage,
+            "zoneId": zone_id,
+            "zones": zones,
+            "items": int(items),
+            "seconds": seconds
+        })
+
+    @contextmanager
+    def stage(self, stage: str, zone_id: Optional[str] = None, zones: int = 1):
+        """
+        Time a block. The block can set counter["items"] to the number of rows,
+        reports or predictions it handled.
+        """
+        counter = {"items": 0}
+        started = time.perf_counter()
+        try:
+            yield counter
+        finally:
+            self.record(stage, time.perf_counter() - started, counter["items"], zone_id, zones)
+
+    def extend(self, records: Iterable[dict]):
+        """Add records collected elsewhere, e.g. by a worker process"""
+        self.records.extend(records)
+
+    def summary(self) -> List[dict]:
+        """Totals per stage, in pipeline order"""
+        totals: Dict[str, dict] = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"stage": record["stage"], "calls": 0, "zones": 0,
+                                                        "items": 0, "seconds": 0.0})
+            total["calls"] += 1
+            total["zones"] += record["zones"]
+            total["items"] += record["items"]
+            total["seconds"] += record["seconds"]
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(totals.values(), key=lambda t: order.get(t["stage"], len(order)))
+
+    def write_jsonl(self, path: str):
+        """Every record as an "event": "stage" line, followed by one "event": "summary" line per stage"""
+        with open(path, "w") as f:
+            for record in self.records:
+                f.write(json.dumps({"event": "stage", **record}) + "\n")
+            for total in self.summary():
+                f.write(json.dumps({"event": "summary", **total}) + "\n")
@@ -0,0 +1,35 @@
+import numpy as np
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from data_sources import MongoPredictionSink, load_report_columns, load_zone_report_columns
+
+
+class _FailingCollection:
+    def __init__(self, error):
+        self.error = error
+
+    def bulk_write(self, operations, ordered=True):
+        raise self.error
+
+
+def test_write_errors_name_the_zones_whose_updates_failed():
+    updates = [("zone_a", {"x": 1}), ("zone_b", {"x": 2}), ("zone_c", {"x": 3})]
+    error = BulkWriteError({"nMatched": 2, "writeErrors": [{"index": 1, "errmsg": "document too large"}]})
+    assert MongoPredictionSink(_FailingCollection(error)).write(updates) == (2, [("zone_b", "document too large")])
+
+    matched, errors = MongoPredictionSink(_FailingCollection(ConnectionFailure("down"))).write(updates)
+    assert matched == 0
+    assert errors == [("zone_a", "down"), ("zone_b", "down"), ("zone_c", "down")]
+
+
+def test_zone_report_columns_are_the_zones_rows_of_the_dataset(report_dataset, zone_ids):
+    columns = load_report_columns(report_dataset)
+    wanted = [zone_ids[3], zone_ids[0], "unknown_zone"]
+    selected = load_zone_report_columns(report_dataset, wanted)
+
+    mask = np.isin(columns["zone_ids"][columns["zone"]], wanted)
+    assert sorted(zip(selected["zone"].tolist(), selected["timestamp"].tolist(), selected["reportType"].tolist())) \
+        == sorted(zip(columns["zone"][mask].tolist(), columns["timestamp"][mask].tolist(),
+                      columns["reportType"][mask].tolist()))
+    assert list(selected["zone_ids"]) == list(columns["zone_ids"])
+    assert len(load_zone_report_columns(report_dataset, ["unknown_zone"])["zone"]) == 0
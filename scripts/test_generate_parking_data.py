@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+
+import data_sources
+import generate_parking_data
+
+
+def _generate(tmp_path, file_format, *extra):
+    output = tmp_path / ("-".join(extra) or "default")
+    generate_parking_data.main(["--format", file_format, "--output", str(output), "--num-records", "3000",
+                                "--seed", "3", "--start-date", "2025-01-06", "--days", "16", "--zones", "8",
+                                *extra])
+    if output.is_dir():
+        return {path.name: path.read_bytes() for path in output.iterdir()}
+    return output.read_bytes()
+
+
+@pytest.mark.parametrize("file_format", ["ndjson", "columnar"])
+def test_a_seed_gives_the_same_bytes_for_any_number_of_workers(tmp_path, file_format):
+    default = _generate(tmp_path, file_format)
+    assert default == _generate(tmp_path, file_format, "--workers", "1")
+    assert default == _generate(tmp_path, file_format, "--workers", "2")
+
+
+def test_shard_plan_splits_the_records_exactly():
+    plan = generate_parking_data.shard_plan(1000, 16, 7)
+    assert [(first, days) for first, days, _ in plan] == [(0, 7), (7, 7), (14, 2)]
+    assert sum(target for _, _, target in plan) == 1000
+
+
+class _Collection:
+    def __init__(self):
+        self.documents = []
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+    def bulk_write(self, operations, ordered=True):
+        upserted = 0
+        for operation in operations:
+            existing = [d for d in self.documents if d["zoneId"] == operation._filter["zoneId"]]
+            if not existing:
+                existing = [dict(operation._filter, **operation._doc["$setOnInsert"])]
+                self.documents.append(existing[0])
+                upserted += 1
+            existing[0].update(operation._doc["$set"])
+        return type("Result", (), {"upserted_count": upserted, "matched_count": len(operations) - upserted})()
+
+    def create_index(self, keys):
+        pass
+
+
+class _Client:
+    opened = []
+
+    def __init__(self):
+        self.closed = False
+        self.db = type("Database", (), {"userreports": _Collection(), "parkingzones": _Collection()})()
+        _Client.opened.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_in_process_load_inserts_through_one_client_and_closes_it(monkeypatch):
+    monkeypatch.setattr(generate_parking_data, "_loader_db", None)
+    monkeypatch.setattr(_Client, "opened", [])
+
+    def connect(mongo_uri=None):
+        client = _Client()
+        return client, client.db
+
+    monkeypatch.setattr(data_sources, "connect_to_database", connect)
+    result = generate_parking_data.load_into_mongo("mongodb://stand-in", num_records=500, seed=1,
+                                                   start_date=datetime(2025, 1, 6),
+                                                   num_days=10, workers=1,
+                                                   zone_ids=generate_parking_data.load_test_zone_ids(4))
+    [client] = _Client.opened
+    assert client.closed
+    assert result["inserted"] == len(client.db.userreports.documents) == 500
+    assert generate_parking_data._loader_db is None
+
+
+def test_seeding_zones_keeps_the_name_and_category_of_existing_zones():
+    zone_ids = generate_parking_data.load_test_zone_ids(2)
+    collection = _Collection()
+    collection.documents.append({"zoneId": zone_ids[0], "zoneName": "Renamed", "category": "it_corridor"})
+
+    assert generate_parking_data.seed_parking_zones(collection, zone_ids, {z: "mixed_suburban" for z in zone_ids}) \
+        == (1, 1)
+    existing, inserted = collection.documents
+    assert (existing["zoneName"], existing["category"]) == ("Renamed", "it_corridor")
+    assert "capacity" in existing and "currentOccupancy" not in existing
+    assert inserted["category"] == "mixed_suburban" and inserted["currentOccupancy"] == 0
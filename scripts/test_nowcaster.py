@@ -0,0 +1,43 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from nowcaster import Nowcaster
+from quantile_sketch import DEFAULT_CONFIDENCE
+from train_model import adjust_availability, get_realistic_availability
+
+
+def test_nowcasts_follow_the_current_hour_across_a_rollover():
+    nowcaster = Nowcaster({"zone_a": "it_corporate"}, horizon_hours=3, decay=0.5)
+    for minute, report_type in [(5, "parked"), (20, "parked"), (40, "left"), (55, "parked")]:
+        assert nowcaster.observe("zone_a", report_type, datetime(2025, 1, 6, 9, minute))
+    assert not nowcaster.observe("zone_a", "unknown", datetime(2025, 1, 6, 9, 58))
+
+    [(zone_id, update)] = nowcaster.drain()[0]
+    nowcast = update["nowcast"]
+    baseline = get_realistic_availability(9, 0, "it_corporate")
+    assert zone_id == "zone_a" and nowcast["hour"] == datetime(2025, 1, 6, 9, tzinfo=UTC)
+    assert nowcast["reportCounts"] == {"parked": 3, "left": 1, "full": 0, "empty": 0}
+    assert nowcast["availabilityScore"] == pytest.approx(float(adjust_availability(baseline, 3, 1, 0, 0)))
+    assert nowcaster.dirty_count == 0
+
+    # The next hour starts from fresh counts; reports for the hour before are only counted as late
+    assert nowcaster.observe("zone_a", "full", datetime(2025, 1, 6, 10, 2, tzinfo=UTC))
+    assert not nowcaster.observe("zone_a", "parked", datetime(2025, 1, 6, 9, 59))
+    assert (nowcaster.reports, nowcaster.late_reports) == (6, 1)
+
+    [(_, update)] = nowcaster.nowcasts(["zone_a"])
+    nowcast = update["nowcast"]
+    assert nowcast["hour"] == datetime(2025, 1, 6, 10, tzinfo=UTC)
+    assert nowcast["reportCounts"] == {"parked": 0, "left": 0, "full": 1, "empty": 0}
+    assert nowcast["availabilityScore"] <= 0.1
+    predictions = nowcast["predictions"]
+    assert [p["timestamp"] for p in predictions] == [datetime(2025, 1, 6, hour, tzinfo=UTC).isoformat()
+                                                    for hour in (11, 12, 13)]
+    # The full report's deviation from the baseline and its confidence fade hour by hour
+    deviations = [get_realistic_availability(hour, 0, "it_corporate") - p["availabilityScore"]
+                  for hour, p in zip((11, 12, 13), predictions)]
+    assert deviations == pytest.approx([(get_realistic_availability(10, 0, "it_corporate")
+                                         - nowcast["availabilityScore"]) * 0.5 ** step for step in (1, 2, 3)])
+    assert [p["confidence"] for p in predictions] == pytest.approx(
+        [DEFAULT_CONFIDENCE + (0.6 - DEFAULT_CONFIDENCE) * 0.5 ** step for step in (1, 2, 3)])
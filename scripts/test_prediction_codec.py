@@ -0,0 +1,42 @@
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+
+from prediction_codec import (decode_arrays, decode_bounds, decode_predictions, encode_prediction_list,
+                              encode_predictions, zone_predictions)
+
+START = datetime(2025, 1, 6, 8, tzinfo=UTC)
+
+
+def test_packed_predictions_round_trip_at_percent_resolution():
+    scores = np.linspace(0.05, 0.95, 48)
+    confidence = np.linspace(0.3, 0.9, 48)
+    packed = encode_predictions(START, scores, confidence=confidence)
+    assert len(packed["scores"]) == 48
+
+    timestamps, decoded_scores, decoded_confidence = decode_arrays(packed)
+    assert timestamps[0] == START and timestamps[-1] == START + timedelta(hours=47)
+    assert np.abs(decoded_scores - scores).max() <= 0.005
+    assert np.abs(decoded_confidence - confidence).max() <= 0.005
+    assert decode_bounds(packed) is None
+
+
+def test_naive_start_from_mongo_is_read_as_utc():
+    packed = encode_predictions(START.replace(tzinfo=None), [0.5], confidence=0.7)
+    [prediction] = decode_predictions(packed)
+    assert prediction == {"timestamp": START.isoformat(), "availabilityScore": 0.5, "confidence": 0.7}
+
+
+def test_list_predictions_pack_with_their_known_bounds():
+    predictions = [
+        {"timestamp": (START + timedelta(hours=i)).isoformat(), "availabilityScore": 0.5, "confidence": 0.6}
+        for i in range(3)
+    ]
+    predictions[1].update(p10=0.2, p50=0.4, p90=0.7)
+    packed = encode_prediction_list(predictions)
+
+    bounds = decode_bounds(packed)
+    assert np.isnan(bounds[0]).all() and np.isnan(bounds[2]).all()
+    assert np.allclose(bounds[1], [0.2, 0.4, 0.7])
+    assert zone_predictions({"packedPredictions": packed}) == predictions
+    assert zone_predictions({"predictions": predictions}) == predictions
@@ -0,0 +1,31 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+import pune_calendar
+
+
+def test_year_without_lunar_dates_warns_and_keeps_the_september_rush():
+    with pytest.warns(UserWarning, match="no lunar festival dates for 2031"):
+        calendar = pune_calendar.CalendarIndex(2031, 2031)
+    days = np.arange(np.datetime64("2031-08-30"), np.datetime64("2031-09-18"))
+    rush = calendar.lookup(days)["festival_rush"]
+    assert rush.tolist() == [date(2031, 9, 1) <= d.astype(date) <= date(2031, 9, 15) for d in days]
+    assert calendar.festival_factor_for(date(2031, 8, 15)) == pytest.approx(0.4)
+
+
+def test_festival_table_adds_lunar_years(tmp_path, monkeypatch):
+    monkeypatch.setattr(pune_calendar, "FESTIVALS", dict(pune_calendar.FESTIVALS))
+    path = tmp_path / "festivals.json"
+    path.write_text(json.dumps({"2032": {
+        "2032-09-10": {"name": "Ganesh Chaturthi", "impact": 0.1, "duration": 11}}}))
+    pune_calendar.load_festival_table(str(path))
+
+    calendar = pune_calendar.get_calendar(2032, 2032)
+    rush = calendar.lookup(np.array(["2032-09-05", "2032-09-10", "2032-09-21", "2032-09-22"],
+                                    dtype="datetime64[D]"))["festival_rush"]
+    assert rush.tolist() == [False, True, True, False]
+    assert calendar.festival_factor_for(date(2032, 9, 10)) == pytest.approx(0.1)
+    pune_calendar.get_calendar.cache_clear()
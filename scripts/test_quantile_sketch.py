@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import (DEFAULT_CONFIDENCE, SKETCH_BINS, AvailabilitySketches, histogram_quantiles)
+
+
+def test_histogram_quantiles_are_within_a_bin_of_the_sample_quantiles():
+    values = np.random.default_rng(0).beta(2, 5, 50_000)
+    counts = np.bincount(np.clip((values * SKETCH_BINS).astype(int), 0, SKETCH_BINS - 1), minlength=SKETCH_BINS)
+    assert np.allclose(histogram_quantiles(counts), np.quantile(values, [0.1, 0.5, 0.9]), atol=1 / SKETCH_BINS)
+    assert np.isnan(histogram_quantiles(np.zeros(SKETCH_BINS))).all()
+
+
+def test_merged_sketches_equal_the_sketch_of_all_the_data():
+    rng = np.random.default_rng(1)
+    hours = pd.date_range("2025-01-06", periods=600, freq="h")
+    zones = np.array(["zone_a"] * 300 + ["zone_b"] * 300)
+    scores = rng.random(600)
+
+    merged = AvailabilitySketches.from_scores(zones[:200], hours[:200], scores[:200])
+    merged.merge(AvailabilitySketches.from_scores(zones[200:], hours[200:], scores[200:]))
+    whole = AvailabilitySketches.from_scores(zones, hours, scores)
+    assert merged.zone_ids == whole.zone_ids
+    assert np.array_equal(merged.counts, whole.counts)
+
+
+def test_sketch_documents_round_trip():
+    hours = pd.date_range("2025-01-06", periods=24 * 14, freq="h")
+    sketches = AvailabilitySketches.from_scores(np.array(["zone_a"] * len(hours)), hours,
+                                                np.linspace(0, 1, len(hours)))
+    restored = AvailabilitySketches.from_documents({"zone_a": sketches.document("zone_a"), "zone_b": None})
+    assert restored.zone_ids == ["zone_a"]
+    assert np.array_equal(restored.counts, sketches.counts)
+    assert sketches.document("zone_b") is None
+
+
+def test_bounds_pool_sparse_hours_and_fall_back_to_the_prior():
+    # One week of history: every hour-of-week cell has a single sample, so bounds pool the hour of day
+    hours = pd.date_range("2025-01-06", periods=24 * 7, freq="h")
+    sketches = AvailabilitySketches.from_scores(np.array(["zone_a"] * len(hours)), hours,
+                                                np.full(len(hours), 0.7))
+    horizon = list(pd.date_range("2025-01-13", periods=4, freq="h"))
+    quantiles, confidence = sketches.bounds(["zone_a", "zone_b"], horizon)
+
+    assert quantiles.shape == (2, 4, 3) and confidence.shape == (2, 4)
+    assert np.allclose(quantiles[0], 0.7, atol=1 / SKETCH_BINS)
+    assert (confidence[0] > DEFAULT_CONFIDENCE).all()
+    assert np.isnan(quantiles[1]).all()
+    assert np.allclose(confidence[1], DEFAULT_CONFIDENCE)
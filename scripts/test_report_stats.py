@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_sources import iter_report_chunks, load_report_columns
+from report_columns import REPORT_TYPES
+from report_stats import AVAILABILITY_BINS, ReportStats, stats_for_path
+
+
+def test_streamed_and_merged_stats_match_a_pandas_pass_over_all_reports(report_dataset):
+    columns = load_report_columns(report_dataset)
+    reports = pd.DataFrame({
+        "zoneId": columns["zone_ids"][columns["zone"]],
+        "reportType": np.array(REPORT_TYPES)[columns["reportType"]],
+        "timestamp": pd.to_datetime(np.asarray(columns["timestamp"]), unit="ms"),
+    })
+    categories = {zone_id: "residential" for zone_id in columns["zone_ids"][:4].tolist()}
+
+    merged = ReportStats(categories)
+    for chunk in iter_report_chunks(report_dataset, chunk_size=1000):
+        shard = ReportStats(categories)
+        shard.update(chunk)
+        merged.merge(shard)
+
+    for stats in (stats_for_path(report_dataset, categories), merged):
+        summary = stats.summary()
+        assert summary["total"] == len(reports)
+        assert summary["reportTypes"] == reports["reportType"].value_counts().reindex(REPORT_TYPES, fill_value=0).to_dict()
+        assert summary["zones"] == reports["zoneId"].value_counts().to_dict()
+        assert summary["hours"] == reports["timestamp"].dt.hour.value_counts().reindex(range(24), fill_value=0).tolist()
+        assert summary["days"] == reports["timestamp"].dt.strftime("%Y-%m-%d").value_counts().sort_index().to_dict()
+        in_category = reports["zoneId"].isin(list(categories))
+        assert sum(summary["categories"]["residential"].values()) == in_category.sum()
+        assert sum(summary["categories"]["unknown"].values()) == (~in_category).sum()
+        assert summary["meanAvailability"] is None
+
+
+def test_record_updates_fill_the_availability_histogram():
+    stats = ReportStats()
+    stats.update_records([
+        {"zoneId": "zone_a", "reportType": "full", "timestamp": datetime(2025, 1, 6, 9, 30)},
+        {"zoneId": "zone_b", "reportType": "parked", "timestamp": {"$date": "2025-01-06T23:10:00Z"}},
+    ])
+    assert stats.type_counts() == {"parked": 1, "left": 0, "full": 1, "empty": 0}
+    assert stats.hours[[9, 23]].tolist() == [1, 1]
+
+    chunk = {"zone": np.array([0, 0, 1]), "reportType": np.array([0, 2, 1]), "zone_ids": np.array(["zone_a", "zone_b"]),
+             "timestamp": np.array([0, 1, 2]), "availability": np.array([0.05, 0.55, 1.0])}
+    stats.update(chunk)
+    assert stats.zone_counts() == {"zone_a": 3, "zone_b": 2}
+    assert stats.availability.tolist() == [1] + [0] * 4 + [1] + [0] * 3 + [1]
+    assert len(stats.availability) == AVAILABILITY_BINS
+    assert stats.summary()["meanAvailability"] == np.mean([0.05, 0.55, 1.0])
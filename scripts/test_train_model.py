@@ -0,0 +1,405 @@
+from datetime import UTC, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import train_model
+from artifact_cache import ArtifactCache
+from data_sources import read_local_predictions
+from prediction_codec import decode_predictions
+from pune_calendar import calendar_for
+from quantile_sketch import DEFAULT_CONFIDENCE
+from report_columns import REPORT_TYPES
+
+
+def test_workers_get_the_size_bound_of_an_empty_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, "_worker_cache", None)
+    cache = ArtifactCache(str(tmp_path), max_bytes=1000)
+    assert len(cache) == 0
+    train_model._init_worker(*train_model._worker_initargs(None, cache, offline=True))
+    assert train_model._worker_cache.directory == cache.directory
+    assert train_model._worker_cache.max_bytes == 1000
+
+
+def test_parallel_first_run_stays_within_the_cache_bound(report_dataset, tmp_path):
+    max_bytes = 100_000
+    failed = train_model.train_and_update_predictions(source="file", reports_path=report_dataset,
+                                             predictions_path=str(tmp_path / "predictions.ndjson"), workers=2,
+                                             cache_dir=str(tmp_path / "cache"), cache_max_bytes=max_bytes,
+                                             quiet=True)
+    assert failed == []
+    size = sum(path.stat().st_size for path in (tmp_path / "cache").rglob("*.pkl"))
+    assert 0 < size <= max_bytes
+
+
+def test_realistic_predictions_take_bounds_from_the_zones_sketch():
+    hours = pd.date_range("2025-01-06", periods=24 * 28, freq="h", tz="UTC")
+    history = pd.DataFrame({"availabilityScore": np.linspace(0.2, 0.6, len(hours))}, index=hours)
+    sketches = train_model.zone_sketch("zone_a", history)
+    start = datetime(2025, 2, 3, tzinfo=UTC)
+
+    bounded = train_model.generate_realistic_predictions("residential", history, start, 6, sketches, "zone_a")
+    assert all(p["p10"] <= p["p50"] <= p["p90"] for p in bounded)
+    assert all(p["confidence"] != DEFAULT_CONFIDENCE for p in bounded)
+
+    unbounded = train_model.generate_realistic_predictions("residential", history, start, 6, sketches, "zone_b")
+    assert all("p10" not in p and p["confidence"] == DEFAULT_CONFIDENCE for p in unbounded)
+
+
+class _SketchCollection:
+    """Just enough of a collection for the stored sketches: find by zoneId and upserting UpdateOnes"""
+
+    def __init__(self):
+        self.documents = {}
+
+    def find(self, query, projection=None):
+        return [dict(self.documents[z]) for z in query["zoneId"]["$in"] if z in self.documents]
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            zone_id = operation._filter["zoneId"]
+            self.documents[zone_id] = {"zoneId": zone_id, **operation._doc["$set"]}
+
+
+def _occupancy(zone_id, hours):
+    index = pd.MultiIndex.from_product([[zone_id], hours], names=["zoneId", "timestamp"])
+    return pd.DataFrame({"availabilityScore": np.linspace(0.1, 0.9, len(hours))}, index=index)
+
+
+def test_incremental_sketches_merge_each_complete_hour_once():
+    db = {train_model.SKETCHES_COLLECTION: _SketchCollection()}
+    hours = pd.date_range("2025-01-06", periods=48, freq="h", tz="UTC")
+    occupancy = _occupancy("zone_a", hours)
+
+    # The hour still in progress at the cutoff waits for the next run
+    first = train_model.merge_sketch_hours(db, ["zone_a"], occupancy.iloc[:30], hours[29] + pd.Timedelta(minutes=20))
+    assert first.counts.sum() == 29
+    again = train_model.merge_sketch_hours(db, ["zone_a"], occupancy.iloc[:30], hours[29] + pd.Timedelta(minutes=40))
+    assert again.counts.sum() == 29
+
+    merged = train_model.merge_sketch_hours(db, ["zone_a"], occupancy, hours[-1] + pd.Timedelta(hours=1))
+    stored, through = train_model.load_stored_sketches(db, ["zone_a"])
+    rebuilt = train_model.AvailabilitySketches.from_occupancy(occupancy)
+    assert np.array_equal(merged.counts, rebuilt.counts)
+    assert np.array_equal(stored.counts, rebuilt.counts)
+    assert through["zone_a"] == (hours[-1] + pd.Timedelta(hours=1)).value // 10**6
+
+
+def test_sparse_zones_borrow_from_donors_in_other_chunks():
+    def square(lat):
+        ring = [[73.84, lat], [73.841, lat], [73.841, lat + 0.001], [73.84, lat + 0.001], [73.84, lat]]
+        return {"type": "Polygon", "coordinates": [ring]}
+
+    zones = [{"zoneId": "donor", "area": square(18.52)}, {"zoneId": "sparse", "area": square(18.521)}]
+    start = datetime(2025, 2, 3, tzinfo=UTC)
+    bounds, confidence = np.full((24, 3), np.nan), np.full(24, 0.4)
+    chunk_profiles = [
+        {"hourMeans": pd.DataFrame([np.full(24, 0.9)], index=["donor"], columns=range(24)),
+         "start": start, "sparse": {}},
+        {"hourMeans": pd.DataFrame([np.full(24, np.nan)], index=["sparse"], columns=range(24)),
+         "start": start, "sparse": {"sparse": (bounds, confidence)}},
+    ]
+    deferred = {"sparse": {"predictions": [], "modelMetrics": {"category": "residential"}}}
+
+    results = train_model._borrow_across_chunks(zones, chunk_profiles, deferred, 5, 3.0, 24, "list")
+    [(zone_id, update, error)] = results
+    assert zone_id == "sparse" and error is None
+    assert len(update["predictions"]) == 24
+    assert update["predictions"][0]["timestamp"] == (start + pd.Timedelta(hours=1)).isoformat()
+    assert all(p["confidence"] == 0.4 for p in update["predictions"])
+
+
+def _assert_packed_alongside_list(update):
+    assert len(update["predictions"]) == 24
+    decoded = decode_predictions(update["packedPredictions"])
+    assert [p["timestamp"][:19] for p in decoded] == [p["timestamp"][:19] for p in update["predictions"]]
+    assert [p["availabilityScore"] for p in decoded] == pytest.approx(
+        [p["availabilityScore"] for p in update["predictions"]], abs=0.005)
+
+
+def test_packed_runs_still_write_the_predictions_the_app_reads(report_dataset, tmp_path):
+    path = str(tmp_path / "predictions.ndjson")
+    assert train_model.train_and_update_predictions(source="file", reports_path=report_dataset, predictions_path=path,
+                                                    prediction_format="packed", quiet=True) == []
+    for update in read_local_predictions(path).values():
+        _assert_packed_alongside_list(update)
+
+    # The per-zone path packs its own list
+    reports = train_model.ZoneReportCounts("zone_a")
+    reports.add(np.zeros(50, dtype=np.uint8), np.arange(50, dtype=np.int64) * 3_600_000)
+    _assert_packed_alongside_list(train_model._train_zone(
+        None, {"zoneId": "zone_a"}, "residential", "per-zone", None, train_model.StageMetrics(),
+        prediction_format="packed", reports=reports))
+
+
+def test_failed_write_batches_are_returned_with_the_failed_zones(report_dataset, tmp_path, monkeypatch):
+    def fail(self, updates):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(train_model.LocalPredictionSink, "write", fail)
+    failed = train_model.train_and_update_predictions(source="file", reports_path=report_dataset,
+                                                      predictions_path=str(tmp_path / "predictions.ndjson"),
+                                                      write_batch_size=5, quiet=True)
+    assert len(failed) == len(train_model.file_zone_documents(report_dataset))
+    assert all(error == "OSError: disk full" for _, error in failed)
+
+
+def test_every_fetch_mode_buckets_reports_into_the_same_hours():
+    reports = pd.DataFrame({
+        "zoneId": ["zone_a", "zone_a", "zone_a", "zone_b", "zone_b"],
+        "reportType": ["parked", "left", "full", "full", "parked"],
+        "timestamp": pd.to_datetime(["2025-01-06 08:10", "2025-01-06 08:50", "2025-01-06 11:25",
+                                     "2025-01-06 09:00", "2025-01-06 10:00"], utc=True),
+    })
+    from_reports = train_model.build_hourly_report_counts(reports)
+
+    hours = reports["timestamp"].dt.floor("h")
+    rows = reports.groupby([reports["zoneId"], hours, reports["reportType"]]).size().reset_index(name="count")
+    from_rows = train_model.hourly_counts_from_lists({"zoneId": rows["zoneId"].tolist(),
+                                                      "hour": rows["timestamp"].tolist(),
+                                                      "reportType": rows["reportType"].tolist(),
+                                                      "count": rows["count"].tolist()})
+    zone_codes, zone_ids = pd.factorize(reports["zoneId"])
+    type_codes = np.array([train_model.REPORT_TYPES.index(t) for t in reports["reportType"]], dtype=np.uint8)
+    from_columns = train_model.hourly_counts_from_columns({
+        "zone": zone_codes, "zone_ids": np.asarray(zone_ids), "reportType": type_codes,
+        "timestamp": reports["timestamp"].dt.as_unit("ms").astype("int64").to_numpy()
+    })
+    per_zone = train_model.ZoneReportCounts("zone_a")
+    zone_a = reports["zoneId"] == "zone_a"
+    per_zone.add(type_codes[zone_a], reports["timestamp"][zone_a].dt.as_unit("ms").astype("int64").to_numpy())
+
+    assert len(from_reports.loc["zone_a"]) == 5  # 08:00 through 12:00
+    pd.testing.assert_frame_equal(from_rows, from_reports, check_dtype=False, check_index_type=False)
+    pd.testing.assert_frame_equal(from_columns, from_reports, check_dtype=False, check_index_type=False)
+    pd.testing.assert_frame_equal(per_zone.hourly_counts(), from_reports.loc[["zone_a"]], check_dtype=False, check_index_type=False)
+
+
+def test_train_zones_hands_over_each_zone_as_soon_as_it_is_done(monkeypatch):
+    trained = []
+
+    def train_zone(db, zone_info, *args, **kwargs):
+        trained.append(zone_info["zoneId"])
+        if zone_info["zoneId"] == "zone_b":
+            raise ValueError("no reports")
+        return {"zone": zone_info["zoneId"]}
+
+    monkeypatch.setattr(train_model, "_train_zone", train_zone)
+    zones = [{"zoneId": z, "zoneName": z} for z in ("zone_a", "zone_b", "zone_c")]
+    results = train_model.train_zones(None, zones, "per-zone")
+
+    assert next(results) == ("zone_a", {"zone": "zone_a"}, None)
+    assert trained == ["zone_a"]
+    assert list(results) == [("zone_b", None, "ValueError: no reports"), ("zone_c", {"zone": "zone_c"}, None)]
+
+
+class _Collection:
+    """In-memory collection: equality and $in filters, upserting $set UpdateOnes"""
+
+    def __init__(self):
+        self.documents = []
+
+    @staticmethod
+    def _matches(document, query):
+        return all(document.get(field) in value["$in"] if isinstance(value, dict) else document.get(field) == value
+                   for field, value in query.items())
+
+    def find(self, query, projection=None):
+        return [dict(document) for document in self.documents if self._matches(document, query)]
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            matches = [document for document in self.documents if self._matches(document, operation._filter)]
+            if not matches:
+                matches = [dict(operation._filter)]
+                self.documents.append(matches[0])
+            matches[0].update(operation._doc["$set"])
+
+
+def _stored_count(db):
+    return sum(doc.get(t, 0) for doc in db[train_model.AGGREGATES_COLLECTION].documents for t in train_model.REPORT_TYPES)
+
+
+def test_merging_new_reports_again_after_a_crash_counts_nothing_twice(monkeypatch):
+    hours = pd.date_range("2025-01-06", periods=14, freq="h")
+    reports = pd.DataFrame({"zoneId": ["zone_a", "zone_b"] * 210,
+                            "reportType": (["parked", "left", "full"] * 140),
+                            "timestamp": pd.date_range("2025-01-06", periods=420, freq="2min")})
+
+    def naive(value):
+        # Dates come back from MongoDB naive, in UTC
+        value = pd.Timestamp(value)
+        return value.tz_convert(None) if value.tzinfo is not None else value
+
+    def fetch_hourly_rows(db, zone_ids=None, since=None, until=None):
+        window = reports[reports["zoneId"].isin(zone_ids) & (reports["timestamp"] <= naive(until))]
+        if since is not None:
+            window = window[window["timestamp"] > naive(since)]
+        rows = window.groupby(["zoneId", window["timestamp"].dt.floor("h"), "reportType"]).size()
+        return [{"zoneId": z, "hour": h.to_pydatetime(), "reportType": t, "count": int(n)}
+                for (z, h, t), n in rows.items()]
+
+    monkeypatch.setattr(train_model, "fetch_hourly_rows", fetch_hourly_rows)
+    db = {train_model.AGGREGATES_COLLECTION: _Collection(), train_model.WATERMARKS_COLLECTION: _Collection()}
+    until = lambda hour: (hours[0] + pd.Timedelta(hours=hour)).tz_localize(UTC).to_pydatetime()
+
+    up_to = lambda hour: int((reports["timestamp"] <= hours[0] + pd.Timedelta(hours=hour)).sum())
+    assert train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(5.5)) == up_to(5.5)
+    # The run dies after the aggregates are written but before the watermarks move
+    watermarks = db[train_model.WATERMARKS_COLLECTION]
+    monkeypatch.setattr(watermarks, "bulk_write", lambda operations, ordered=True: 1 / 0)
+    try:
+        train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(9))
+    except ZeroDivisionError:
+        pass
+    monkeypatch.undo()
+    monkeypatch.setattr(train_model, "fetch_hourly_rows", fetch_hourly_rows)
+
+    assert train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(9)) == up_to(9) - up_to(5.5)
+    assert train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(9)) == 0
+    assert _stored_count(db) == up_to(9)
+    assert sum(doc["reportCount"] for doc in watermarks.documents) == up_to(9)
+
+    # Cache fingerprints follow the stored counts, not the watermark moving on every run
+    fingerprints = train_model.incremental_fingerprints(db, ["zone_a", "zone_b"])
+    train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(9))
+    assert train_model.incremental_fingerprints(db, ["zone_a", "zone_b"]) == fingerprints
+    train_model.merge_new_reports(db, ["zone_a", "zone_b"], until(12))
+    assert train_model.incremental_fingerprints(db, ["zone_a", "zone_b"]) != fingerprints
+
+
+def _original_hour_availability(baseline, parked, left, full, empty):
+    """The per-hour adjustment of the loop apply_occupancy_rules replaced"""
+    if full > 0:
+        return min(baseline, 0.1)
+    if empty > 0:
+        return max(baseline, 0.8)
+    net_parking = parked - left
+    if net_parking > 0:
+        return max(0.05, baseline - min(0.2, net_parking * 0.05))
+    if net_parking < 0:
+        return min(0.95, baseline + min(0.2, abs(net_parking) * 0.05))
+    return baseline
+
+
+def test_occupancy_rules_match_the_original_per_hour_rules():
+    hours = pd.date_range("2025-01-10 05:00", periods=6, freq="h", tz="UTC")  # Friday into Saturday
+    counts = np.array([[0, 0, 0, 0], [3, 1, 0, 0], [1, 6, 0, 0], [2, 2, 1, 1], [0, 1, 0, 2], [9, 0, 0, 0]])
+    index = pd.MultiIndex.from_product([["zone_a", "zone_b"], hours], names=["zoneId", "timestamp"])
+    hourly_counts = pd.DataFrame(np.vstack([counts, counts[::-1]]), index=index, columns=REPORT_TYPES)
+    categories = {"zone_a": "it_corporate", "zone_b": "traditional_market"}
+
+    occupancy = train_model.apply_occupancy_rules(hourly_counts, categories, np.random.default_rng(5))
+
+    noise = np.random.default_rng(5).normal(0, 0.03, len(hourly_counts))
+    for row, ((zone_id, hour), hour_counts) in enumerate(hourly_counts.iterrows()):
+        baseline = train_model.get_realistic_availability(hour.hour, hour.weekday(), categories[zone_id])
+        expected = _original_hour_availability(baseline, *hour_counts.tolist())
+        assert train_model.adjust_availability(baseline, *hour_counts.tolist()) == pytest.approx(expected)
+        assert occupancy["availabilityScore"].iloc[row] == pytest.approx(np.clip(expected + noise[row], 0.05, 0.95))
+    assert occupancy["reportCount"].tolist() == hourly_counts.sum(axis=1).tolist()
+    assert occupancy["parkedReports"].tolist() == hourly_counts["parked"].tolist()
+
+
+def test_zone_categories_follow_keyword_priority():
+    zones = [
+        {"zoneId": "zone_hinjewadi_mall"},                          # it_corporate and commercial_high keywords
+        {"zoneId": "zone_hadapsar_station"},                        # it_corporate and transport_hub keywords
+        {"zoneId": "zone_laxmi_rd_market"},                         # commercial_high and traditional_market
+        {"zoneId": "zone_old_bazaar", "zoneName": "Warje Housing"}, # residential (name) and traditional_market
+        {"zoneId": "zone_17", "zoneName": "FC Road"},               # keyword in the display name only
+        {"zoneId": "zone_pimpri_society"},                          # residential outranks industrial
+        {"zoneId": "zone_chakan"},                                  # industrial has no pattern of its own
+        {"zoneId": "zone_camp", "category": "Transport_Hub"},       # a stored category wins over keywords
+        {"zoneId": "zone_camp_2", "category": "festival"},          # an unknown stored category does not
+    ]
+    expected = ["commercial_high", "it_corporate", "commercial_high", "residential", "commercial_high",
+                "residential", "default", "transport_hub", "commercial_high"]
+
+    assert [train_model.categorize_zone(z["zoneId"], z.get("zoneName", ""), z.get("category", ""))
+            for z in zones] == expected
+    assert train_model.categorize_zone_batch(zones) == dict(zip([z["zoneId"] for z in zones], expected))
+
+
+def _original_prediction(zone_category, hourly_averages, t, noise):
+    """One hour of the per-zone prediction loop predict_zones_batch replaced"""
+    availability = train_model.get_realistic_availability(t.hour, t.weekday(), zone_category)
+    if t.hour in hourly_averages and len(hourly_averages) > 5:
+        availability = 0.8 * availability + 0.2 * hourly_averages[t.hour]
+    day = calendar_for(t).lookup(t)
+    if day["national_holiday"]:
+        availability *= 1.2
+    elif day["festival_rush"] and zone_category in train_model.FESTIVAL_RUSH_CATEGORIES:
+        availability *= 0.8
+    if t.month in [6, 7, 8, 9]:
+        availability *= 1.1
+    availability = max(0.05, min(0.95, availability))
+    return max(0.05, min(0.95, availability + noise))
+
+
+def test_batch_predictions_match_the_per_zone_rules(monkeypatch):
+    categories = ["traditional_market", "it_corporate", "residential"]
+    hour_means = np.full((3, 24), np.nan)
+    hour_means[0] = np.linspace(0.3, 0.7, 24)
+    hour_means[1, :3] = 0.9  # too little history to blend
+    start = datetime(2025, 8, 14, 20, tzinfo=UTC)  # over Independence Day into the festival rush
+
+    horizon, scores = train_model.predict_zones_batch(categories, start, 36, hour_means, np.random.default_rng(3))
+
+    noise = np.random.default_rng(3).uniform(-0.05, 0.05, scores.shape)
+    for row, category in enumerate(categories):
+        averages = {hour: mean for hour, mean in enumerate(hour_means[row]) if not np.isnan(mean)}
+        assert scores[row] == pytest.approx([_original_prediction(category, averages, t, noise[row, i])
+                                             for i, t in enumerate(horizon)])
+
+    # The single-zone path is the same batch computation
+    history = pd.DataFrame({"availabilityScore": np.tile(hour_means[0], 2)},
+                           index=pd.date_range("2025-08-01", periods=48, freq="h", tz="UTC"))
+    default_rng = np.random.default_rng
+    monkeypatch.setattr(np.random, "default_rng", lambda seed=None: default_rng(3))
+    predictions = train_model.generate_realistic_predictions(categories[0], history, start, 36)
+    assert [p["availabilityScore"] for p in predictions] == pytest.approx(
+        train_model.predict_zones_batch(categories[:1], start, 36, hour_means[:1])[1][0])
+
+
+class _ReportCursor:
+    """userreports find() cursor over in-memory documents, recording its sort and batch size"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.sorted_by, self.batch = None, None
+
+    def sort(self, field, direction):
+        self.sorted_by = (field, direction)
+        self.documents = sorted(self.documents, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+
+def test_zone_report_counts_stream_in_chunks_within_the_memory_budget(monkeypatch):
+    timestamps = pd.date_range("2025-01-06", periods=3500, freq="7min", tz="UTC")
+    report_types = np.array(["parked", "left", "full", "empty"])[np.arange(3500) * 7 % 4]
+    documents = [{"reportType": t, "timestamp": ts.to_pydatetime()} for t, ts in zip(report_types, timestamps)]
+    cursor = _ReportCursor(documents[::-1])
+    db = type("Database", (), {"userreports": type("Collection", (), {"find": lambda self, query, projection: cursor})()})()
+
+    chunks = []
+    add_documents = train_model.ZoneReportCounts.add_documents
+    monkeypatch.setattr(train_model.ZoneReportCounts, "add_documents",
+                        lambda self, docs: chunks.append(len(docs)) or add_documents(self, docs))
+    memory_mb = 1000 * train_model.RAW_REPORT_BYTES / 2**20
+    reports = train_model.load_zone_report_counts(db, "zone_a", memory_mb)
+
+    assert cursor.sorted_by == ("timestamp", 1) and cursor.batch == 1000
+    assert chunks == [1000, 1000, 1000, 500]
+    assert reports.total == 3500
+    expected = train_model.build_hourly_report_counts(
+        pd.DataFrame({"zoneId": "zone_a", "timestamp": timestamps, "reportType": report_types}))
+    pd.testing.assert_frame_equal(reports.hourly_counts(), expected, check_dtype=False, check_index_type=False)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from zone_neighbors import borrow_neighbor_profiles, polygon_centroid
+
+
+def square(lat, lng, size=0.001):
+    ring = [[lng, lat], [lng + size, lat], [lng + size, lat + size], [lng, lat + size], [lng, lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def test_polygon_centroid_is_the_middle_of_a_square():
+    assert np.allclose(polygon_centroid(square(18.5, 73.8)), (18.5005, 73.8005))
+    assert polygon_centroid(None) is None
+
+
+def test_sparse_zones_borrow_the_distance_weighted_profile_of_nearby_rich_zones():
+    zones = [
+        {"zoneId": "near", "area": square(18.520, 73.840)},
+        {"zoneId": "nearer", "area": square(18.501, 73.840)},
+        {"zoneId": "far", "area": square(19.500, 73.840)},
+        {"zoneId": "sparse", "area": square(18.500, 73.840)},
+        {"zoneId": "no_area"},
+    ]
+    hour_means = pd.DataFrame(np.nan, index=[z["zoneId"] for z in zones], columns=range(24))
+    hour_means.loc["near"] = 0.2
+    hour_means.loc["nearer"] = 0.8
+    hour_means.loc["far"] = 0.5
+    hour_means.loc["sparse", [0, 1]] = 0.1
+
+    borrowed, sources = borrow_neighbor_profiles(zones, hour_means, k=3, max_km=5.0)
+    assert sources == {"sparse": ["nearer", "near"]}
+    # The zone ~110 m away outweighs the one ~2.2 km away
+    assert list(borrowed.index) == ["sparse"]
+    assert 0.7 < borrowed.loc["sparse", 0] < 0.8
+
+    assert borrow_neighbor_profiles(zones, hour_means, k=3, max_km=0.01)[1] == {}
+    assert borrow_neighbor_profiles(zones, hour_means, k=0)[1] == {}
@@ -1,16 +1,46 @@
 import os
-import pymongo
+import argparse
+import asyncio
 import pandas as pd
 import numpy as np
-import random
+import time
+from collections import deque
+from itertools import islice
 from datetime import datetime, timedelta, UTC
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from pymongo import AsyncMongoClient, UpdateOne
+import joblib
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingRandomSearchCV)
+from sklearn.model_selection import HalvingRandomSearchCV, KFold
 from sklearn.metrics import mean_absolute_error, r2_score
 import warnings
 warnings.filterwarnings('ignore')
 
+from artifact_cache import DEFAULT_MAX_BYTES, ArtifactCache, artifact_key, code_version
+from data_sources import (SOURCES, AsyncMongoPredictionSink, LocalPredictionSink, MongoPredictionSink,
+                          connect_to_database, file_zone_documents, load_zone_report_columns)
+from prediction_codec import encode_prediction_list, encode_predictions
+from pune_calendar import MONSOON, calendar_for
+from quantile_sketch import DEFAULT_CONFIDENCE, QUANTILE_FIELDS, AvailabilitySketches
+from report_columns import REPORT_TYPES
+from stage_metrics import StageMetrics
+from zone_neighbors import MIN_PROFILE_HOURS, borrow_neighbor_profiles
+from zone_resolver import resolve_zone_category
+
+# ---------------- OUTPUT ----------------
+# Per-zone progress lines; quiet runs (--quiet) turn them off
+VERBOSE = True
+
+def set_verbose(verbose: bool):
+    global VERBOSE
+    VERBOSE = verbose
+
+def zone_print(*args, **kwargs):
+    if VERBOSE:
+        print(*args, **kwargs)
+
 # ---------------- REALISTIC ZONE PATTERNS ----------------
 ZONE_PATTERNS = {
     "it_corporate": {
@@ -79,21 +109,16 @@ def categorize_zone(zone_id: str, zone_name: str = "", category: str = "") -> st
     if category and category.lower() in ZONE_PATTERNS:
         return category.lower()
     
-    text_to_check = f"{zone_id} {zone_name}".lower()
-    
-    # Check for specific keywords
-    if any(k in text_to_check for k in ["hinjewadi", "it_park", "cyber", "tech", "corporate", "office", "software", "wipro", "tcs", "infosys"]):
-        return "it_corporate"
-    if any(k in text_to_check for k in ["magarpatta", "society", "residential", "karve", "undri", "warje", "apartment", "housing", "residency"]):
-        return "residential"
-    if any(k in text_to_check for k in ["fc_road", "jm_road", "camp", "mall", "shopping", "commercial", "plaza", "center"]):
-        return "commercial_high"
-    if any(k in text_to_check for k in ["station", "railway", "swargate", "depot", "terminal", "bus_stand", "transport"]):
-        return "transport_hub"
-    if any(k in text_to_check for k in ["market", "bazaar", "laxmi", "traditional", "vendor"]):
-        return "traditional_market"
-    
-    return "default"
+    # Shared keyword rules; categories without a pattern of their own use the default one
+    resolved = resolve_zone_category(zone_id, zone_name)
+    return resolved if resolved in ZONE_PATTERNS else "default"
+
+def categorize_zone_batch(zones: list) -> dict:
+    """zoneId -> pattern category for a list of zone documents"""
+    return {
+        z["zoneId"]: categorize_zone(z["zoneId"], z.get("zoneName", ""), z.get("category", ""))
+        for z in zones
+    }
 
 # ---------------- REALISTIC AVAILABILITY CALCULATOR ----------------
 def get_realistic_availability(hour: int, day_of_week: int, zone_category: str) -> float:
@@ -202,229 +227,1803 @@ def get_realistic_availability(hour: int, day_of_week: int, zone_category: str)
     
     return availability
 
+# ---------------- BASELINE TABLES ----------------
+# Every pattern category, in the order of the first axis of BASELINE_TABLES
+BASELINE_CATEGORIES = list(ZONE_PATTERNS)
+CATEGORY_CODES = {category: code for code, category in enumerate(BASELINE_CATEGORIES)}
+
+def compile_baseline_tables() -> np.ndarray:
+    """get_realistic_availability for every (category, weekday, hour), shape (categories, 7, 24)"""
+    return np.array([
+        [[get_realistic_availability(hour, day_of_week, category) for hour in range(24)]
+         for day_of_week in range(7)]
+        for category in BASELINE_CATEGORIES
+    ])
+
+BASELINE_TABLES = compile_baseline_tables()
+
+def category_codes(categories) -> np.ndarray:
+    """BASELINE_TABLES row of each category; unknown categories use the default row"""
+    default = CATEGORY_CODES["default"]
+    return np.array([CATEGORY_CODES.get(c, default) for c in categories], dtype=np.intp)
+
 # ---------------- ENHANCED FEATURE CALCULATION ----------------
+
+def _fill_hourly_range(counts: pd.DataFrame, starts: pd.Series, ends: pd.Series) -> pd.DataFrame:
+    """Reindex (zoneId, timestamp) counts onto a contiguous hourly range per zone, zero-filled"""
+    lengths = ((ends - starts) // pd.Timedelta(hours=1)).astype(np.int64).to_numpy() + 1
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    tz = starts.dt.tz
+    if tz is not None:
+        starts = starts.dt.tz_convert('UTC').dt.tz_localize(None)
+    hour_index = pd.DatetimeIndex(np.repeat(starts.to_numpy(), lengths) + offsets * np.timedelta64(1, 'h'))
+    if tz is not None:
+        hour_index = hour_index.tz_localize('UTC').tz_convert(tz)
+
+    full_index = pd.MultiIndex.from_arrays(
+        [np.repeat(starts.index.to_numpy(), lengths), hour_index],
+        names=['zoneId', 'timestamp']
+    )
+    counts = counts.reindex(columns=REPORT_TYPES, fill_value=0).reindex(full_index, fill_value=0)
+    counts.columns.name = None
+    return counts
+
+def build_hourly_report_counts(reports_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Roll reports up into hourly counts per zone and report type in a single groupby pass.
+    Every zone gets a contiguous hourly range from its first to its last report,
+    with zero counts for the quiet hours in between (see _hourly_counts_from_frame).
+    """
+    hours = reports_df['timestamp'].dt.floor('h')
+    counts = (
+        reports_df.groupby([reports_df['zoneId'], hours.rename('timestamp'), reports_df['reportType']])
+        .size()
+        .unstack('reportType', fill_value=0)
+    )
+
+    span = hours.groupby(reports_df['zoneId']).agg(['min', 'max'])
+    return _fill_hourly_range(counts, span['min'], span['max'] + pd.Timedelta(hours=1))
+
+def _hourly_counts_from_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Hourly count frame from long-format (zoneId, timestamp, reportType, count) rows of hour
+    buckets. Each zone's range runs from its first bucket through its last bucket + 1h,
+    always, even when the last report falls exactly on the hour. Every fetch mode uses this
+    range, so raw reports, stored aggregates and columnar datasets give the same series.
+    """
+    if len(frame) == 0:
+        empty_index = pd.MultiIndex.from_arrays(
+            [[], pd.DatetimeIndex([], tz=UTC)], names=['zoneId', 'timestamp']
+        )
+        return pd.DataFrame(0, index=empty_index, columns=REPORT_TYPES)
+    
+    counts_df = frame.pivot_table(
+        index=['zoneId', 'timestamp'], columns='reportType', values='count', aggfunc='sum', fill_value=0
+    )
+    span = frame.groupby('zoneId')['timestamp'].agg(['min', 'max'])
+    return _fill_hourly_range(counts_df, span['min'], span['max'] + pd.Timedelta(hours=1))
+
+def drain_hourly_rows(rows) -> dict:
+    """
+    Pull pre-aggregated {zoneId, hour, reportType, count} rows into column lists.
+    Rows can be any iterable, including a cursor, which is consumed here.
+    """
+    columns = {"zoneId": [], "hour": [], "reportType": [], "count": []}
+    for row in rows:
+        columns["zoneId"].append(row["zoneId"])
+        columns["hour"].append(row["hour"])
+        columns["reportType"].append(row["reportType"])
+        columns["count"].append(row["count"])
+    return columns
+
+def hourly_counts_from_lists(columns: dict) -> pd.DataFrame:
+    """Hourly count frame from the column lists of drain_hourly_rows"""
+    return _hourly_counts_from_frame(pd.DataFrame({
+        'zoneId': columns["zoneId"],
+        'timestamp': pd.to_datetime(columns["hour"], utc=True),
+        'reportType': columns["reportType"],
+        'count': np.asarray(columns["count"], dtype=np.int64)
+    }))
+
+def hourly_counts_from_rows(rows) -> pd.DataFrame:
+    """
+    Build the hourly count frame from pre-aggregated {zoneId, hour, reportType, count} rows,
+    e.g. the output of fetch_hourly_counts. Rows can be any iterable, including a cursor.
+    """
+    return hourly_counts_from_lists(drain_hourly_rows(rows))
+
+def hourly_counts_from_columns(columns: dict, zone_ids=None) -> pd.DataFrame:
+    """
+    Hourly count frame straight from a columnar dataset (see report_columns),
+    optionally restricted to some zones. Works on the integer codes throughout.
+    """
+    zone_codes = np.asarray(columns["zone"])
+    if zone_ids is not None:
+        wanted = np.flatnonzero(np.isin(columns["zone_ids"], list(zone_ids)))
+        mask = np.isin(zone_codes, wanted)
+        zone_codes = zone_codes[mask]
+        hours = np.asarray(columns["timestamp"])[mask] // 3_600_000
+        report_types = np.asarray(columns["reportType"])[mask]
+    else:
+        hours = np.asarray(columns["timestamp"]) // 3_600_000
+        report_types = np.asarray(columns["reportType"])
+
+    # One sort over a packed (hour, zone, type) key instead of a groupby on objects
+    num_zones, num_types = len(columns["zone_ids"]), len(REPORT_TYPES)
+    first_hour = hours.min() if len(hours) else 0
+    keys = ((hours - first_hour) * num_zones + zone_codes) * num_types + report_types
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    type_codes = unique_keys % num_types
+    zone_of_key = (unique_keys // num_types) % num_zones
+    hour_of_key = unique_keys // (num_types * num_zones) + first_hour
+
+    return _hourly_counts_from_frame(pd.DataFrame({
+        'zoneId': columns["zone_ids"][zone_of_key],
+        'timestamp': pd.to_datetime(hour_of_key * 3600, unit='s', utc=True),
+        'reportType': np.array(REPORT_TYPES)[type_codes],
+        'count': counts
+    }))
+
+def adjust_availability(baseline, parked, left, full, empty) -> np.ndarray:
+    """
+    Baseline availability adjusted by one hour's report counts (arrays or scalars):
+    "full" caps it, "empty" floors it, otherwise it is nudged by net parking activity
+    """
+    net_parking = np.asarray(parked) - np.asarray(left)
+    adjustment = np.minimum(0.2, np.abs(net_parking) * 0.05)
+    return np.select(
+        [np.asarray(full) > 0, np.asarray(empty) > 0, net_parking > 0, net_parking < 0],
+        [
+            np.minimum(baseline, 0.1),
+            np.maximum(baseline, 0.8),
+            np.maximum(0.05, baseline - adjustment),
+            np.minimum(0.95, baseline + adjustment)
+        ],
+        default=baseline
+    )
+
+def apply_occupancy_rules(hourly_counts: pd.DataFrame, zone_categories: dict, rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Turn hourly report counts into availability scores for all zones at once,
+    using the same adjustment rules as the per-hour loop this replaced
+    """
+    rng = rng or np.random.default_rng()
+
+    timestamps = hourly_counts.index.get_level_values('timestamp')
+    zone_ids = hourly_counts.index.get_level_values('zoneId')
+    # Realistic baseline from the (weekday, hour) table of each zone's category
+    unique_zones, zone_index = np.unique(zone_ids.to_numpy(), return_inverse=True)
+    codes = category_codes([zone_categories.get(z, "default") for z in unique_zones])[zone_index]
+    baseline = BASELINE_TABLES[codes, timestamps.weekday.to_numpy(), timestamps.hour.to_numpy()]
+
+    parked = hourly_counts['parked'].to_numpy()
+    left = hourly_counts['left'].to_numpy()
+    full = hourly_counts['full'].to_numpy()
+    empty = hourly_counts['empty'].to_numpy()
+    availability = adjust_availability(baseline, parked, left, full, empty)
+
+    # Add some random variation to make it more realistic
+    noise = rng.normal(0, 0.03, len(availability))
+    availability = np.clip(availability + noise, 0.05, 0.95)
+
+    return pd.DataFrame({
+        'availabilityScore': availability,
+        'reportCount': parked + left + full + empty,
+        'parkedReports': parked,
+        'leftReports': left
+    }, index=hourly_counts.index)
+
+def calculate_occupancy_for_zones(reports_df: pd.DataFrame, zone_categories: dict, rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Hourly occupancy for every zone present in reports_df, indexed by (zoneId, timestamp)
+    """
+    if len(reports_df) == 0:
+        return pd.DataFrame(columns=['availabilityScore', 'reportCount', 'parkedReports', 'leftReports'])
+    return apply_occupancy_rules(build_hourly_report_counts(reports_df), zone_categories, rng)
+
 def calculate_occupancy_from_reports(reports_df: pd.DataFrame, zone_capacity: int, zone_category: str) -> pd.DataFrame:
     """
     Calculate more realistic occupancy patterns from user reports
     """
-    print(f"    📊 Processing {len(reports_df)} reports for {zone_category} zone (capacity: {zone_capacity})")
-    
-    # Sort by timestamp
-    reports_df = reports_df.sort_values('timestamp')
+    hourly_counts = build_hourly_report_counts(reports_df.assign(zoneId="zone"))
+    return calculate_occupancy_from_counts(hourly_counts, len(reports_df), zone_capacity, zone_category)
+
+def calculate_occupancy_from_counts(hourly_counts: pd.DataFrame, report_count: int, zone_capacity: int,
+                                    zone_category: str) -> pd.DataFrame:
+    """
+    Occupancy of one zone from its hourly report counts (see build_hourly_report_counts),
+    indexed by timestamp
+    """
+    zone_print(f"    📊 Processing {report_count} reports for {zone_category} zone (capacity: {zone_capacity})")
     
     # Analyze report distribution
-    report_counts = reports_df['reportType'].value_counts()
-    print(f"    📈 Report distribution: {dict(report_counts)}")
-    
-    # Create hourly buckets for the entire time range
-    start_time = reports_df['timestamp'].min()
-    end_time = reports_df['timestamp'].max()
-    hourly_range = pd.date_range(start=start_time.floor('H'), end=end_time.ceil('H'), freq='H')
+    if VERBOSE:
+        report_counts = hourly_counts.sum().sort_values(ascending=False)
+        print(f"    📈 Report distribution: {dict(report_counts[report_counts > 0])}")
     
-    occupancy_data = []
-    
-    for hour_start in hourly_range:
-        hour_end = hour_start + timedelta(hours=1)
-        
-        # Get reports in this hour
-        hour_reports = reports_df[
-            (reports_df['timestamp'] >= hour_start) & 
-            (reports_df['timestamp'] < hour_end)
-        ]
-        
-        # Calculate realistic availability for this time
-        realistic_availability = get_realistic_availability(
-            hour_start.hour, 
-            hour_start.weekday(), 
-            zone_category
-        )
-        
-        # If we have reports, adjust the realistic baseline
-        if len(hour_reports) > 0:
-            parked_count = len(hour_reports[hour_reports['reportType'] == 'parked'])
-            left_count = len(hour_reports[hour_reports['reportType'] == 'left'])
-            full_count = len(hour_reports[hour_reports['reportType'] == 'full'])
-            empty_count = len(hour_reports[hour_reports['reportType'] == 'empty'])
-            
-            # Adjust availability based on reports
-            if full_count > 0:
-                # If someone reported "full", reduce availability
-                realistic_availability = min(realistic_availability, 0.1)
-            elif empty_count > 0:
-                # If someone reported "empty", increase availability
-                realistic_availability = max(realistic_availability, 0.8)
-            else:
-                # Adjust based on parking activity
-                net_parking = parked_count - left_count
-                if net_parking > 0:
-                    # More people parked than left - reduce availability slightly
-                    adjustment = min(0.2, net_parking * 0.05)
-                    realistic_availability = max(0.05, realistic_availability - adjustment)
-                elif net_parking < 0:
-                    # More people left than parked - increase availability slightly
-                    adjustment = min(0.2, abs(net_parking) * 0.05)
-                    realistic_availability = min(0.95, realistic_availability + adjustment)
-        
-        # Add some random variation to make it more realistic
-        noise = np.random.normal(0, 0.03)  # Small random variation
-        realistic_availability = max(0.05, min(0.95, realistic_availability + noise))
-        
-        occupancy_data.append({
-            'timestamp': hour_start,
-            'availabilityScore': realistic_availability,
-            'reportCount': len(hour_reports),
-            'parkedReports': len(hour_reports[hour_reports['reportType'] == 'parked']) if len(hour_reports) > 0 else 0,
-            'leftReports': len(hour_reports[hour_reports['reportType'] == 'left']) if len(hour_reports) > 0 else 0
-        })
-    
-    result_df = pd.DataFrame(occupancy_data)
-    result_df.set_index('timestamp', inplace=True)
+    # Single-zone run of the vectorized engine
+    zone_ids = hourly_counts.index.get_level_values('zoneId')
+    result_df = apply_occupancy_rules(hourly_counts, dict.fromkeys(zone_ids.unique(), zone_category))
+    result_df = result_df.droplevel('zoneId')
     
     # Print statistics for debugging
-    if len(result_df) > 0:
+    if VERBOSE and len(result_df) > 0:
         print(f"    📈 Availability stats: min={result_df['availabilityScore'].min():.2f}, "
               f"max={result_df['availabilityScore'].max():.2f}, mean={result_df['availabilityScore'].mean():.2f}")
     
     return result_df
 
 # ---------------- SIMPLE PREDICTION LOGIC ----------------
-def generate_realistic_predictions(zone_category: str, historical_df: pd.DataFrame, start_time: datetime, hours: int = 24) -> list:
+# Categories that get busier during the RUSH_FESTIVAL run
+FESTIVAL_RUSH_CATEGORIES = ['traditional_market', 'commercial_high']
+
+def hour_of_day_means(occupancy: pd.DataFrame) -> pd.DataFrame:
     """
-    Generate realistic predictions based on zone patterns and historical data
+    Mean historical availabilityScore per zone and hour of day, shape (zones, 24),
+    NaN where a zone has no history for an hour
+    """
+    scores = occupancy['availabilityScore']
+    hours = scores.index.get_level_values('timestamp').hour
+    means = scores.groupby([scores.index.get_level_values('zoneId'), hours]).mean().unstack()
+    return means.reindex(columns=range(24))
+
+def predict_zones_batch(zone_categories: list, start_time: datetime, hours: int = 24,
+                        hour_means: np.ndarray = None, rng: np.random.Generator = None):
     """
-    predictions = []
+    Availability for the next `hours` hours of every zone in one vectorized pass.
+    hour_means is an optional (zones, 24) array of historical hour-of-day means (NaN
+    where unknown); zones with history for more than 5 hours blend it in at 20%.
+    Returns the horizon timestamps and a (zones, hours) array of scores.
+    """
+    rng = rng or np.random.default_rng()
+    horizon = [start_time + timedelta(hours=i) for i in range(1, hours + 1)]
+    hours_of_day = np.array([t.hour for t in horizon])
+    weekdays = np.array([t.weekday() for t in horizon])
+    codes = category_codes(zone_categories)
+    
+    # Realistic baseline for every (zone, horizon hour)
+    baseline = BASELINE_TABLES[codes[:, None], weekdays[None, :], hours_of_day[None, :]]
+    availability = baseline
+    
+    # Blend 80% baseline with 20% historical average (prioritize realistic patterns)
+    if hour_means is not None:
+        has_history = (~np.isnan(hour_means)).sum(axis=1) > 5
+        historical = hour_means[:, hours_of_day]
+        blend = has_history[:, None] & ~np.isnan(historical)
+        availability = np.where(blend, 0.8 * baseline + 0.2 * np.nan_to_num(historical), baseline)
+    
+    # Festival impact: holidays are less busy, the festival rush fills markets and shopping streets
+    calendar_days = calendar_for(horizon[0], horizon[-1]).lookup(horizon)
+    rush_zones = np.isin(codes, [CATEGORY_CODES[c] for c in FESTIVAL_RUSH_CATEGORIES])
+    factor = np.where(calendar_days["national_holiday"], 1.2,
+                      np.where(calendar_days["festival_rush"] & rush_zones[:, None], 0.8, 1.0))
+    # Weather impact (simplified): slightly less busy due to rain
+    factor = factor * np.where(calendar_days["season"] == MONSOON, 1.1, 1.0)
+    availability = np.clip(availability * factor, 0.05, 0.95)
     
+    # Add small random variation for realism
+    availability = np.clip(availability + rng.uniform(-0.05, 0.05, availability.shape), 0.05, 0.95)
+    return horizon, availability
+
+def prediction_documents(timestamps: list, scores: np.ndarray, bounds: np.ndarray = None,
+                         confidence: np.ndarray = None) -> list:
+    """
+    The predictions array stored on a zone, from ISO timestamps and one row of scores,
+    with the row's (hours, 3) p10/p50/p90 bounds where known and its confidences
+    """
+    if confidence is None:
+        confidence = np.full(len(timestamps), DEFAULT_CONFIDENCE)
+    predictions = [
+        {"timestamp": timestamp, "availabilityScore": score, "confidence": c}
+        for timestamp, score, c in zip(timestamps, scores.tolist(), confidence.tolist())
+    ]
+    if bounds is not None:
+        for prediction, row in zip(predictions, bounds.tolist()):
+            if not np.isnan(row[0]):
+                prediction.update(zip(QUANTILE_FIELDS, row))
+    return predictions
+
+def zone_sketch(zone_id: str, historical_df: pd.DataFrame) -> AvailabilitySketches:
+    """Availability sketch of one zone's timestamp-indexed occupancy frame (empty without history)"""
+    if len(historical_df) == 0:
+        return AvailabilitySketches()
+    return AvailabilitySketches.from_scores(np.full(len(historical_df), zone_id, dtype=object),
+                                            historical_df.index, historical_df['availabilityScore'].to_numpy())
+
+def generate_realistic_predictions(zone_category: str, historical_df: pd.DataFrame, start_time: datetime, hours: int = 24,
+                                   sketches: AvailabilitySketches = None, zone_id: str = None) -> list:
+    """
+    Generate realistic predictions based on zone patterns and historical data;
+    bounds and confidence come from zone_id's availability sketch, if sketches has one
+    """
     # Calculate average availability by hour from historical data if available
-    hourly_averages = {}
+    hour_means = None
     if len(historical_df) > 0:
-        historical_df['hour'] = historical_df.index.hour
-        hourly_averages = historical_df.groupby('hour')['availabilityScore'].mean().to_dict()
+        scores = historical_df['availabilityScore']
+        hour_means = scores.groupby(scores.index.hour).mean().reindex(range(24)).to_numpy()[None, :]
     
-    for i in range(1, hours + 1):
-        t = start_time + timedelta(hours=i)
-        hour = t.hour
-        day_of_week = t.weekday()
-        
-        # Get realistic baseline availability
-        baseline_availability = get_realistic_availability(hour, day_of_week, zone_category)
-        
-        # If we have historical data for this hour, blend it with baseline
-        if hour in hourly_averages and len(hourly_averages) > 5:
-            historical_avg = hourly_averages[hour]
-            # Blend 80% baseline with 20% historical average (prioritize realistic patterns)
-            final_availability = 0.8 * baseline_availability + 0.2 * historical_avg
+    horizon, scores = predict_zones_batch([zone_category], start_time, hours, hour_means)
+    
+    # Debug output for first few predictions
+    if VERBOSE:
+        code = category_codes([zone_category])[0]
+        for t, score in zip(horizon[:3], scores[0]):
+            baseline_availability = BASELINE_TABLES[code, t.weekday(), t.hour]
+            print(f"      {t.strftime('%H:%M')}: {score:.0%} (baseline: {baseline_availability:.0%})")
+    
+    if sketches is not None and zone_id in sketches:
+        bounds, confidence = sketches.bounds([zone_id], horizon)
+        bounds, confidence = bounds[0], confidence[0]
+    else:
+        # No history to bound the prediction with
+        bounds, confidence = None, np.full(len(horizon), DEFAULT_CONFIDENCE)
+    return prediction_documents([t.isoformat() for t in horizon], scores[0], bounds, confidence)
+
+# ---------------- GLOBAL MODEL ----------------
+GLOBAL_MODEL_FEATURES = [
+    "hour", "weekday", "hourOfWeek", "isWeekend", "category", "season", "festivalFactor",
+    "festivalRush", "nationalHoliday", "baseline", "zoneHourMean", "zoneMean"
+]
+GLOBAL_MODEL_CATEGORICAL = ["category", "season"]
+
+# Search space of the successive-halving random search
+GLOBAL_MODEL_PARAMS = {
+    "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    "max_leaf_nodes": [15, 31, 63, 127],
+    "min_samples_leaf": [10, 20, 50, 100],
+    "l2_regularization": [0.0, 0.1, 1.0],
+    "max_iter": [100, 200, 400]
+}
+# Below this many training rows the search is skipped and default parameters are used
+MIN_SAMPLES_FOR_SEARCH = 2000
+
+def zone_profiles(occupancy: pd.DataFrame) -> pd.DataFrame:
+    """Per-zone mean availability for every hour of day (columns 0-23) and overall ("mean")"""
+    profiles = hour_of_day_means(occupancy)
+    profiles["mean"] = occupancy['availabilityScore'].groupby(level='zoneId').mean()
+    return profiles
+
+def global_model_features(zone_ids, timestamps: pd.DatetimeIndex, zone_categories: dict,
+                          profiles: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature rows for aligned arrays of zone ids and UTC timestamps: time of week,
+    calendar, the category baseline and the zone's own hour-of-day profile
+    (NaN for zones without history, which the model handles natively)
+    """
+    unique_zones, zone_rows = np.unique(np.asarray(zone_ids), return_inverse=True)
+    codes = category_codes([zone_categories.get(z, "default") for z in unique_zones])[zone_rows]
+    profile = profiles.reindex(unique_zones)
+    hour_means = profile[list(range(24))].to_numpy(dtype=float)
+
+    hours = timestamps.hour.to_numpy()
+    weekdays = timestamps.weekday.to_numpy()
+    calendar_days = calendar_for(timestamps.min(), timestamps.max()).lookup(
+        timestamps.tz_convert(None).to_numpy() if timestamps.tz is not None else timestamps.to_numpy()
+    )
+    return pd.DataFrame({
+        "hour": hours,
+        "weekday": weekdays,
+        "hourOfWeek": weekdays * 24 + hours,
+        "isWeekend": (weekdays >= 5).astype(np.int8),
+        "category": codes,
+        "season": calendar_days["season"].astype(np.int64),
+        "festivalFactor": calendar_days["festival_factor"],
+        "festivalRush": calendar_days["festival_rush"].astype(np.int8),
+        "nationalHoliday": calendar_days["national_holiday"].astype(np.int8),
+        "baseline": BASELINE_TABLES[codes, weekdays, hours],
+        "zoneHourMean": hour_means[zone_rows, hours],
+        "zoneMean": profile["mean"].to_numpy(dtype=float)[zone_rows]
+    }, columns=GLOBAL_MODEL_FEATURES)
+
+class GlobalAvailabilityModel:
+    """
+    One HistGradientBoosting regressor over the hourly availability of every zone, tuned
+    with a parallel successive-halving random search. Zones enter through their category
+    and hour-of-day profile, so a single fit serves any number of zones.
+    The last test_fraction of every zone's hours is held out for the per-zone summary.
+    """
+
+    def __init__(self, n_jobs: int = 1, n_candidates: int = 24, test_fraction: float = 0.15,
+                 random_state: int = 0):
+        self.n_jobs = n_jobs
+        self.n_candidates = n_candidates
+        self.test_fraction = test_fraction
+        self.random_state = random_state
+        self.estimator = None
+        self.best_params = {}
+
+    def fit(self, occupancy: pd.DataFrame, zone_categories: dict):
+        zone_ids = occupancy.index.get_level_values('zoneId')
+        timestamps = occupancy.index.get_level_values('timestamp')
+        target = occupancy['availabilityScore'].to_numpy()
+
+        # Rows are hourly and time-ordered within each zone
+        by_zone = occupancy.groupby(level='zoneId')
+        position = by_zone.cumcount().to_numpy()
+        zone_size = by_zone['availabilityScore'].transform('size').to_numpy()
+        test = position >= np.ceil(zone_size * (1 - self.test_fraction))
+
+        train_profiles = zone_profiles(occupancy[~test])
+        features = global_model_features(zone_ids, timestamps, zone_categories, train_profiles)
+        estimator = HistGradientBoostingRegressor(categorical_features=GLOBAL_MODEL_CATEGORICAL,
+                                                  random_state=self.random_state)
+        if (~test).sum() >= MIN_SAMPLES_FOR_SEARCH:
+            search = HalvingRandomSearchCV(
+                estimator, GLOBAL_MODEL_PARAMS, n_candidates=self.n_candidates, factor=3,
+                cv=KFold(3, shuffle=True, random_state=self.random_state),
+                scoring="neg_mean_absolute_error", n_jobs=self.n_jobs, random_state=self.random_state
+            )
+            search.fit(features[~test], target[~test])
+            self.estimator, self.best_params = search.best_estimator_, search.best_params_
         else:
-            final_availability = baseline_availability
-        
-        # Apply some external factors
-        
-        # Festival impact
-        if t.month == 8 and t.day == 15:  # Independence Day
-            final_availability *= 1.2  # Less busy
-        elif t.month == 9 and 1 <= t.day <= 15:  # Ganesh festival period
-            if zone_category in ['traditional_market', 'commercial_high']:
-                final_availability *= 0.8  # More busy
-        
-        # Weather impact (simplified)
-        if t.month in [6, 7, 8, 9]:  # Monsoon
-            final_availability *= 1.1  # Slightly less busy due to rain
-        
-        # Ensure bounds
-        final_availability = max(0.05, min(0.95, final_availability))
-        
-        # Add small random variation for realism
-        final_availability += random.uniform(-0.05, 0.05)
-        final_availability = max(0.05, min(0.95, final_availability))
-        
-        # Debug output for first few predictions
-        if i <= 3:
-            print(f"      {t.strftime('%H:%M')}: {final_availability:.0%} (baseline: {baseline_availability:.0%})")
-        
-        predictions.append({
-            "timestamp": t.isoformat(),
-            "availabilityScore": float(final_availability),
-            "confidence": 0.8
+            self.estimator = estimator.fit(features[~test], target[~test])
+            self.best_params = {}
+
+        self.zone_categories = zone_categories
+        self.training_samples = int((~test).sum())
+        self.holdout = pd.DataFrame({
+            "zoneId": zone_ids[test],
+            "actual": target[test],
+            "predicted": self.estimator.predict(features[test]) if test.any() else np.empty(0)
+        })
+        self.train_counts = pd.Series(zone_ids[~test]).value_counts()
+        # Predictions use the profiles of the whole history
+        self.profiles = zone_profiles(occupancy)
+        return self
+
+    def predict_horizon(self, zone_ids: list, start_time: datetime, hours: int = 24):
+        """Horizon timestamps and a (zones, hours) array of availability scores"""
+        horizon = [start_time + timedelta(hours=i) for i in range(1, hours + 1)]
+        timestamps = pd.DatetimeIndex(horizon * len(zone_ids))
+        features = global_model_features(np.repeat(zone_ids, hours), timestamps, self.zone_categories, self.profiles)
+        scores = self.estimator.predict(features).reshape(len(zone_ids), hours)
+        return horizon, np.clip(scores, 0.05, 0.95)
+
+    def holdout_scores(self) -> tuple:
+        """MAE and R² over all held-out rows"""
+        if len(self.holdout) == 0:
+            return float("nan"), float("nan")
+        return (mean_absolute_error(self.holdout["actual"], self.holdout["predicted"]),
+                r2_score(self.holdout["actual"], self.holdout["predicted"]))
+
+    def summary(self) -> pd.DataFrame:
+        """Per-zone holdout metrics in the model_performance_summary.csv layout"""
+        holdout = self.holdout.assign(
+            error=self.holdout["predicted"] - self.holdout["actual"],
+            zone_mean=self.holdout.groupby("zoneId")["actual"].transform("mean")
+        )
+        grouped = holdout.assign(
+            abs_error=holdout["error"].abs(),
+            squared_error=holdout["error"] ** 2,
+            squared_spread=(holdout["actual"] - holdout["zone_mean"]) ** 2
+        ).groupby("zoneId")
+        sse = grouped["squared_error"].sum()
+        sst = grouped["squared_spread"].sum()
+        # Same convention as r2_score for zones whose actual values are constant
+        r2 = np.where(sst > 0, 1 - sse / sst.where(sst > 0, 1), np.where(sse == 0, 1.0, 0.0))
+        return pd.DataFrame({
+            "zone_id": sse.index,
+            "model_type": "GlobalHistGradientBoosting",
+            "r2_score": r2,
+            "mae": grouped["abs_error"].mean().to_numpy(),
+            "rmse": np.sqrt(grouped["squared_error"].mean().to_numpy()),
+            "zone_category": [self.zone_categories.get(z, "default") for z in sse.index],
+            "training_samples": self.train_counts.reindex(sse.index, fill_value=0).to_numpy(),
+            "test_samples": grouped.size().to_numpy(),
+            "best_params": str(self.best_params)
         })
+
+    def write_summary(self, path: str):
+        self.summary().to_csv(path, index=False)
+
+    def save(self, path: str):
+        """One file for the whole model: estimator, parameters and zone profiles"""
+        joblib.dump({
+            "estimator": self.estimator,
+            "best_params": self.best_params,
+            "profiles": self.profiles,
+            "zone_categories": self.zone_categories,
+            "features": GLOBAL_MODEL_FEATURES
+        }, path)
+
+# ---------------- REPORT FETCHING ----------------
+def fetch_hourly_rows(db, zone_ids=None, since: datetime = None, until: datetime = None,
+                      batch_size: int = 10000):
+    """
+    Cursor of {zoneId, hour, reportType, count} rows from a single server-side aggregation,
+    optionally limited to reports in (since, until]
+    """
+    match = {}
+    if zone_ids is not None:
+        match["zoneId"] = {"$in": list(zone_ids)}
+    time_range = {}
+    if since is not None:
+        time_range["$gt"] = since
+    if until is not None:
+        time_range["$lte"] = until
+    if time_range:
+        match["timestamp"] = time_range
     
-    return predictions
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "zoneId": "$zoneId",
+                # $dateFromParts truncates to the hour on every server version (and in mongomock)
+                "hour": {"$dateFromParts": {
+                    "year": {"$year": "$timestamp"},
+                    "month": {"$month": "$timestamp"},
+                    "day": {"$dayOfMonth": "$timestamp"},
+                    "hour": {"$hour": "$timestamp"}
+                }},
+                "reportType": "$reportType"
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "_id": 0,
+            "zoneId": "$_id.zoneId",
+            "hour": "$_id.hour",
+            "reportType": "$_id.reportType",
+            "count": 1
+        }}
+    ]
+    return db.userreports.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
 
-# ---------------- MAIN FUNCTION ----------------
-def train_and_update_predictions():
-    from dotenv import load_dotenv
-    load_dotenv()
+def fetch_hourly_counts(db, zone_ids=None, batch_size: int = 10000) -> pd.DataFrame:
+    """
+    Hourly report counts per zone and report type from a single server-side aggregation.
+    Only zones x hours rows cross the network, never the raw report documents.
+    """
+    return hourly_counts_from_rows(fetch_hourly_rows(db, zone_ids, batch_size=batch_size))
+
+# Fields of a report document the per-zone path reads
+REPORT_PROJECTION = {"_id": 0, "reportType": 1, "timestamp": 1}
+# Memory the per-zone path may spend on one zone's raw report documents at a time
+DEFAULT_REPORT_MEMORY_MB = 64
+# Approximate resident size of one projected report document while it is being decoded and converted
+RAW_REPORT_BYTES = 512
+MS_PER_HOUR = 3_600_000
+
+def report_chunk_size(memory_mb: float) -> int:
+    """Reports per chunk that keep a zone's raw documents within memory_mb"""
+    return max(1000, int(memory_mb * 2**20) // RAW_REPORT_BYTES)
+
+class ZoneReportCounts:
+    """
+    Hourly report counts of one zone, folded in from time-ordered chunks of reports.
+    Only (hour, report type) counts are kept between chunks, so memory grows with the
+    hours a zone's history spans, not with its number of reports.
+    """
     
-    MONGO_URI = os.getenv("MONGO_URI")
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client.ParkWiseDB
+    def __init__(self, zone_id: str):
+        self.zone_id = zone_id
+        self.total = 0
+        self._type_codes = {report_type: code for code, report_type in enumerate(REPORT_TYPES)}
+        self._keys, self._counts = [], []
+        self._first, self._last = None, None
+    
+    def add(self, report_types: np.ndarray, timestamps: np.ndarray):
+        """Fold in uint8 report type codes (len(REPORT_TYPES) for unknown types) and epoch-ms timestamps"""
+        if len(timestamps) == 0:
+            return
+        self.total += len(timestamps)
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self._first = first if self._first is None else min(self._first, first)
+        self._last = last if self._last is None else max(self._last, last)
+        known = report_types < len(REPORT_TYPES)
+        keys = (timestamps[known] // MS_PER_HOUR) * len(REPORT_TYPES) + report_types[known]
+        keys, counts = np.unique(keys, return_counts=True)
+        self._keys.append(keys)
+        self._counts.append(counts)
+    
+    def add_documents(self, documents: list):
+        """Fold in report documents ({reportType, timestamp}, see REPORT_PROJECTION)"""
+        if not documents:
+            return
+        unknown = len(REPORT_TYPES)
+        report_types = np.array([self._type_codes.get(d.get("reportType"), unknown) for d in documents],
+                                dtype=np.uint8)
+        timestamps = pd.to_datetime([d["timestamp"] for d in documents], utc=True).as_unit('ms').asi8
+        self.add(report_types, timestamps)
+    
+    def hourly_counts(self) -> pd.DataFrame:
+        """The zone's hourly count frame, as build_hourly_report_counts returns it"""
+        if self._first is None:
+            return pd.DataFrame(0, index=pd.MultiIndex.from_arrays(
+                [[], pd.DatetimeIndex([], tz=UTC)], names=['zoneId', 'timestamp']
+            ), columns=REPORT_TYPES)
+        keys, inverse = np.unique(np.concatenate(self._keys), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(self._counts)).astype(np.int64)
+        # Contiguous hours from the first report's through the hour after the last report's
+        first_hour, last_hour = self._first // MS_PER_HOUR, self._last // MS_PER_HOUR + 1
+        matrix = np.zeros((last_hour - first_hour + 1, len(REPORT_TYPES)), dtype=np.int64)
+        matrix[keys // len(REPORT_TYPES) - first_hour, keys % len(REPORT_TYPES)] = counts
+        hours = pd.date_range(pd.Timestamp(first_hour * MS_PER_HOUR, unit='ms', tz=UTC), periods=len(matrix),
+                              freq='h')
+        index = pd.MultiIndex.from_arrays([np.full(len(matrix), self.zone_id, dtype=object), hours],
+                                          names=['zoneId', 'timestamp'])
+        return pd.DataFrame(matrix, index=index, columns=REPORT_TYPES)
 
-    # Get zones with their metadata
-    zones = list(db.parkingzones.find({}, {
-        "zoneId": 1, "zoneName": 1, "category": 1, 
-        "capacity": 1, "estimatedCapacity": 1
-    }))
+def _zone_report_cursor(db, zone_id: str, chunk_size: int):
+    return (db.userreports.find({"zoneId": zone_id}, REPORT_PROJECTION)
+            .sort("timestamp", 1).batch_size(chunk_size))
+
+def load_zone_report_counts(db, zone_id: str, memory_mb: float = DEFAULT_REPORT_MEMORY_MB) -> ZoneReportCounts:
+    """
+    Hourly report counts of a single zone, read in time-ordered chunks of projected
+    documents so that however long its history, at most memory_mb of raw reports is held
+    """
+    chunk_size = report_chunk_size(memory_mb)
+    reports = ZoneReportCounts(zone_id)
+    cursor = iter(_zone_report_cursor(db, zone_id, chunk_size))
+    for documents in iter(lambda: list(islice(cursor, chunk_size)), []):
+        reports.add_documents(documents)
+    return reports
+
+# ---------------- INCREMENTAL AGGREGATES ----------------
+# Per-zone hourly counts already folded in, and the report time each zone is complete up to
+AGGREGATES_COLLECTION = "hourlyaggregates"
+WATERMARKS_COLLECTION = "trainingwatermarks"
+# Per-zone availability sketches (see quantile_sketch) and the hour each has taken in everything before;
+# only incremental runs keep them, the other fetch modes rebuild sketches from the full history
+SKETCHES_COLLECTION = "availabilitysketches"
+
+def ensure_incremental_indexes(db):
+    db[AGGREGATES_COLLECTION].create_index([("zoneId", 1), ("hour", 1)], unique=True)
+    db[WATERMARKS_COLLECTION].create_index("zoneId", unique=True)
+    db[SKETCHES_COLLECTION].create_index("zoneId", unique=True)
+
+def reset_incremental_state(db, zone_ids=None):
+    """Forget stored aggregates, watermarks and sketches so the next incremental run rebuilds from scratch"""
+    query = {} if zone_ids is None else {"zoneId": {"$in": list(zone_ids)}}
+    db[AGGREGATES_COLLECTION].delete_many(query)
+    db[WATERMARKS_COLLECTION].delete_many(query)
+    db[SKETCHES_COLLECTION].delete_many(query)
+
+def _hour_start(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def merge_new_reports(db, zone_ids: list, until: datetime, batch_size: int = 1000) -> int:
+    """
+    Bring the stored hourly aggregates of the zones up to until. Each zone's hours from the
+    one its watermark falls in are recounted from userreports and $set, never $inc-ed, and
+    its watermark document keeps the count of reports in the hours before that (settled
+    hours are never recounted). A run that dies between the aggregate and watermark writes,
+    or half way through either, is therefore simply redone by the next one, without counting
+    any report twice. Zones sharing a watermark are recounted with one aggregation, so a
+    regular nightly run issues a single query. Zones without a settled count (never merged,
+    or merged by an older version) are recounted from their first report.
+    Returns the number of reports the aggregates gained.
+    """
+    states = {
+        doc["zoneId"]: doc
+        for doc in db[WATERMARKS_COLLECTION].find({"zoneId": {"$in": list(zone_ids)}}, {"_id": 0})
+    }
+    zones_by_watermark = {}
+    for zone_id in zone_ids:
+        state = states.get(zone_id, {})
+        since = state.get("lastReportAt") if "settledCount" in state else None
+        zones_by_watermark.setdefault(since, []).append(zone_id)
     
-    print(f"Found {len(zones)} zones to process...")
+    recounted = {}
+    for since, group_ids in zones_by_watermark.items():
+        # Mongo dates are millisecond-precise: after the millisecond before the hour is from the hour on
+        after = None if since is None else _hour_start(since) - timedelta(milliseconds=1)
+        for row in fetch_hourly_rows(db, group_ids, since=after, until=until):
+            hours = recounted.setdefault(row["zoneId"], {})
+            hours.setdefault(row["hour"], dict.fromkeys(REPORT_TYPES, 0))[row["reportType"]] = row["count"]
+    
+    operations = [
+        UpdateOne({"zoneId": zone_id, "hour": hour}, {"$set": counts}, upsert=True)
+        for zone_id, hours in recounted.items()
+        for hour, counts in hours.items()
+    ]
+    for i in range(0, len(operations), batch_size):
+        db[AGGREGATES_COLLECTION].bulk_write(operations[i:i + batch_size], ordered=False)
+    
+    # The hour until falls in is still open: its reports are recounted next time
+    open_hour = _epoch_ms(until) // MS_PER_HOUR * MS_PER_HOUR
+    recounted_in_full = set(zones_by_watermark.get(None, ()))
+    new_reports = 0
+    watermark_operations = []
+    for zone_id in zone_ids:
+        state = {} if zone_id in recounted_in_full else states[zone_id]
+        hour_totals = {hour: sum(counts.values()) for hour, counts in recounted.get(zone_id, {}).items()}
+        settled = state.get("settledCount", 0)
+        report_count = settled + sum(hour_totals.values())
+        new_reports += report_count - state.get("reportCount", 0)
+        watermark_operations.append(UpdateOne({"zoneId": zone_id}, {"$set": {
+            "lastReportAt": until,
+            "settledCount": settled + sum(n for hour, n in hour_totals.items() if _epoch_ms(hour) < open_hour),
+            "reportCount": report_count,
+            "lastReportHour": max(hour_totals, default=state.get("lastReportHour"))
+        }}, upsert=True))
+    for i in range(0, len(watermark_operations), batch_size):
+        db[WATERMARKS_COLLECTION].bulk_write(watermark_operations[i:i + batch_size], ordered=False)
+    
+    return new_reports
 
-    for zone_info in zones:
-        zone_id = zone_info["zoneId"]
-        zone_name = zone_info.get("zoneName", "")
-        zone_category_db = zone_info.get("category", "")
-        capacity = zone_info.get("capacity", zone_info.get("estimatedCapacity", 50))
-        
-        print(f"\n🔄 Processing zone: {zone_id}")
-        
-        # Categorize zone
-        zone_category = categorize_zone(zone_id, zone_name, zone_category_db)
-        print(f"   📍 Category: {zone_category}, Name: {zone_name}, Capacity: {capacity}")
-        
-        # Get user reports
-        reports = list(db.userreports.find({"zoneId": zone_id}).sort("timestamp", 1))
-        print(f"   📊 Found {len(reports)} user reports")
-        
-        if len(reports) < 10:
-            print(f"   ⚠️  Limited data, using pure pattern-based predictions")
+def _epoch_ms(value) -> int:
+    """Epoch milliseconds of a datetime (naive ones, as pymongo returns them, are UTC)"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(UTC)
+    return timestamp.value // 10**6
+
+def load_stored_sketches(db, zone_ids: list) -> tuple:
+    """Stored sketches of the given zones and, per zone, the epoch-ms hour they are complete up to"""
+    documents = {
+        doc["zoneId"]: doc
+        for doc in db[SKETCHES_COLLECTION].find({"zoneId": {"$in": list(zone_ids)}}, {"_id": 0})
+    }
+    through = {zone_id: _epoch_ms(doc["through"]) for zone_id, doc in documents.items()}
+    return AvailabilitySketches.from_documents(documents), through
+
+def merge_sketch_hours(db, zone_ids: list, occupancy: pd.DataFrame, until: datetime,
+                       batch_size: int = 1000) -> AvailabilitySketches:
+    """
+    Stored sketches of zone_ids with the hours of occupancy they have not taken in yet merged
+    in and written back. Only hours completed by until are merged, and each stored sketch
+    records the hour it is complete up to, so every hour is counted exactly once however
+    often the stored aggregates re-derive it.
+    """
+    sketches, through = load_stored_sketches(db, zone_ids)
+    if occupancy is None or len(occupancy) == 0:
+        return sketches
+    hours = occupancy.index.get_level_values('timestamp').as_unit('ms').asi8
+    zone_codes, zones = pd.factorize(occupancy.index.get_level_values('zoneId'))
+    seen_until = np.array([through.get(zone_id, np.iinfo(np.int64).min) for zone_id in zones],
+                          dtype=np.int64)[zone_codes]
+    complete_until = _epoch_ms(until) // MS_PER_HOUR * MS_PER_HOUR
+    new_hours = (hours >= seen_until) & (hours < complete_until)
+    if not new_hours.any():
+        return sketches
+
+    new = occupancy[new_hours]
+    sketches.merge(AvailabilitySketches.from_occupancy(new))
+    last_hours = pd.Series(hours[new_hours], index=new.index.get_level_values('zoneId')).groupby(level=0).max()
+    operations = [
+        UpdateOne({"zoneId": zone_id}, {"$set": {
+            **sketches.document(zone_id),
+            "through": datetime.fromtimestamp((last_hour + MS_PER_HOUR) / 1000, UTC)
+        }}, upsert=True)
+        for zone_id, last_hour in last_hours.items()
+    ]
+    for i in range(0, len(operations), batch_size):
+        db[SKETCHES_COLLECTION].bulk_write(operations[i:i + batch_size], ordered=False)
+    return sketches
+
+def fetch_aggregate_rows(db, zone_ids: list):
+    """Stored hourly counts for the given zones as {zoneId, hour, reportType, count} rows"""
+    projection = {"_id": 0, "zoneId": 1, "hour": 1, **{report_type: 1 for report_type in REPORT_TYPES}}
+    for doc in db[AGGREGATES_COLLECTION].find({"zoneId": {"$in": list(zone_ids)}}, projection):
+        for report_type in REPORT_TYPES:
+            if doc.get(report_type):
+                yield {"zoneId": doc["zoneId"], "hour": doc["hour"], "reportType": report_type,
+                       "count": doc[report_type]}
+
+def load_hourly_aggregates(db, zone_ids: list) -> pd.DataFrame:
+    """Stored hourly counts for the given zones, in the fetch_hourly_counts layout"""
+    return hourly_counts_from_rows(fetch_aggregate_rows(db, zone_ids))
+
+# ---------------- ARTIFACT CACHE ----------------
+# Sources whose changes invalidate every cached artifact
+CODE_VERSION = code_version(*(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ("train_model.py", "pune_calendar.py", "zone_resolver.py", "quantile_sketch.py")
+))
+
+def fetch_zone_fingerprints(db, zone_ids: list) -> dict:
+    """
+    Cheap per-zone summary of the raw reports: (reportType, count, first, last) per type.
+    Any new, removed or moved report changes it, so it keys cached artifacts.
+    """
+    pipeline = [
+        {"$match": {"zoneId": {"$in": list(zone_ids)}}},
+        {"$group": {
+            "_id": {"zoneId": "$zoneId", "reportType": "$reportType"},
+            "count": {"$sum": 1},
+            "first": {"$min": "$timestamp"},
+            "last": {"$max": "$timestamp"}
+        }}
+    ]
+    fingerprints = {}
+    for row in db.userreports.aggregate(pipeline, allowDiskUse=True):
+        fingerprints.setdefault(row["_id"]["zoneId"], []).append(
+            (row["_id"]["reportType"], row["count"], row["first"], row["last"])
+        )
+    return {zone_id: tuple(sorted(parts)) for zone_id, parts in fingerprints.items()}
+
+def incremental_fingerprints(db, zone_ids: list) -> dict:
+    """
+    fetch_zone_fingerprints for the stored aggregates, read off the watermark documents
+    merge_new_reports maintains (report total and last report hour), so an incremental
+    run never scans the full report history to key the cache
+    """
+    return {
+        doc["zoneId"]: (doc["reportCount"], _epoch_ms(doc["lastReportHour"]))
+        for doc in db[WATERMARKS_COLLECTION].find({"zoneId": {"$in": list(zone_ids)}}, {"_id": 0})
+        if doc.get("reportCount")
+    }
+
+def columnar_fingerprints(columns: dict, zone_ids: list) -> dict:
+    """fetch_zone_fingerprints for a columnar dataset: counts per type and first/last timestamp"""
+    zone_codes = np.asarray(columns["zone"])
+    timestamps = np.asarray(columns["timestamp"])
+    num_zones, num_types = len(columns["zone_ids"]), len(REPORT_TYPES)
+    counts = np.bincount(zone_codes * num_types + np.asarray(columns["reportType"]),
+                         minlength=num_zones * num_types).reshape(num_zones, num_types)
+    first = np.full(num_zones, np.iinfo(np.int64).max)
+    last = np.full(num_zones, np.iinfo(np.int64).min)
+    np.minimum.at(first, zone_codes, timestamps)
+    np.maximum.at(last, zone_codes, timestamps)
+
+    code_of = {zone_id: code for code, zone_id in enumerate(columns["zone_ids"].tolist())}
+    fingerprints = {}
+    for zone_id in zone_ids:
+        code = code_of.get(zone_id)
+        if code is not None and counts[code].any():
+            fingerprints[zone_id] = (tuple(counts[code].tolist()), int(first[code]), int(last[code]))
+    return fingerprints
+
+# ---------------- PREDICTION WRITES ----------------
+def _batch_stats(batch_number: int, operations: int, matched: int, errors: list, elapsed: float) -> dict:
+    """Stats of one written batch; errors are the sink's (zone_id, error message) pairs"""
+    print(f"   💾 Batch {batch_number}: {operations} updates in {elapsed * 1000:.0f} ms"
+          f" ({matched} matched, {len(errors)} failed)")
+    return {
+        "batch": batch_number,
+        "operations": operations,
+        "matched": matched,
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": elapsed
+    }
+
+class PredictionWriter:
+    """
+    Collects per-zone prediction updates and flushes them to a prediction sink
+    (see data_sources) in batches. Batches are written on a background thread, so the
+    next zones are computed while a flush is in flight.
+    """
+
+    def __init__(self, sink, batch_size: int = 500):
+        self.sink = sink
+        self.batch_size = batch_size
+        self._pending = []
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediction-writer")
+
+    def add(self, zone_id: str, update_data: dict):
+        self._pending.append((zone_id, update_data))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        updates, self._pending = self._pending, []
+        batch_number = len(self._futures) + 1
+        self._futures.append(self._executor.submit(self._write_batch, batch_number, updates))
+
+    def _write_batch(self, batch_number: int, updates: list) -> dict:
+        started = time.perf_counter()
+        try:
+            matched, errors = self.sink.write(updates)
+        except Exception as e:
+            matched, errors = 0, [(zone_id, f"{type(e).__name__}: {e}") for zone_id, _ in updates]
+        return _batch_stats(batch_number, len(updates), matched, errors, time.perf_counter() - started)
+
+    def close(self) -> list:
+        """Flush what is left, wait for all batches, close the sink and return the batch stats"""
+        self.flush()
+        stats = [future.result() for future in self._futures]
+        self._executor.shutdown()
+        self.sink.close()
+        return stats
+
+class AsyncPredictionWriter:
+    """
+    PredictionWriter for the async pipeline: batches are written as tasks on the event loop,
+    at most max_in_flight at a time, so flush waits for a free slot instead of queueing without bound.
+    """
+
+    def __init__(self, sink, batch_size: int = 500, max_in_flight: int = 4):
+        self.sink = sink
+        self.batch_size = batch_size
+        self._pending = []
+        self._tasks = []
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def add(self, zone_id: str, update_data: dict):
+        self._pending.append((zone_id, update_data))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        updates, self._pending = self._pending, []
+        await self._slots.acquire()
+        batch_number = len(self._tasks) + 1
+        self._tasks.append(asyncio.create_task(self._write_batch(batch_number, updates)))
+
+    async def _write_batch(self, batch_number: int, updates: list) -> dict:
+        started = time.perf_counter()
+        try:
+            matched, errors = await self.sink.write(updates)
+        except Exception as e:
+            matched, errors = 0, [(zone_id, f"{type(e).__name__}: {e}") for zone_id, _ in updates]
+        finally:
+            self._slots.release()
+        return _batch_stats(batch_number, len(updates), matched, errors, time.perf_counter() - started)
+
+    async def close(self) -> list:
+        """Flush what is left, wait for all batches and return the batch stats"""
+        await self.flush()
+        stats = list(await asyncio.gather(*self._tasks))
+        self.sink.close()
+        return stats
+
+# ---------------- ZONE TRAINING ----------------
+MIN_REPORTS_FOR_HISTORY = 10
+
+# parkingzones field each prediction format is stored in (see prediction_codec). The list
+# field is written in every format: the backend API and the app read only that one.
+PREDICTION_FIELDS = {"list": "predictions", "packed": "packedPredictions"}
+
+def _fetch_occupancy(db, zones: list, zone_categories: dict, fetch_mode: str, cutoff: datetime = None,
+                     reports_path: str = None, metrics: StageMetrics = None, merge: bool = True):
+    """
+    Report totals and hourly occupancy of the data-rich zones (None if there are none)
+    for a list of zones from one aggregation.
+    In incremental mode only reports past the zones' watermarks are aggregated; they are
+    merged into the stored hourly aggregates (unless merge is False, when the caller already
+    has), which then stand in for the full history.
+    In columnar mode the counts come from the zones' rows of the dataset at reports_path.
+    """
+    metrics = metrics or StageMetrics()
+    zone_ids = [z["zoneId"] for z in zones]
+    if fetch_mode == "columnar":
+        with metrics.stage("fetch", zones=len(zones)) as stage:
+            columns = load_zone_report_columns(reports_path, zone_ids)
+            stage["items"] = len(columns["zone"])
+        with metrics.stage("frame", zones=len(zones)) as stage:
+            hourly_counts = hourly_counts_from_columns(columns)
+            stage["items"] = len(hourly_counts)
+    else:
+        with metrics.stage("fetch", zones=len(zones)) as stage:
+            if fetch_mode == "incremental":
+                if merge:
+                    new_reports = merge_new_reports(db, zone_ids, cutoff)
+                    print(f"📥 Merged {new_reports} new reports into stored hourly aggregates")
+                rows = drain_hourly_rows(fetch_aggregate_rows(db, zone_ids))
+            else:
+                rows = drain_hourly_rows(fetch_hourly_rows(db, zone_ids))
+            stage["items"] = len(rows["count"])
+        with metrics.stage("frame", zones=len(zones)) as stage:
+            hourly_counts = hourly_counts_from_lists(rows)
+            stage["items"] = len(hourly_counts)
+    report_totals = hourly_counts.sum(axis=1).groupby(level='zoneId').sum()
+    print(f"📥 Aggregated {int(report_totals.sum())} reports into {len(hourly_counts)} zone-hours")
+    
+    # Occupancy for every data-rich zone in one vectorized pass
+    with metrics.stage("bucket", zones=len(zones)) as stage:
+        rich_zones = report_totals.index[report_totals >= MIN_REPORTS_FOR_HISTORY]
+        rich_counts = hourly_counts[hourly_counts.index.get_level_values('zoneId').isin(rich_zones)]
+        occupancy = apply_occupancy_rules(rich_counts, zone_categories) if len(rich_counts) > 0 else None
+        stage["items"] = len(rich_counts)
+    return report_totals, occupancy
+
+def _zone_artifacts(db, zones: list, zone_categories: dict, fetch_mode: str, cutoff: datetime,
+                    reports_path: str, metrics: StageMetrics, cache: ArtifactCache) -> tuple:
+    """
+    Derived artifacts of every zone: report total, hourly occupancy frame, hour-of-day
+    means and availability sketch document. Each zone's artifact is cached under a hash of
+    its report fingerprint, category and the code version, so only zones whose reports
+    changed are fetched and bucketed.
+    Returns (artifacts by zone, cache keys by zone).
+    """
+    zone_ids = [z["zoneId"] for z in zones]
+    with metrics.stage("fetch", zones=len(zones)) as stage:
+        if fetch_mode == "columnar":
+            fingerprints = columnar_fingerprints(load_zone_report_columns(reports_path, zone_ids), zone_ids)
+        elif fetch_mode == "incremental":
+            new_reports = merge_new_reports(db, zone_ids, cutoff)
+            print(f"📥 Merged {new_reports} new reports into stored hourly aggregates")
+            fingerprints = incremental_fingerprints(db, zone_ids)
+        else:
+            fingerprints = fetch_zone_fingerprints(db, zone_ids)
+        stage["items"] = len(fingerprints)
+    keys = {
+        zone_id: artifact_key("zone", zone_id, zone_categories[zone_id], fingerprints.get(zone_id),
+                              MIN_REPORTS_FOR_HISTORY, CODE_VERSION)
+        for zone_id in zone_ids
+    }
+    
+    artifacts = {}
+    for zone_id in zone_ids:
+        artifact = cache.get(keys[zone_id])
+        if artifact is not None:
+            artifacts[zone_id] = artifact
+    changed = [z for z in zones if z["zoneId"] not in artifacts]
+    print(f"🗃️  Cache: reused {len(artifacts)} unchanged zones, recomputing {len(changed)}")
+    
+    if changed:
+        report_totals, occupancy = _fetch_occupancy(db, changed, zone_categories, fetch_mode, cutoff, reports_path,
+                                                    metrics, merge=False)
+        frames, hour_means, sketches = {}, None, AvailabilitySketches()
+        if occupancy is not None:
+            frames = {zone_id: frame.droplevel('zoneId') for zone_id, frame in occupancy.groupby(level='zoneId')}
+            hour_means = hour_of_day_means(occupancy)
+            sketches = AvailabilitySketches.from_occupancy(occupancy)
+        for zone in changed:
+            zone_id = zone["zoneId"]
+            frame = frames.get(zone_id)
+            artifact = {
+                "reportTotal": int(report_totals.get(zone_id, 0)),
+                "occupancy": frame,
+                "hourMeans": hour_means.loc[zone_id].to_numpy(dtype=float) if frame is not None else None,
+                "sketch": sketches.document(zone_id)
+            }
+            cache.put(keys[zone_id], artifact)
+            artifacts[zone_id] = artifact
+    return artifacts, keys
+
+def _artifact_summaries(artifacts: dict) -> tuple:
+    """Report totals, history sizes, hour-of-day means and sketches, as _prefetch_aggregated returns them"""
+    report_totals = pd.Series({zone_id: a["reportTotal"] for zone_id, a in artifacts.items()}, dtype=np.int64)
+    with_history = {zone_id: a for zone_id, a in artifacts.items() if a["occupancy"] is not None}
+    history_points = pd.Series({zone_id: len(a["occupancy"]) for zone_id, a in with_history.items()},
+                               dtype=np.int64)
+    hour_means = pd.DataFrame(
+        [a["hourMeans"] for a in with_history.values()], index=list(with_history), columns=range(24), dtype=float
+    )
+    sketches = AvailabilitySketches.from_documents({zone_id: a["sketch"] for zone_id, a in with_history.items()})
+    return report_totals, history_points, hour_means, sketches
+
+def _prefetch_aggregated(db, zones: list, zone_categories: dict, fetch_mode: str, cutoff: datetime = None,
+                         reports_path: str = None, metrics: StageMetrics = None, cache: ArtifactCache = None):
+    """
+    Report totals, history sizes, hour-of-day means and availability sketches for a list of
+    zones (see _fetch_occupancy), served from cache for zones whose reports did not change
+    """
+    if cache is not None:
+        artifacts, _ = _zone_artifacts(db, zones, zone_categories, fetch_mode, cutoff, reports_path,
+                                       metrics or StageMetrics(), cache)
+        report_totals, history_points, hour_means, sketches = _artifact_summaries(artifacts)
+        if fetch_mode == "incremental":
+            sketches = _incremental_sketches(db, zones, _artifact_occupancy(artifacts), cutoff)
+        return report_totals, history_points, hour_means, sketches
+    report_totals, occupancy = _fetch_occupancy(db, zones, zone_categories, fetch_mode, cutoff, reports_path,
+                                                metrics)
+    if fetch_mode == "incremental":
+        sketches = _incremental_sketches(db, zones, occupancy, cutoff)
+    else:
+        sketches = AvailabilitySketches.from_occupancy(occupancy) if occupancy is not None else AvailabilitySketches()
+    if occupancy is None:
+        return report_totals, pd.Series(dtype=np.int64), pd.DataFrame(columns=range(24), dtype=float), sketches
+    return report_totals, occupancy.groupby(level='zoneId').size(), hour_of_day_means(occupancy), sketches
+
+def _artifact_occupancy(artifacts: dict):
+    """The (zoneId, timestamp) occupancy frame of the zones with history among artifacts, None without any"""
+    frames = {zone_id: a["occupancy"] for zone_id, a in artifacts.items() if a["occupancy"] is not None}
+    return pd.concat(frames, names=['zoneId']) if frames else None
+
+def _incremental_sketches(db, zones: list, occupancy, cutoff: datetime) -> AvailabilitySketches:
+    """Incremental runs merge new hours into the stored sketches instead of rebuilding them"""
+    return merge_sketch_hours(db, [z["zoneId"] for z in zones], occupancy, cutoff or datetime.now(UTC))
+
+def _prediction_fields(horizon: list, timestamps: list, scores: np.ndarray, prediction_format: str,
+                       bounds: np.ndarray = None, confidence: np.ndarray = None) -> dict:
+    """
+    One zone's row of scores (with its bounds and confidences) as the parkingzones fields
+    of the prediction format: the predictions list, plus packedPredictions when packed
+    """
+    fields = {PREDICTION_FIELDS["list"]: prediction_documents(timestamps, scores, bounds, confidence)}
+    if prediction_format == "packed":
+        fields[PREDICTION_FIELDS["packed"]] = encode_predictions(horizon[0], scores, confidence=confidence,
+                                                                 bounds=bounds)
+    return fields
+
+def _zone_update(prediction_fields: dict, zone_category: str, historical_points: int,
+                 report_count: int, model_type: str = None) -> dict:
+    """The parkingzones $set document of a trained zone, with its _prediction_fields"""
+    model_metrics = {
+        "category": zone_category,
+        "historicalDataPoints": historical_points,
+        "reportCount": report_count,
+        "usedRealisticModel": model_type is None
+    }
+    if model_type is not None:
+        model_metrics["modelType"] = model_type
+    return {
+        **prediction_fields,
+        "lastUpdated": datetime.now(UTC),
+        "modelMetrics": model_metrics
+    }
+
+def _train_zone(db, zone_info: dict, zone_category: str, fetch_mode: str, prefetched,
+                metrics: StageMetrics, horizon_hours: int = 24, prediction_format: str = "list",
+                reports: ZoneReportCounts = None, report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB) -> dict:
+    """
+    Predictions and metrics for one zone, returned as the parkingzones $set document.
+    prefetched is (report totals, history sizes, predictions by zone) from a batch run;
+    without it the zone's report counts (loaded from db within report_memory_mb unless
+    already given) are predicted on their own.
+    """
+    zone_id = zone_info["zoneId"]
+    zone_name = zone_info.get("zoneName", "")
+    capacity = zone_info.get("capacity", zone_info.get("estimatedCapacity", 50))
+    
+    zone_print(f"\n🔄 Processing zone: {zone_id}")
+    zone_print(f"   📍 Category: {zone_category}, Name: {zone_name}, Capacity: {capacity}")
+    
+    # Get user reports
+    if prefetched is not None:
+        report_totals, history_points, predictions_by_zone = prefetched
+        report_count = int(report_totals.get(zone_id, 0))
+    else:
+        if reports is None:
+            with metrics.stage("fetch", zone_id) as stage:
+                reports = load_zone_report_counts(db, zone_id, report_memory_mb)
+                stage["items"] = reports.total
+        with metrics.stage("frame", zone_id) as stage:
+            hourly_counts = reports.hourly_counts()
+            stage["items"] = len(hourly_counts)
+        report_count = reports.total
+    zone_print(f"   📊 Found {report_count} user reports")
+    
+    if report_count < MIN_REPORTS_FOR_HISTORY:
+        zone_print(f"   ⚠️  Limited data, using pure pattern-based predictions")
+    
+    if prefetched is not None:
+        historical_points = int(history_points.get(zone_id, 0))
+        prediction_fields = predictions_by_zone(zone_id)
+    else:
+        if report_count < MIN_REPORTS_FOR_HISTORY:
             historical_df = pd.DataFrame()
         else:
-            # Process reports to get historical patterns
-            df_reports = pd.DataFrame(reports)
-            df_reports["timestamp"] = pd.to_datetime(df_reports["timestamp"], utc=True)
-            
             # Calculate realistic occupancy patterns
-            historical_df = calculate_occupancy_from_reports(df_reports, capacity, zone_category)
+            with metrics.stage("bucket", zone_id) as stage:
+                historical_df = calculate_occupancy_from_counts(hourly_counts, report_count, capacity, zone_category)
+                stage["items"] = len(historical_df)
+        historical_points = len(historical_df)
         
         # Generate predictions
         now = datetime.now(UTC)
-        predictions = generate_realistic_predictions(zone_category, historical_df, now, 24)
-        
-        # Show sample predictions for debugging
-        sample_predictions = predictions[:8]  # First 8 hours
+        with metrics.stage("predict", zone_id) as stage:
+            sketches = zone_sketch(zone_id, historical_df)
+            predictions = generate_realistic_predictions(zone_category, historical_df, now, horizon_hours, sketches,
+                                                         zone_id)
+            stage["items"] = len(predictions)
+        prediction_fields = {PREDICTION_FIELDS["list"]: predictions}
+        if prediction_format == "packed":
+            prediction_fields[PREDICTION_FIELDS["packed"]] = encode_prediction_list(predictions)
+    
+    # Show sample predictions for debugging
+    if VERBOSE:
+        sample_predictions = prediction_fields[PREDICTION_FIELDS["list"]][:8]  # First 8 hours
         print(f"   🔮 Sample predictions:")
         for pred in sample_predictions:
             pred_time = datetime.fromisoformat(pred['timestamp'].replace('Z', '+00:00'))
             print(f"      {pred_time.strftime('%H:%M')}: {pred['availabilityScore']:.0%} available")
+    
+    return _zone_update(prediction_fields, zone_category, historical_points, report_count)
+
+def train_zones(db, zones: list, fetch_mode: str = "aggregate", cutoff: datetime = None,
+                reports_path: str = None, metrics: StageMetrics = None, horizon_hours: int = 24,
+                prediction_format: str = "list", cache: ArtifactCache = None, neighbors: int = 5,
+                neighbor_km: float = 3.0, report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB,
+                profiles: dict = None):
+    """
+    Fetch, bucket and predict for a list of zone documents. cutoff is the
+    report time an incremental run treats as "now"; reports_path is the
+    columnar dataset read in columnar mode. Stage timings go to metrics.
+    Each zone gets horizon_hours hourly predictions, as a list of dicts or packed
+    (prediction_format "list" or "packed"). With a cache, the batch fetch modes reuse
+    the derived artifacts of zones whose reports did not change. In the batch fetch modes,
+    zones without enough history of their own borrow the hour-of-day profile of up to
+    neighbors data-rich zones within neighbor_km of their area centroid (0 disables this).
+    Per-zone mode reads each zone's reports in chunks of at most report_memory_mb.
+    Given a profiles dict, borrowing is left to the caller, who sees the zones of other
+    chunks too: profiles receives the batch's hour-of-day profiles ("hourMeans"), the
+    prediction start ("start") and the bounds and confidence of its sparse zones ("sparse").
+    Yields (zone_id, update_data, error) tuples in input order, each as soon as its zone
+    is done, so the caller can write it while the next zones are computed. A failing zone
+    gets update_data None and its error message instead of aborting the rest of the list.
+    """
+    metrics = metrics or StageMetrics()
+    zone_categories = categorize_zone_batch(zones)
+    
+    prefetched = None
+    if fetch_mode in ("aggregate", "incremental", "columnar"):
+        try:
+            report_totals, history_points, hour_means, sketches = _prefetch_aggregated(
+                db, zones, zone_categories, fetch_mode, cutoff, reports_path, metrics, cache
+            )
+            # Horizon of every zone in one vectorized prediction
+            zone_ids = [z["zoneId"] for z in zones]
+            with metrics.stage("predict", zones=len(zones)) as stage:
+                start = datetime.now(UTC)
+                hour_means = hour_means.reindex(zone_ids)
+                if neighbors > 0 and profiles is None:
+                    borrowed, sources = borrow_neighbor_profiles(zones, hour_means, neighbors, neighbor_km)
+                    if sources:
+                        hour_means.loc[borrowed.index] = borrowed
+                        print(f"🧭 {len(sources)} sparse zones borrowed hour-of-day profiles from nearby zones")
+                horizon, scores = predict_zones_batch(
+                    [zone_categories[z] for z in zone_ids], start, horizon_hours, hour_means.to_numpy(dtype=float)
+                )
+                bounds, confidence = sketches.bounds(zone_ids, horizon)
+                stage["items"] = scores.size
+            if profiles is not None:
+                sparse = np.flatnonzero(hour_means.notna().sum(axis=1).to_numpy() <= MIN_PROFILE_HOURS)
+                profiles.update(hourMeans=hour_means, start=start,
+                                sparse={zone_ids[row]: (bounds[row], confidence[row]) for row in sparse})
+            timestamps = [t.isoformat() for t in horizon]
+            rows = {zone_id: row for row, zone_id in enumerate(zone_ids)}
+
+            def predictions_by_zone(zone_id):
+                row = rows[zone_id]
+                return _prediction_fields(horizon, timestamps, scores[row], prediction_format, bounds[row],
+                                          confidence[row])
+            prefetched = (report_totals, history_points, predictions_by_zone)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"   ❌ Aggregation failed for {len(zones)} zones: {error}")
+            for z in zones:
+                yield z["zoneId"], None, error
+            return
+    
+    for zone_info in zones:
+        zone_id = zone_info["zoneId"]
+        try:
+            update_data = _train_zone(db, zone_info, zone_categories[zone_id], fetch_mode, prefetched, metrics,
+                                      horizon_hours, prediction_format, report_memory_mb=report_memory_mb)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"   ❌ {zone_id} failed: {error}")
+            yield zone_id, None, error
+            continue
+        yield zone_id, update_data, None
+
+def train_zones_global(db, zones: list, fetch_mode: str = "aggregate", cutoff: datetime = None,
+                       reports_path: str = None, metrics: StageMetrics = None, horizon_hours: int = 24,
+                       prediction_format: str = "list", n_jobs: int = 1, summary_path: str = None,
+                       model_path: str = None, cache: ArtifactCache = None) -> list:
+    """
+    Fit one GlobalAvailabilityModel over every zone's history and predict all zones from it.
+    Writes the per-zone holdout summary CSV to summary_path and the fitted model to model_path.
+    With a cache, unchanged zones' occupancy comes from it, and when no zone changed at all
+    the previously fitted model is reused.
+    Returns (zone_id, update_data, error) tuples like train_zones.
+    """
+    metrics = metrics or StageMetrics()
+    zone_categories = categorize_zone_batch(zones)
+    zone_ids = [z["zoneId"] for z in zones]
+    try:
+        model, model_key = None, None
+        if cache is not None:
+            artifacts, keys = _zone_artifacts(db, zones, zone_categories, fetch_mode, cutoff, reports_path,
+                                              metrics, cache)
+            report_totals, history_points, _, sketches = _artifact_summaries(artifacts)
+            if fetch_mode == "incremental":
+                sketches = _incremental_sketches(db, zones, _artifact_occupancy(artifacts), cutoff)
+            model_key = artifact_key("global-model", sorted(keys.values()), GLOBAL_MODEL_PARAMS, CODE_VERSION)
+            model = cache.get(model_key)
+            occupancy = _artifact_occupancy(artifacts) if model is None else None
+        else:
+            report_totals, occupancy = _fetch_occupancy(db, zones, zone_categories, fetch_mode, cutoff,
+                                                        reports_path, metrics)
+            sketches = AvailabilitySketches()
+            if fetch_mode == "incremental":
+                sketches = _incremental_sketches(db, zones, occupancy, cutoff)
+            elif occupancy is not None:
+                sketches = AvailabilitySketches.from_occupancy(occupancy)
+            if occupancy is not None:
+                history_points = occupancy.groupby(level='zoneId').size()
         
-        # Update database
-        update_data = {
-            "predictions": predictions,
-            "lastUpdated": datetime.now(UTC),
-            "modelMetrics": {
-                "category": zone_category,
-                "historicalDataPoints": len(historical_df),
-                "reportCount": len(reports),
-                "usedRealisticModel": True
-            }
-        }
+        if model is not None:
+            print("🧠 No zone changed since the last fit, reusing the cached global model")
+        else:
+            if occupancy is None:
+                raise ValueError(f"no zone has the {MIN_REPORTS_FOR_HISTORY} reports needed to fit a model")
+            print(f"🧠 Fitting one global model on {len(occupancy)} zone-hours ({n_jobs} search jobs)")
+            with metrics.stage("fit", zones=len(zones)) as stage:
+                model = GlobalAvailabilityModel(n_jobs=n_jobs).fit(occupancy, zone_categories)
+                stage["items"] = model.training_samples
+            if model_key is not None:
+                cache.put(model_key, model)
+        mae, r2 = model.holdout_scores()
+        print(f"   📈 Holdout MAE={mae:.4f}, R²={r2:.3f}, best params: {model.best_params}")
+        if summary_path:
+            model.write_summary(summary_path)
+            print(f"   📝 Model summary written to {summary_path}")
+        if model_path:
+            model.save(model_path)
+            print(f"   💾 Model saved to {model_path}")
         
-        db.parkingzones.update_one(
-            {"zoneId": zone_id},
-            {"$set": update_data}
+        with metrics.stage("predict", zones=len(zones)) as stage:
+            horizon, scores = model.predict_horizon(zone_ids, datetime.now(UTC), horizon_hours)
+            bounds, confidence = sketches.bounds(zone_ids, horizon)
+            stage["items"] = scores.size
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"   ❌ Global model failed for {len(zones)} zones: {error}")
+        return [(zone_id, None, error) for zone_id in zone_ids]
+    
+    timestamps = [t.isoformat() for t in horizon]
+    results = []
+    for row, zone_id in enumerate(zone_ids):
+        prediction_fields = _prediction_fields(horizon, timestamps, scores[row], prediction_format, bounds[row],
+                                               confidence[row])
+        results.append((zone_id, _zone_update(
+            prediction_fields, zone_categories[zone_id], int(history_points.get(zone_id, 0)),
+            int(report_totals.get(zone_id, 0)), model_type="GlobalHistGradientBoosting"
+        ), None))
+    return results
+
+# ---------------- PARALLEL EXECUTION ----------------
+_worker_db = None
+_worker_cache = None
+
+def _init_worker(mongo_uri: str, verbose: bool = True, cache_dir: str = None,
+                 cache_max_bytes: int = DEFAULT_MAX_BYTES, offline: bool = False):
+    """
+    Process pool initializer: one MongoClient (and artifact cache) per worker, reused for
+    all its chunks. Offline workers (file source) open no client.
+    """
+    global _worker_db, _worker_cache
+    set_verbose(verbose)
+    if not offline:
+        _, _worker_db = connect_to_database(mongo_uri)
+    if cache_dir:
+        _worker_cache = ArtifactCache(cache_dir, cache_max_bytes)
+
+def _worker_initargs(mongo_uri: str, cache: ArtifactCache = None, offline: bool = False) -> tuple:
+    """_init_worker arguments that give every worker the parent's cache directory and size bound"""
+    if cache is None:
+        return mongo_uri, VERBOSE, None, DEFAULT_MAX_BYTES, offline
+    return mongo_uri, VERBOSE, cache.directory, cache.max_bytes, offline
+
+def _train_zone_chunk(zones: list, fetch_mode: str, cutoff: datetime, reports_path: str, horizon_hours: int,
+                      prediction_format: str, neighbors: int = 5, neighbor_km: float = 3.0,
+                      report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB) -> tuple:
+    """
+    Results of one chunk, the stage timings the worker recorded for it and, when sparse
+    zones may borrow, the chunk's profiles for _borrow_across_chunks (see train_zones)
+    """
+    metrics = StageMetrics()
+    profiles = {} if neighbors > 0 else None
+    results = list(train_zones(_worker_db, zones, fetch_mode, cutoff, reports_path, metrics, horizon_hours,
+                               prediction_format, _worker_cache, neighbors, neighbor_km, report_memory_mb, profiles))
+    return results, metrics.records, profiles
+
+def _borrow_across_chunks(zones: list, chunk_profiles: list, deferred: dict, neighbors: int, neighbor_km: float,
+                          horizon_hours: int, prediction_format: str) -> list:
+    """
+    Results of the sparse zones the chunks deferred (zoneId -> their chunk's update_data),
+    with the profile they borrow from their nearest data-rich zones across all chunks
+    blended into their predictions, as train_zones does within a single batch
+    """
+    hour_means = pd.concat([profiles["hourMeans"] for profiles in chunk_profiles])
+    borrowed, sources = borrow_neighbor_profiles(zones, hour_means, neighbors, neighbor_km)
+    if sources:
+        print(f"🧭 {len(sources)} sparse zones borrowed hour-of-day profiles from nearby zones")
+    for profiles in chunk_profiles:
+        # Each chunk's zones keep the horizon (and so the bounds) they were predicted with
+        zone_ids = [zone_id for zone_id in profiles["sparse"] if zone_id in sources and zone_id in deferred]
+        if not zone_ids:
+            continue
+        horizon, scores = predict_zones_batch(
+            [deferred[z]["modelMetrics"]["category"] for z in zone_ids], profiles["start"], horizon_hours,
+            borrowed.loc[zone_ids].to_numpy(dtype=float)
         )
-        
-        print(f"   ✅ Updated {zone_id} with realistic predictions")
+        timestamps = [t.isoformat() for t in horizon]
+        for row, zone_id in enumerate(zone_ids):
+            bounds, confidence = profiles["sparse"][zone_id]
+            deferred[zone_id].update(_prediction_fields(
+                horizon, timestamps, scores[row], prediction_format, bounds, confidence))
+    return [(zone_id, update_data, None) for zone_id, update_data in deferred.items()]
+
+def _train_zones_parallel(zones: list, fetch_mode: str, workers: int, mongo_uri: str, cutoff: datetime,
+                          reports_path: str = None, horizon_hours: int = 24, prediction_format: str = "list",
+                          cache: ArtifactCache = None, offline: bool = False, neighbors: int = 5,
+                          neighbor_km: float = 3.0, report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB):
+    """
+    Spread zones over a spawn-based process pool and yield each chunk's (results, stage records)
+    in submission order, so output is deterministic whatever order workers finish in.
+    Sparse zones that may borrow a neighbor's profile are held back and yielded last, once
+    every chunk's profiles are in: their neighbors are chosen over all zones, not just
+    the ones that happened to share their chunk.
+    """
+    chunk_size = max(1, min(50, -(-len(zones) // (workers * 4))))
+    chunks = [zones[i:i + chunk_size] for i in range(0, len(zones), chunk_size)]
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=_worker_initargs(mongo_uri, cache, offline)) as pool:
+        futures = [
+            pool.submit(_train_zone_chunk, chunk, fetch_mode, cutoff, reports_path, horizon_hours, prediction_format,
+                        neighbors, neighbor_km, report_memory_mb)
+            for chunk in chunks
+        ]
+        chunk_profiles, deferred = [], {}
+        for chunk, future in zip(chunks, futures):
+            try:
+                results, records, profiles = future.result()
+            except Exception as e:
+                # A crashed worker only loses its own chunk
+                error = f"{type(e).__name__}: {e}"
+                print(f"   ❌ Worker failed on {len(chunk)} zones: {error}")
+                yield [(z["zoneId"], None, error) for z in chunk], []
+                continue
+            if profiles:
+                chunk_profiles.append(profiles)
+                held = {zone_id: update_data for zone_id, update_data, error in results
+                        if error is None and zone_id in profiles["sparse"]}
+                deferred.update(held)
+                results = [result for result in results if result[0] not in held]
+            yield results, records
+    if deferred:
+        yield _borrow_across_chunks(zones, chunk_profiles, deferred, neighbors, neighbor_km, horizon_hours,
+                                    prediction_format), []
+
+def _pooled_zone_results(chunk_results, metrics: StageMetrics):
+    """Zone results of the pool's chunks in order, folding each worker's stage records into metrics"""
+    for results, worker_records in chunk_results:
+        metrics.extend(worker_records)
+        yield from results
+
+# ---------------- ASYNC EXECUTION ----------------
+def connect_to_async_database(mongo_uri: str = None):
+    """Open an AsyncMongoClient on MONGO_URI (or the given URI) and return (client, db)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    client = AsyncMongoClient(mongo_uri or os.getenv("MONGO_URI"))
+    return client, client.ParkWiseDB
 
+async def _load_zone_report_counts_async(db, zone_id: str, metrics: StageMetrics,
+                                         memory_mb: float) -> ZoneReportCounts:
+    """load_zone_report_counts on an async client"""
+    started = time.perf_counter()
+    chunk_size = report_chunk_size(memory_mb)
+    reports = ZoneReportCounts(zone_id)
+    cursor = _zone_report_cursor(db, zone_id, chunk_size)
+    while True:
+        documents = await cursor.to_list(chunk_size)
+        if not documents:
+            break
+        reports.add_documents(documents)
+    metrics.record("fetch", time.perf_counter() - started, reports.total, zone_id)
+    return reports
+
+async def train_zones_async(db, zones: list, writer: AsyncPredictionWriter, metrics: StageMetrics = None,
+                            horizon_hours: int = 24, prediction_format: str = "list", prefetch: int = 16,
+                            report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB) -> list:
+    """
+    Per-zone training on an async client. The reports of up to prefetch upcoming zones are
+    fetched while the current zone is computed on a worker thread, and finished zones go
+    straight to writer, so network round trips overlap with computation instead of adding to it.
+    The prefetched zones share report_memory_mb between them.
+    Returns (zone_id, error) of the zones that failed.
+    """
+    metrics = metrics or StageMetrics()
+    zone_categories = categorize_zone_batch(zones)
+    upcoming = iter(zones)
+    in_flight = deque()
+
+    def top_up():
+        while len(in_flight) < prefetch:
+            zone_info = next(upcoming, None)
+            if zone_info is None:
+                return
+            fetch = asyncio.create_task(_load_zone_report_counts_async(db, zone_info["zoneId"], metrics,
+                                                                       report_memory_mb / prefetch))
+            in_flight.append((zone_info, fetch))
+
+    failed_zones = []
+    top_up()
+    while in_flight:
+        zone_info, fetch = in_flight.popleft()
+        top_up()
+        zone_id = zone_info["zoneId"]
+        try:
+            reports = await fetch
+            update_data = await asyncio.to_thread(
+                _train_zone, None, zone_info, zone_categories[zone_id], "per-zone", None, metrics,
+                horizon_hours, prediction_format, reports
+            )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"   ❌ {zone_id} failed: {error}")
+            failed_zones.append((zone_id, error))
+            continue
+        await writer.add(zone_id, update_data)
+        zone_print(f"   ✅ Queued {zone_id} with realistic predictions")
+    return failed_zones
+
+async def _train_and_write_async(mongo_uri: str, zones: list, metrics: StageMetrics, write_batch_size: int,
+                                 stale_fields: list, horizon_hours: int, prediction_format: str, prefetch: int,
+                                 max_in_flight_writes: int, report_memory_mb: float) -> tuple:
+    """train_zones_async on its own AsyncMongoClient; returns (failed zones, write batch stats)"""
+    client, db = connect_to_async_database(mongo_uri)
+    try:
+        writer = AsyncPredictionWriter(AsyncMongoPredictionSink(db.parkingzones, stale_fields),
+                                       write_batch_size, max_in_flight_writes)
+        failed_zones = await train_zones_async(db, zones, writer, metrics, horizon_hours, prediction_format,
+                                               prefetch, report_memory_mb)
+        return failed_zones, await writer.close()
+    finally:
+        await client.close()
+
+# ---------------- MAIN FUNCTION ----------------
+def train_and_update_predictions(db=None, fetch_mode: str = "aggregate", write_batch_size: int = 500,
+                                 workers: int = 1, mongo_uri: str = None, full_rebuild: bool = False,
+                                 reports_path: str = None, quiet: bool = False, metrics: StageMetrics = None,
+                                 metrics_path: str = None, horizon_hours: int = 24,
+                                 prediction_format: str = "list", model: str = "realistic",
+                                 summary_path: str = None, model_path: str = None, cache_dir: str = None,
+                                 cache_max_bytes: int = DEFAULT_MAX_BYTES, source: str = "mongo",
+                                 predictions_path: str = None, async_io: bool = False, prefetch: int = 16,
+                                 max_in_flight_writes: int = 4, neighbors: int = 5, neighbor_km: float = 3.0,
+                                 report_memory_mb: float = DEFAULT_REPORT_MEMORY_MB):
+    """
+    Recompute predictions for every zone.
+    fetch_mode "aggregate" pulls hourly counts with one aggregation per batch of zones;
+    "incremental" only aggregates reports past each zone's watermark and merges them into
+    the stored hourly aggregates (full_rebuild drops those first);
+    "columnar" reads reports from the generator output at reports_path (a memory-mapped columnar
+    dataset, JSON or NDJSON) instead of userreports;
+    "per-zone" issues one find() per zone and buckets its reports locally, reading only the
+    report type and timestamp in time-ordered chunks of at most report_memory_mb per zone
+    (shared by the prefetched zones with async_io), so no zone's history has to fit in memory.
+    With workers > 1, zones are trained in a process pool where every worker opens
+    its own MongoClient on mongo_uri (MONGO_URI by default).
+    Prediction updates are written in unordered bulk_write batches of write_batch_size.
+    Every zone gets horizon_hours hourly predictions, always stored as the predictions array
+    of dicts the API serves; prediction_format "packed" also stores the compact
+    packedPredictions document (see prediction_codec), and "list" removes it.
+    model "global" fits one GlobalAvailabilityModel over all zones instead of the realistic
+    pattern model, using workers as the number of parallel search jobs, and writes its
+    per-zone summary CSV to summary_path and the model to model_path.
+    cache_dir enables the on-disk artifact cache (bounded to cache_max_bytes), so the batch
+    fetch modes only fetch and bucket zones whose reports changed since they were cached.
+    source "file" runs fully offline: zones and reports come from reports_path (read as in
+    columnar mode) and predictions go to the local NDJSON file predictions_path.
+    async_io runs per-zone mode on an AsyncMongoClient: up to prefetch zones' reports are
+    fetched ahead and up to max_in_flight_writes write batches are outstanding while zones
+    are computed, so wall time approaches compute time on high-latency connections.
+    In the batch fetch modes, zones with too little history borrow the hour-of-day profile of
+    up to neighbors data-rich zones within neighbor_km of their area polygon's centroid
+    (from a BallTree over the centroids; neighbors 0 keeps pure category patterns).
+    quiet drops the per-zone output. Stage timings are collected into metrics (a fresh
+    StageMetrics by default), summarized at the end and written as JSON lines to metrics_path.
+    Returns the (zone_id, error) pairs of every zone that kept its previous predictions,
+    whether computing them or writing them failed.
+    """
+    set_verbose(not quiet)
+    metrics = metrics if metrics is not None else StageMetrics()
+    if source not in SOURCES:
+        raise ValueError(f"unknown source {source!r}")
+    offline = source == "file"
+    if offline:
+        if reports_path is None or predictions_path is None:
+            raise ValueError("the file source needs reports_path and predictions_path")
+        if fetch_mode not in ("aggregate", "columnar"):
+            raise ValueError(f"the file source reads the whole report file; {fetch_mode} needs MongoDB")
+        fetch_mode = "columnar"
+
+    client = None
+    if db is None and not offline:
+        client, db = connect_to_database(mongo_uri)
+    elif workers > 1 and model != "global" and mongo_uri is None and not offline:
+        raise ValueError("workers > 1 needs a mongo_uri so each worker can open its own client")
+    if model == "global" and fetch_mode == "per-zone":
+        raise ValueError("the global model needs a batch fetch mode, not per-zone")
+    if fetch_mode == "columnar" and reports_path is None:
+        raise ValueError("columnar fetch mode needs reports_path")
+    if prediction_format not in PREDICTION_FIELDS:
+        raise ValueError(f"unknown prediction format {prediction_format!r}")
+    if async_io and (fetch_mode != "per-zone" or model != "realistic" or workers > 1 or offline):
+        raise ValueError("async execution pipelines per-zone fetches: it needs fetch_mode per-zone, "
+                         "the realistic model, one worker and the mongo source")
+
+    # Get zones with their metadata
+    with metrics.stage("fetch", zones=0) as stage:
+        if offline:
+            zones = file_zone_documents(reports_path)
+        else:
+            zones = list(db.parkingzones.find({}, {
+                "zoneId": 1, "zoneName": 1, "category": 1, 
+                "capacity": 1, "estimatedCapacity": 1, "area": 1
+            }))
+        stage["items"] = len(zones)
+    
+    print(f"Found {len(zones)} zones to process...")
+
+    cutoff = datetime.now(UTC)
+    if fetch_mode == "incremental":
+        ensure_incremental_indexes(db)
+        if full_rebuild:
+            print("🧹 Full rebuild: dropping stored hourly aggregates and watermarks")
+            reset_incremental_state(db)
+
+    cache = ArtifactCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+    # Lazy where possible: zones are written while the next ones are still being computed
+    if async_io:
+        zone_results = []  # trained and written together on the event loop below
+    elif model == "global":
+        zone_results = train_zones_global(db, zones, fetch_mode, cutoff, reports_path, metrics, horizon_hours,
+                                          prediction_format, workers, summary_path, model_path, cache)
+    elif workers > 1:
+        print(f"⚙️  Training with {workers} worker processes")
+        zone_results = _pooled_zone_results(_train_zones_parallel(
+            zones, fetch_mode, workers, mongo_uri, cutoff, reports_path, horizon_hours, prediction_format, cache,
+            offline, neighbors, neighbor_km, report_memory_mb
+        ), metrics)
+    else:
+        zone_results = train_zones(db, zones, fetch_mode, cutoff, reports_path, metrics, horizon_hours,
+                                   prediction_format, cache, neighbors, neighbor_km, report_memory_mb)
+
+    stale_fields = [PREDICTION_FIELDS["packed"]] if prediction_format == "list" else []
+    if async_io:
+        print(f"⚡ Async pipeline: prefetching {prefetch} zones, up to {max_in_flight_writes} write batches in flight")
+        failed_zones, batch_stats = asyncio.run(_train_and_write_async(
+            mongo_uri, zones, metrics, write_batch_size, stale_fields, horizon_hours, prediction_format,
+            prefetch, max_in_flight_writes, report_memory_mb
+        ))
+    else:
+        if offline:
+            sink = LocalPredictionSink(predictions_path)
+        else:
+            sink = MongoPredictionSink(db.parkingzones, stale_fields)
+        writer = PredictionWriter(sink, write_batch_size)
+        failed_zones = []
+        for zone_id, update_data, error in zone_results:
+            if error is not None:
+                failed_zones.append((zone_id, error))
+                continue
+            writer.add(zone_id, update_data)
+            zone_print(f"   ✅ Queued {zone_id} with realistic predictions")
+        batch_stats = writer.close()
+    if cache is not None and workers > 1:
+        # Each worker only trims the shared directory when its own puts overflow it
+        cache.evict()
+
+    for b in batch_stats:
+        metrics.record("write", b["seconds"], b["operations"], zones=b["operations"])
+    write_failures = [error for b in batch_stats for error in b["errors"]]
+    write_seconds = sum(b["seconds"] for b in batch_stats)
+    print(f"\n💾 Wrote {sum(b['operations'] for b in batch_stats)} zones in {len(batch_stats)} batches "
+          f"({write_seconds:.2f}s total write time, {len(write_failures)} failed)")
+    failed_zones = failed_zones + write_failures
+    
+    if failed_zones:
+        print(f"\n⚠️  {len(failed_zones)} zones failed and kept their previous predictions:")
+        for zone_id, error in failed_zones:
+            print(f"   {zone_id}: {error}")
+    
+    if async_io:
+        timing_note = "fetch and write summed over concurrent requests"
+    elif workers > 1 and model != "global":
+        timing_note = "summed over workers"
+    else:
+        timing_note = "wall time"
+    print(f"\n⏱️  Stage timings ({timing_note}):")
+    for total in metrics.summary():
+        print(f"   {total['stage']:<8} {total['seconds']:8.3f}s  {total['calls']:>6} calls  "
+              f"{total['items']:>10} items")
+    if metrics_path:
+        metrics.write_jsonl(metrics_path)
+        print(f"📝 Stage metrics written to {metrics_path}")
+    
     print(f"\n🎉 Prediction update completed for all zones!")
-    client.close()
+    if client is not None:
+        client.close()
+    return failed_zones
+
+
+SUMMARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_performance_summary.csv")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nightly ParkWise prediction training")
+    parser.add_argument("--fetch-mode", choices=["aggregate", "incremental", "columnar", "per-zone"],
+                        default="aggregate",
+                        help="aggregate: one server-side $group for all zones; "
+                             "incremental: only reports past each zone's watermark, merged into stored aggregates; "
+                             "columnar: read the generator output given by --reports-from; "
+                             "per-zone: one find() per zone")
+    parser.add_argument("--reports-from", metavar="PATH",
+                        help="generator output: a columnar dataset directory, .json, .ndjson or .ndjson.gz")
+    parser.add_argument("--source", choices=SOURCES, default="mongo",
+                        help="mongo: zones, reports and predictions in MongoDB; "
+                             "file: train offline from --reports-from and write to --predictions-to")
+    parser.add_argument("--predictions-to", metavar="PATH", default="predictions.ndjson",
+                        help="with --source file, local NDJSON file the predictions are written to")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="with --fetch-mode incremental, drop stored aggregates and watermarks first")
+    parser.add_argument("--write-batch-size", type=int, default=500,
+                        help="number of zone updates per unordered bulk_write")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="train zones in this many processes (each with its own MongoClient); "
+                             "with --model global, the number of parallel search jobs")
+    parser.add_argument("--model", choices=["realistic", "global"], default="realistic",
+                        help="realistic: zone pattern baselines blended with history; "
+                             "global: one HistGradientBoosting model fit across all zones")
+    parser.add_argument("--summary-out", default=SUMMARY_PATH,
+                        help="with --model global, per-zone holdout metrics CSV")
+    parser.add_argument("--model-out", help="with --model global, save the fitted model here (joblib)")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="reuse cached profiles and models of zones whose reports did not change")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // 2**20,
+                        help="size bound of --cache-dir; least recently used entries are evicted")
+    parser.add_argument("--neighbors", type=int, default=5,
+                        help="sparse zones borrow the hour-of-day profile of this many nearby data-rich zones "
+                             "(0: pure category patterns)")
+    parser.add_argument("--neighbor-km", type=float, default=3.0,
+                        help="farthest a borrowed-from zone's centroid may be")
+    parser.add_argument("--report-memory-mb", type=float, default=DEFAULT_REPORT_MEMORY_MB,
+                        help="with --fetch-mode per-zone, memory a zone's raw reports may take at a time; "
+                             "longer histories are read in time-ordered chunks")
+    parser.add_argument("--horizon-hours", type=int, default=24, help="hours of predictions per zone")
+    parser.add_argument("--prediction-format", choices=list(PREDICTION_FIELDS), default="list",
+                        help="list: predictions array of dicts; packed: also packedPredictions with start, "
+                             "step and uint8 percent scores (the API and app still read predictions)")
+    parser.add_argument("--async", dest="async_io", action="store_true",
+                        help="with --fetch-mode per-zone, overlap report fetches and writes with computation "
+                             "on an async MongoDB client")
+    parser.add_argument("--prefetch", type=int, default=16,
+                        help="with --async, zones whose reports are fetched ahead of the one being computed")
+    parser.add_argument("--max-inflight-writes", type=int, default=4,
+                        help="with --async, write batches outstanding at once")
+    parser.add_argument("--quiet", action="store_true", help="skip the per-zone progress output")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write per-stage timings (fetch, frame, bucket, fit, predict, write) as JSON lines")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run under cProfile and dump pstats to PATH (profiles the main process only)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    train_and_update_predictions()
\ No newline at end of file
+    args = parse_args()
+    run_options = dict(
+        fetch_mode=args.fetch_mode,
+        write_batch_size=args.write_batch_size,
+        workers=args.workers,
+        full_rebuild=args.full_rebuild,
+        reports_path=args.reports_from,
+        quiet=args.quiet,
+        metrics_path=args.metrics,
+        horizon_hours=args.horizon_hours,
+        prediction_format=args.prediction_format,
+        model=args.model,
+        summary_path=args.summary_out,
+        model_path=args.model_out,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 2**20,
+        source=args.source,
+        predictions_path=args.predictions_to,
+        async_io=args.async_io,
+        prefetch=args.prefetch,
+        max_in_flight_writes=args.max_inflight_writes,
+        neighbors=args.neighbors,
+        neighbor_km=args.neighbor_km,
+        report_memory_mb=args.report_memory_mb
+    )
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        failed_zones = profiler.runcall(train_and_update_predictions, **run_options)
+        profiler.dump_stats(args.profile)
+        print(f"\n📊 Profile written to {args.profile} (top functions by cumulative time):")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    else:
+        failed_zones = train_and_update_predictions(**run_options)
+    if failed_zones:
+        raise SystemExit(1)
@@ -0,0 +1,116 @@
+"""
+Spatial neighbor index over zone centroids.
+
+Zones carry a GeoJSON Polygon "area" (lng/lat rings, the field behind the
+2dsphere index in the backend models). Their centroids go into a haversine
+BallTree, so the k nearest data-rich zones of any zone are found in O(log n)
+without an n x n distance matrix. The trainer uses it to give zones with too few
+reports of their own the hour-of-day profile of the data-rich zones around them.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+# A zone's own hour-of-day profile counts once it covers more hours than this
+# (the same rule predict_zones_batch uses before blending history in)
+MIN_PROFILE_HOURS = 5
+
+
+def polygon_centroid(area: Optional[dict]) -> Optional[Tuple[float, float]]:
+    """(lat, lng) centroid of a GeoJSON Polygon's outer ring, None without usable coordinates"""
+    try:
+        ring = np.asarray(area["coordinates"][0], dtype=float)[:, :2]
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    if len(ring) == 0 or not np.isfinite(ring).all():
+        return None
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+
+    # Area-weighted (shoelace) centroid, relative to the first vertex to keep precision;
+    # the vertex mean for degenerate rings
+    origin = ring[0]
+    x, y = ring[:, 0] - origin[0], ring[:, 1] - origin[1]
+    x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y_next - x_next * y
+    area2 = cross.sum()
+    if abs(area2) < 1e-15:
+        return float(origin[1] + y.mean()), float(origin[0] + x.mean())
+    return (float(origin[1] + ((y + y_next) * cross).sum() / (3 * area2)),
+            float(origin[0] + ((x + x_next) * cross).sum() / (3 * area2)))
+
+
+def zone_centroids(zones: List[dict]) -> Dict[str, Tuple[float, float]]:
+    """zoneId -> (lat, lng) for every zone document with a usable area polygon"""
+    centroids = {}
+    for zone in zones:
+        centroid = polygon_centroid(zone.get("area"))
+        if centroid is not None:
+            centroids[zone["zoneId"]] = centroid
+    return centroids
+
+
+class NeighborIndex:
+    """Haversine BallTree over (lat, lng) points of a set of zones"""
+
+    def __init__(self, zone_ids: List[str], latlng: np.ndarray):
+        self.zone_ids = list(zone_ids)
+        self._tree = BallTree(np.radians(np.asarray(latlng, dtype=float).reshape(-1, 2)), metric="haversine")
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+    def query(self, latlng: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices into zone_ids and distances in km of the k nearest zones of each point"""
+        k = min(k, len(self.zone_ids))
+        distances, indices = self._tree.query(np.radians(np.asarray(latlng, dtype=float).reshape(-1, 2)), k=k)
+        return indices, distances * EARTH_RADIUS_KM
+
+
+def borrow_neighbor_profiles(zones: List[dict], hour_means: pd.DataFrame, k: int = 5,
+                             max_km: float = 3.0) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """
+    Hour-of-day profiles for the sparse zones among zones: the inverse-distance weighted
+    mean of the profiles of their k nearest data-rich zones within max_km.
+    hour_means is the (zones, 24) profile frame of the trainer (NaN where unknown).
+    Returns the borrowed profiles (one row per zone that found neighbors) and the
+    neighbor ids each of them borrowed from.
+    """
+    empty = pd.DataFrame(columns=hour_means.columns, dtype=float)
+    centroids = zone_centroids(zones)
+    if not centroids or k <= 0:
+        return empty, {}
+
+    known_hours = hour_means.notna().sum(axis=1)
+    rich = [zone_id for zone_id in known_hours.index[known_hours > MIN_PROFILE_HOURS] if zone_id in centroids]
+    sparse = [
+        z["zoneId"] for z in zones
+        if z["zoneId"] in centroids and known_hours.get(z["zoneId"], 0) <= MIN_PROFILE_HOURS
+    ]
+    if not rich or not sparse:
+        return empty, {}
+
+    index = NeighborIndex(rich, np.array([centroids[z] for z in rich]))
+    indices, distances = index.query(np.array([centroids[z] for z in sparse]), k)
+
+    profiles = hour_means.loc[rich].to_numpy(dtype=float)
+    within = distances <= max_km
+    # Inverse-distance weights; a neighbor 50 m away does not get unbounded weight
+    weights = np.where(within, 1.0 / np.maximum(distances, 0.05), 0.0)
+    neighbor_profiles = profiles[indices]
+    known = ~np.isnan(neighbor_profiles)
+    weight_per_hour = (weights[:, :, None] * known).sum(axis=1)
+    weighted = (weights[:, :, None] * np.nan_to_num(neighbor_profiles)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        borrowed = np.where(weight_per_hour > 0, weighted / weight_per_hour, np.nan)
+
+    found = within.any(axis=1)
+    sources = {
+        zone_id: [rich[i] for i, ok in zip(indices[row], within[row]) if ok]
+        for row, zone_id in enumerate(sparse) if found[row]
+    }
+    return pd.DataFrame(borrowed[found], index=np.array(sparse)[found], columns=hour_means.columns), sources
@@ -0,0 +1,85 @@
+"""
+Keyword-based zone categorization shared by the data generator and the trainer.
+
+All keyword tables are compiled into one regular expression, and results are
+memoized per zone, so categorizing tens of thousands of zones is a single cheap
+batch call and both scripts always agree on a zone's category.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Ordered by priority: when a zone matches keywords of several categories, the
+# category listed first wins.
+CATEGORY_KEYWORDS = [
+    ("commercial_high", ["fc_road", "laxmi_rd", "mg_road", "jm_road", "shivajinagar", "camp",
+                         "mall", "shopping", "commercial", "plaza", "center"]),
+    ("it_corporate", ["baner", "viman_nagar", "hadapsar", "hinjewadi", "wakad", "kharadi", "magarpatta",
+                      "it_park", "cyber", "tech", "corporate", "office", "software", "wipro", "tcs", "infosys"]),
+    ("residential", ["karve_nagar", "undri", "warje", "model_colony", "salisbury", "fatima", "pimple",
+                     "bavdhan", "bibvewadi", "kondhwa", "karve", "society", "residential", "apartment",
+                     "housing", "residency"]),
+    ("educational", ["pune_university", "deccan", "law_college", "tilak"]),
+    ("transport_hub", ["pune_station", "swargate", "akurdi", "station", "railway", "depot", "terminal",
+                       "bus_stand", "transport"]),
+    ("industrial", ["pimpri", "bhosari", "chakan", "talegaon", "chinchwad", "nigdi", "baramati"]),
+    ("entertainment", ["koregaon", "kothrud", "balewadi", "pashan"]),
+    ("traditional_market", ["market", "bazaar", "laxmi", "traditional", "vendor"]),
+]
+
+DEFAULT_CATEGORY = "mixed_suburban"
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_zone_text(text: str) -> str:
+    """Lowercase and join words with underscores, so "FC Road" matches "fc_road" """
+    return _NON_WORD.sub("_", text.lower())
+
+
+class ZoneResolver:
+    """Compiled, memoizing keyword resolver"""
+
+    def __init__(self, rules=CATEGORY_KEYWORDS, default: str = DEFAULT_CATEGORY):
+        self.categories = [category for category, _ in rules]
+        self.default = default
+        # One alternation group per category inside a lookahead: every start position is
+        # tried, and at each one the highest-priority category matching there is reported
+        groups = "|".join(
+            "({})".format("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+            for _, keywords in rules
+        )
+        self._pattern = re.compile(f"(?=(?:{groups}))")
+        self._cache: Dict[tuple, str] = {}
+
+    def _match(self, text: str) -> str:
+        best = len(self.categories)
+        for match in self._pattern.finditer(text):
+            best = min(best, match.lastindex - 1)
+            if best == 0:
+                break
+        return self.categories[best] if best < len(self.categories) else self.default
+
+    def resolve(self, zone_id: str, zone_name: str = "") -> str:
+        key = (zone_id, zone_name)
+        category = self._cache.get(key)
+        if category is None:
+            category = self._match(normalize_zone_text(f"{zone_id} {zone_name}"))
+            self._cache[key] = category
+        return category
+
+    def resolve_many(self, zone_ids: Iterable[str], zone_names: Optional[Iterable[str]] = None) -> List[str]:
+        """Categories for a whole zone universe in one call"""
+        zone_ids = list(zone_ids)
+        zone_names = [""] * len(zone_ids) if zone_names is None else list(zone_names)
+        return [self.resolve(zone_id, zone_name) for zone_id, zone_name in zip(zone_ids, zone_names)]
+
+
+DEFAULT_RESOLVER = ZoneResolver()
+
+
+def resolve_zone_category(zone_id: str, zone_name: str = "") -> str:
+    return DEFAULT_RESOLVER.resolve(zone_id, zone_name)
+
+
+def resolve_zone_categories(zone_ids: Iterable[str], zone_names: Optional[Iterable[str]] = None) -> List[str]:
+    return DEFAULT_RESOLVER.resolve_many(zone_ids, zone_names)